@@ -35,6 +35,7 @@ setup(
         "termplotlib",
         "cap_from_youtube",
         "vidgear",
+        "av",
     ],
     version="0.1.0",
     author='Peter Reutemann',
@@ -43,5 +44,8 @@ setup(
         "class_lister": [
             "idc.video=idc.video.class_lister",
         ],
+        "console_scripts": [
+            "idc-video-probe=idc.video.tool.probe:sys_main",
+        ],
     },
 )
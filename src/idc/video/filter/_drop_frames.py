@@ -91,6 +91,15 @@ class DropFrames(DiscardFilter):
         super().initialize()
         self._count = 0
 
+    def _requires_list_input(self) -> bool:
+        """
+        Returns whether lists are expected as input for the _process method.
+
+        :return: True if list inputs are expected by the filter
+        :rtype: bool
+        """
+        return True
+
     def _do_process(self, data):
         """
         Processes the data record(s).
@@ -109,4 +118,6 @@ class DropFrames(DiscardFilter):
                 else:
                     self._discard(item)
 
+        if len(result) == 0:
+            return None
         return flatten_list(result)
@@ -128,6 +128,15 @@ class FilterFramesByLabel(BatchFilter):
         else:
             self._excluded_labels = None
 
+    def _requires_list_input(self) -> bool:
+        """
+        Returns whether lists are expected as input for the _process method.
+
+        :return: True if list inputs are expected by the filter
+        :rtype: bool
+        """
+        return True
+
     def _do_process(self, data):
         """
         Processes the data record(s).
@@ -186,4 +195,6 @@ class FilterFramesByLabel(BatchFilter):
             else:
                 result.append(item)
 
+        if len(result) == 0:
+            return None
         return flatten_list(result)
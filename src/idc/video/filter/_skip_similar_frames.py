@@ -1,13 +1,13 @@
 import argparse
+import logging
 from typing import List
 
-import cv2
-import numpy as np
 from wai.logging import LOGGING_WARNING
 
 from idc.api import ImageData, ImageClassificationData, ImageSegmentationData, ObjectDetectionData
 from idc.filter import DiscardFilter
 from idc.video.util.change_detection import CONVERSION_GRAY, CONVERSIONS, detect_change
+from idc.video.util.frames import CHANNEL_ORDER_BGR, data_to_frame
 from kasperl.api import make_list, flatten_list
 
 
@@ -113,6 +113,15 @@ class SkipSimilarFrames(DiscardFilter):
             self.change_threshold = 0.01
         self._last_image = None
 
+    def _requires_list_input(self) -> bool:
+        """
+        Returns whether lists are expected as input for the _process method.
+
+        :return: True if list inputs are expected by the filter
+        :rtype: bool
+        """
+        return True
+
     def _do_process(self, data):
         """
         Processes the data record(s).
@@ -121,9 +130,10 @@ class SkipSimilarFrames(DiscardFilter):
         :return: the potentially updated record(s)
         """
         result = []
+        debug = self.logger().isEnabledFor(logging.DEBUG)
         for item in make_list(data):
             # read image
-            img = cv2.cvtColor(np.array(item.image), cv2.COLOR_RGB2BGR)
+            img = data_to_frame(item, CHANNEL_ORDER_BGR)
 
             # nothing to compare against?
             if self._last_image is None:
@@ -134,7 +144,8 @@ class SkipSimilarFrames(DiscardFilter):
             # detect change
             ratio, changed = detect_change(self._last_image, img,
                                            self.conversion, self.bw_threshold, self.change_threshold)
-            self.logger().debug("%s (ratio/changed): %f -> %s" % (item.image_name, ratio, str(changed)))
+            if debug:
+                self.logger().debug("%s (ratio/changed): %f -> %s" % (item.image_name, ratio, str(changed)))
 
             if changed:
                 # shift state
@@ -144,4 +155,6 @@ class SkipSimilarFrames(DiscardFilter):
             else:
                 self._discard(item)
 
+        if len(result) == 0:
+            return None
         return flatten_list(result)
@@ -1,4 +1,5 @@
 import argparse
+import logging
 import statistics
 from typing import List
 
@@ -8,6 +9,7 @@ from wai.logging import LOGGING_WARNING
 
 from idc.api import ImageData, ImageClassificationData, ImageSegmentationData, ObjectDetectionData
 from idc.filter import DiscardFilter
+from idc.video.util.frames import CHANNEL_ORDER_RGB, data_to_frame
 from kasperl.api import make_list, flatten_list
 
 
@@ -131,7 +133,7 @@ class SkipSimilarFrames2(DiscardFilter):
         :return: the scaled gray image
         :rtype: np.ndarray
         """
-        image = np.asarray(item.image)
+        image = data_to_frame(item, CHANNEL_ORDER_RGB)
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         gray = cv2.resize(gray, (self.image_size, self.image_size), interpolation=cv2.INTER_AREA)
         return gray
@@ -174,6 +176,15 @@ class SkipSimilarFrames2(DiscardFilter):
 
         return self.hash_weight * hash_similarity + (1.0 - self.hash_weight) * pixel_similarity
 
+    def _requires_list_input(self) -> bool:
+        """
+        Returns whether lists are expected as input for the _process method.
+
+        :return: True if list inputs are expected by the filter
+        :rtype: bool
+        """
+        return True
+
     def _do_process(self, data):
         """
         Processes the data record(s).
@@ -182,6 +193,7 @@ class SkipSimilarFrames2(DiscardFilter):
         :return: the potentially updated record(s)
         """
         result = []
+        debug = self.logger().isEnabledFor(logging.DEBUG)
         for item in make_list(data):
             # read image
             img = self._prepare_image(item)
@@ -193,7 +205,8 @@ class SkipSimilarFrames2(DiscardFilter):
                 continue
 
             similarity = self._similarity(img, self._last_image)
-            self.logger().debug("%s similarity to previous image: %f" % (item.image_name, similarity))
+            if debug:
+                self.logger().debug("%s similarity to previous image: %f" % (item.image_name, similarity))
             self._similarities.append(similarity)
 
             if similarity < self.threshold:
@@ -204,6 +217,8 @@ class SkipSimilarFrames2(DiscardFilter):
             else:
                 self._discard(item)
 
+        if len(result) == 0:
+            return None
         return flatten_list(result)
 
     def finalize(self):
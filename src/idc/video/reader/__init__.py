@@ -2,3 +2,5 @@ from ._video_file import VideoFileReader
 from ._webcam import WebcamReader
 from ._youtube import YoutubeReader
 from ._youtube_live import YoutubeLiveReader
+from ._raw_pipe import RawPipeReader
+from ._multi_source import MultiSourceReader
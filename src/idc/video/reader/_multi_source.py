@@ -0,0 +1,391 @@
+import argparse
+import os
+import threading
+from collections import deque
+from typing import List, Iterable
+
+from wai.logging import LOGGING_WARNING
+
+from kasperl.api import Reader
+from idc.api import DATATYPES, data_type_to_class, DataTypeSupporter, ImageData, FORMAT_JPEG
+from idc.video.util.batch import batch_items_per_input
+from idc.video.util.capture import BACKEND_ANY, BACKENDS, THREADS_DEFAULT, auto_threads, parse_capture_params, open_capture
+from idc.video.util.encoder import encode_frames
+from idc.video.util.frames import FRAME_FORMATS, FRAME_FORMAT_EXTENSIONS, encode_params, frame_to_data
+from idc.video.util.multi_source import SourceCapture, RoundRobinMerger, parse_source
+from idc.video.util.prefetch import Prefetcher
+from idc.video.util.transform import RESIZE_FIT, RESIZE_MODES, INTERPOLATION_AREA, INTERPOLATIONS, parse_crop, transform_frame
+
+
+class MultiSourceReader(Reader, DataTypeSupporter):
+    """
+    Reads frames from several live sources (webcams, streams) concurrently, merging them into a single stream.
+    """
+
+    def __init__(self, sources: List[str] = None, max_fps: List[float] = None, queue_size: int = None,
+                 wait_when_full: bool = None, max_frames: int = None,
+                 prefetch: int = None, lazy_encoding: bool = None, batch_size: int = None,
+                 backend: str = None, decoder_threads: int = None, capture_params: List[str] = None,
+                 image_format: str = None, quality: int = None, png_compression: int = None, num_encoders: int = None,
+                 crop: str = None, resize_width: int = None, resize_height: int = None, resize_mode: str = None,
+                 interpolation: str = None, prefix: str = None, data_type: str = None,
+                 logger_name: str = None, logging_level: str = LOGGING_WARNING):
+        """
+        Initializes the reader.
+
+        :param sources: the webcam IDs, URLs or files to read from
+        :type sources: list
+        :param max_fps: the maximum frames per second per source, either one value for all or one per source; <=0 for no limit
+        :type max_fps: list
+        :param queue_size: the number of frames to buffer per source
+        :type queue_size: int
+        :param wait_when_full: whether to wait for space rather than dropping the oldest frame when a buffer is full
+        :type wait_when_full: bool
+        :param max_frames: the maximum number of frames to read per source
+        :type max_frames: int
+        :param prefetch: the number of frames to encode ahead in a background thread, <=0 to disable
+        :type prefetch: int
+        :param lazy_encoding: whether to forward the decoded frames and only encode them when required
+        :type lazy_encoding: bool
+        :param batch_size: the number of frames per source to forward as a list, forwards them one by one if <=1
+        :type batch_size: int
+        :param backend: the capture backend to use (any/ffmpeg/gstreamer/v4l2)
+        :type backend: str
+        :param decoder_threads: the number of decoder threads per source, 0 for the backend's default, -1 to determine from the available cores
+        :type decoder_threads: int
+        :param capture_params: additional parameters (NAME=VALUE) for opening the captures
+        :type capture_params: list
+        :param image_format: the format to encode the frames in (JPEG/PNG/BMP/WEBP)
+        :type image_format: str
+        :param quality: the quality to use for JPEG and WebP (0-100), <0 for the encoder's default
+        :type quality: int
+        :param png_compression: the compression level to use for PNG (0-9), <0 for the encoder's default
+        :type png_compression: int
+        :param num_encoders: the number of threads for encoding the frames, <=1 to encode in the reading thread
+        :type num_encoders: int
+        :param crop: the rectangle 'x,y,width,height' (0-based) to crop the frames to, None or empty for no cropping
+        :type crop: str
+        :param resize_width: the width to resize the frames to, <=0 to preserve the aspect ratio using the height
+        :type resize_width: int
+        :param resize_height: the height to resize the frames to, <=0 to preserve the aspect ratio using the width
+        :type resize_height: int
+        :param resize_mode: how to resize if both width and height are specified (stretch/fit/fill)
+        :type resize_mode: str
+        :param interpolation: the interpolation to use for resizing (nearest/linear/cubic/area/lanczos)
+        :type interpolation: str
+        :param data_type: the type of output to generate from the images
+        :type data_type: str
+        :param logger_name: the name to use for the logger
+        :type logger_name: str
+        :param logging_level: the logging level to use
+        :type logging_level: str
+        """
+        super().__init__(logger_name=logger_name, logging_level=logging_level)
+        self.sources = sources
+        self.max_fps = max_fps
+        self.queue_size = queue_size
+        self.wait_when_full = wait_when_full
+        self.data_type = data_type
+        self.max_frames = max_frames
+        self.prefetch = prefetch
+        self.lazy_encoding = lazy_encoding
+        self.batch_size = batch_size
+        self.backend = backend
+        self.decoder_threads = decoder_threads
+        self.capture_params = capture_params
+        self.image_format = image_format
+        self.quality = quality
+        self.png_compression = png_compression
+        self.num_encoders = num_encoders
+        self.crop = crop
+        self.resize_width = resize_width
+        self.resize_height = resize_height
+        self.resize_mode = resize_mode
+        self.interpolation = interpolation
+        self.prefix = prefix
+        self._inputs = None
+        self._current_input = None
+        self._merger = None
+        self._labels = None
+        self._prefetcher = None
+        self._encode_params = None
+        self._decoder_threads = None
+        self._capture_params = None
+        self._max_fps = None
+        self._crop = None
+
+    def name(self) -> str:
+        """
+        Returns the name of the handler, used as sub-command.
+
+        :return: the name
+        :rtype: str
+        """
+        return "from-multi-source"
+
+    def description(self) -> str:
+        """
+        Returns a description of the reader.
+
+        :return: the description
+        :rtype: str
+        """
+        return "Reads frames from several live sources (webcams, stream URLs; files can be used as stand-ins) concurrently, using a capture thread per source, and merges them into a single stream. The sources get served in turn (round-robin) so that a fast source cannot starve the others. The current input gets set to the prefix and the source of each frame."
+
+    def _create_argparser(self) -> argparse.ArgumentParser:
+        """
+        Creates an argument parser. Derived classes need to fill in the options.
+
+        :return: the parser
+        :rtype: argparse.ArgumentParser
+        """
+        parser = super()._create_argparser()
+        parser.add_argument("-i", "--sources", type=str, nargs="+", default=None, help="The sources to read from: webcam IDs (numeric), stream URLs or files.", required=True)
+        parser.add_argument("-t", "--data_type", choices=DATATYPES, type=str, default=None, help="The type of data to forward", required=True)
+        parser.add_argument("--max_fps", type=float, nargs="*", default=None, help="The maximum number of frames per second to capture per source, either a single value for all sources or one per source; frames exceeding the rate only get grabbed, not decoded; no limit if <=0.", required=False)
+        parser.add_argument("--queue_size", type=int, default=2, help="The number of frames to buffer per source; when a buffer is full, the oldest frame gets dropped (see --wait_when_full).", required=False)
+        parser.add_argument("--wait_when_full", action="store_true", help="Whether the capture thread of a source waits for space when its buffer is full rather than dropping the oldest frame, e.g., when using files as sources.", required=False)
+        parser.add_argument("-m", "--max_frames", type=int, default=-1, help="Determines the maximum number of frames to read per source; ignored if <=0.", required=False)
+        parser.add_argument("--prefetch", type=int, default=0, help="The number of frames to encode ahead in a background thread, overlapping encoding with the processing of the frames; disabled if <=0.", required=False)
+        parser.add_argument("--lazy_encoding", action="store_true", help="Whether to forward the decoded frames as they are and only encode them (see --image_format) when a downstream plugin requires the image data; the video plugins use the decoded frames directly. Requires more memory per frame.", required=False)
+        parser.add_argument("--batch_size", type=int, default=1, help="The number of frames to forward as a list in one go, reducing the per-item overhead of the pipeline; the frames are collected in a separate batch per source, i.e., the frames of a source are held back until its batch is full (or reading ends); forwards the frames one by one if <=1.", required=False)
+        parser.add_argument("--backend", choices=sorted(BACKENDS.keys()), default=BACKEND_ANY, help="The backend to use for capturing the frames.", required=False)
+        parser.add_argument("--decoder_threads", type=int, default=THREADS_DEFAULT, help="The number of threads the backend should use for decoding per source; 0 uses the backend's default; -1 determines the number from the CPU cores available to the process (taking CPU affinity and cgroup limits into account), shared between the sources.", required=False)
+        parser.add_argument("--capture_params", type=str, nargs="*", default=None, help="Additional parameters for opening the captures, format: NAME=VALUE with NAME being the name of an OpenCV CAP_PROP_* constant (prefix can be omitted), e.g., HW_ACCELERATION=1.", required=False)
+        parser.add_argument("--image_format", choices=FRAME_FORMATS, default=FORMAT_JPEG, help="The image format to encode the frames in.", required=False)
+        parser.add_argument("--quality", type=int, default=-1, help="The quality to use for encoding the frames as JPEG or WEBP (0-100); uses the encoder's default if <0.", required=False)
+        parser.add_argument("--png_compression", type=int, default=-1, help="The compression level to use for encoding the frames as PNG (0-9); uses the encoder's default if <0.", required=False)
+        parser.add_argument("--num_encoders", type=int, default=1, help="The number of threads to use for encoding the frames, forwarding the frames in their original order; encodes in the reading thread if <=1.", required=False)
+        parser.add_argument("--crop", type=str, default=None, help="The rectangle to crop the frames to before resizing/encoding them, format: 'x,y,width,height' (0-based); gets clipped at the frame borders.", required=False)
+        parser.add_argument("--resize_width", type=int, default=-1, help="The width to resize the frames to before encoding them; preserves the aspect ratio using --resize_height if <=0.", required=False)
+        parser.add_argument("--resize_height", type=int, default=-1, help="The height to resize the frames to before encoding them; preserves the aspect ratio using --resize_width if <=0.", required=False)
+        parser.add_argument("--resize_mode", choices=RESIZE_MODES, default=RESIZE_FIT, help="How to resize the frames if both width and height are specified: 'stretch' ignores the aspect ratio, 'fit' scales the frames to fit within the dimensions, 'fill' scales them to cover the dimensions and crops the centre.", required=False)
+        parser.add_argument("--interpolation", choices=sorted(INTERPOLATIONS.keys()), default=INTERPOLATION_AREA, help="The interpolation to use for resizing the frames.", required=False)
+        parser.add_argument("-p", "--prefix", type=str, help="The prefix to use for the frames", required=False, default="source-")
+        return parser
+
+    def _apply_args(self, ns: argparse.Namespace):
+        """
+        Initializes the object with the arguments of the parsed namespace.
+
+        :param ns: the parsed arguments
+        :type ns: argparse.Namespace
+        """
+        super()._apply_args(ns)
+        self.sources = ns.sources
+        self.max_fps = ns.max_fps
+        self.queue_size = ns.queue_size
+        self.wait_when_full = ns.wait_when_full
+        self.data_type = ns.data_type
+        self.max_frames = ns.max_frames
+        self.prefetch = ns.prefetch
+        self.lazy_encoding = ns.lazy_encoding
+        self.batch_size = ns.batch_size
+        self.backend = ns.backend
+        self.decoder_threads = ns.decoder_threads
+        self.capture_params = ns.capture_params
+        self.image_format = ns.image_format
+        self.quality = ns.quality
+        self.png_compression = ns.png_compression
+        self.num_encoders = ns.num_encoders
+        self.crop = ns.crop
+        self.resize_width = ns.resize_width
+        self.resize_height = ns.resize_height
+        self.resize_mode = ns.resize_mode
+        self.interpolation = ns.interpolation
+        self.prefix = ns.prefix
+
+    def generates(self) -> List:
+        """
+        Returns the list of classes that get produced.
+
+        :return: the list of classes
+        :rtype: list
+        """
+        if self.data_type is None:
+            return [ImageData]
+        else:
+            return [data_type_to_class(self.data_type)]
+
+    def initialize(self):
+        """
+        Initializes the processing, e.g., for opening files or databases.
+        """
+        super().initialize()
+        if self.data_type is None:
+            raise Exception("No data type defined!")
+        if (self.sources is None) or (len(self.sources) == 0):
+            raise Exception("No sources defined!")
+        if (self.max_fps is None) or (len(self.max_fps) == 0):
+            self._max_fps = [0.0] * len(self.sources)
+        elif len(self.max_fps) == 1:
+            self._max_fps = list(self.max_fps) * len(self.sources)
+        elif len(self.max_fps) == len(self.sources):
+            self._max_fps = list(self.max_fps)
+        else:
+            raise Exception("Either one max_fps value for all sources or one per source required, sources/values: %d/%d" % (len(self.sources), len(self.max_fps)))
+        if self.queue_size is None:
+            self.queue_size = 2
+        if self.queue_size < 1:
+            raise Exception("queue_size must be at least 1, provided: %d" % self.queue_size)
+        if self.wait_when_full is None:
+            self.wait_when_full = False
+        if self.max_frames is None:
+            self.max_frames = -1
+        if self.prefetch is None:
+            self.prefetch = 0
+        if self.lazy_encoding is None:
+            self.lazy_encoding = False
+        if self.batch_size is None:
+            self.batch_size = 1
+        if self.backend is None:
+            self.backend = BACKEND_ANY
+        if self.backend not in BACKENDS:
+            raise Exception("Unknown capture backend: %s" % self.backend)
+        if self.decoder_threads is None:
+            self.decoder_threads = THREADS_DEFAULT
+        self._decoder_threads = self.decoder_threads
+        if self._decoder_threads < 0:
+            self._decoder_threads = auto_threads(len(self.sources))
+            self.logger().info("Decoder threads per source: %d" % self._decoder_threads)
+        self._capture_params = parse_capture_params(self.capture_params)
+        if self.image_format is None:
+            self.image_format = FORMAT_JPEG
+        if self.quality is None:
+            self.quality = -1
+        if self.png_compression is None:
+            self.png_compression = -1
+        if self.num_encoders is None:
+            self.num_encoders = 1
+        self._encode_params = encode_params(self.image_format, quality=self.quality, png_compression=self.png_compression)
+        if self.resize_width is None:
+            self.resize_width = -1
+        if self.resize_height is None:
+            self.resize_height = -1
+        if self.resize_mode is None:
+            self.resize_mode = RESIZE_FIT
+        if self.resize_mode not in RESIZE_MODES:
+            raise Exception("Unknown resize mode: %s" % self.resize_mode)
+        if self.interpolation is None:
+            self.interpolation = INTERPOLATION_AREA
+        if self.interpolation not in INTERPOLATIONS:
+            raise Exception("Unknown interpolation: %s" % self.interpolation)
+        self._crop = parse_crop(self.crop)
+        if self.prefix is None:
+            self.prefix = ""
+        self._inputs = [list(self.sources)]
+
+    def _open(self, source):
+        """
+        Opens the capture for the source.
+
+        :param source: the device ID, file or URL
+        :return: the capture
+        """
+        return open_capture(source, backend=self.backend, threads=self._decoder_threads, params=self._capture_params)
+
+    def read(self) -> Iterable:
+        """
+        Loads the data and returns the items one by one.
+
+        :return: the data
+        :rtype: Iterable
+        """
+        self._current_input = self._inputs.pop(0)
+        self.logger().info("Reading from %d source(s): %s" % (len(self._current_input), ", ".join(self._current_input)))
+        cond = threading.Condition()
+        sources = []
+        for i, source in enumerate(self._current_input):
+            sources.append(SourceCapture(i, parse_source(source), self._open, cond, max_fps=self._max_fps[i],
+                                         queue_size=self.queue_size, wait_when_full=self.wait_when_full,
+                                         max_frames=self.max_frames, logger=self.logger()))
+        self._merger = RoundRobinMerger(sources, cond, logger=self.logger())
+        self._merger.start()
+        # the items can get processed ahead, the source of each item gets set when forwarding it
+        self._labels = deque()
+
+        items = self._read_sources()
+        if (self.num_encoders > 1) and not self.lazy_encoding:
+            items = encode_frames(items, self.num_encoders)
+        if self.prefetch > 0:
+            self._prefetcher = Prefetcher(items, self.prefetch)
+            items = self._prefetcher
+        items = self._tag(items)
+        if self.batch_size > 1:
+            items = batch_items_per_input(items, self.batch_size, self.session)
+        for item in items:
+            yield item
+        if self._prefetcher is not None:
+            self.logger().info("Prefetch: " + self._prefetcher.stats())
+            self._prefetcher = None
+        self._stop_merger()
+
+    def _tag(self, items: Iterable) -> Iterable:
+        """
+        Sets the current input of the session to the source of each item.
+
+        :param items: the items to forward
+        :type items: Iterable
+        :return: the items
+        :rtype: Iterable
+        """
+        for item in items:
+            self.session.current_input = self._labels.popleft()
+            yield item
+
+    def _read_sources(self) -> Iterable:
+        """
+        Reads the frames from the sources, in turn.
+
+        :return: the data
+        :rtype: Iterable
+        """
+        cls = data_type_to_class(self.data_type)
+
+        while True:
+            frame = self._merger.next()
+            if frame is None:
+                break
+            source, frame_no, frame_curr, _ = frame
+            frame_curr = transform_frame(frame_curr, crop=self._crop, resize_width=self.resize_width,
+                                         resize_height=self.resize_height, resize_mode=self.resize_mode,
+                                         interpolation=self.interpolation)
+            label = self.prefix + str(source.source)
+            filename = os.path.join(
+                label,
+                "%s%d-%08d%s" % (self.prefix, source.index, frame_no, FRAME_FORMAT_EXTENSIONS[self.image_format]))
+            self._labels.append(label)
+            yield frame_to_data(cls, frame_curr, os.path.basename(filename),
+                                lazy=self.lazy_encoding or (self.num_encoders > 1),
+                                image_format=self.image_format, params=self._encode_params)
+
+    def _stop_merger(self):
+        """
+        Stops the capture threads, if active, and logs the statistics of the sources.
+        """
+        if self._merger is None:
+            return
+        self._merger.stop()
+        for source in self._merger.sources:
+            self.logger().info("Source #%d (%s): %s" % (source.index, str(source.source), source.stats()))
+        self._merger = None
+
+    def has_finished(self) -> bool:
+        """
+        Returns whether reading has finished.
+
+        :return: True if finished
+        :rtype: bool
+        """
+        return len(self._inputs) == 0
+
+    def finalize(self):
+        """
+        Finishes the reading, e.g., for closing files or databases.
+        """
+        if self._prefetcher is not None:
+            self._prefetcher.stop()
+            self._prefetcher = None
+        self._stop_merger()
+        if self._current_input is not None:
+            super().finalize()
@@ -0,0 +1,427 @@
+import argparse
+import cv2
+import numpy as np
+import os
+from typing import List, Iterable
+
+from wai.logging import LOGGING_WARNING
+
+from kasperl.api import Reader
+from idc.api import DATATYPES, data_type_to_class, DataTypeSupporter, ImageData, FORMAT_JPEG
+from idc.video.util.batch import batch_items
+from idc.video.util.encoder import encode_frames
+from idc.video.util.frames import FRAME_FORMATS, FRAME_FORMAT_EXTENSIONS, encode_params, frame_to_data
+from idc.video.util.pipe import STDIN, STREAM_FORMAT_RAWVIDEO, STREAM_FORMAT_MJPEG, STREAM_FORMATS, PIXEL_FORMAT_BGR24, \
+    PIXEL_FORMATS, open_pipe, read_raw_frames, raw_to_bgr, read_mjpeg_frames, jpeg_size
+from idc.video.util.prefetch import Prefetcher
+from idc.video.util.transform import RESIZE_FIT, RESIZE_MODES, INTERPOLATION_AREA, INTERPOLATIONS, parse_crop, transform_frame
+
+
+class RawPipeReader(Reader, DataTypeSupporter):
+    """
+    Reads frames from a raw video or MJPEG stream piped into stdin or a named pipe (FIFO),
+    e.g., the output of ffmpeg or a camera tool.
+    """
+
+    def __init__(self, source: str = None, stream_format: str = None, width: int = None, height: int = None,
+                 pixel_format: str = None, from_frame: int = None, to_frame: int = None,
+                 nth_frame: int = None, max_frames: int = None,
+                 prefetch: int = None, lazy_encoding: bool = None, batch_size: int = None,
+                 image_format: str = None, quality: int = None, png_compression: int = None, num_encoders: int = None,
+                 crop: str = None, resize_width: int = None, resize_height: int = None, resize_mode: str = None,
+                 interpolation: str = None, prefix: str = None, data_type: str = None,
+                 logger_name: str = None, logging_level: str = LOGGING_WARNING):
+        """
+        Initializes the reader.
+
+        :param source: the named pipe (or file) to read from, '-' for stdin
+        :type source: str
+        :param stream_format: the format of the stream (rawvideo/mjpeg)
+        :type stream_format: str
+        :param width: the width of the raw frames
+        :type width: int
+        :param height: the height of the raw frames
+        :type height: int
+        :param pixel_format: the pixel format of the raw frames (bgr24/rgb24/bgra/rgba/gray/yuv420p/nv12/yuyv422)
+        :type pixel_format: str
+        :param from_frame: the index of the first frame to use
+        :type from_frame: int
+        :param to_frame: the index of the last frame to use
+        :type to_frame: int
+        :param nth_frame: determines whether frames get skipped
+        :type nth_frame: int
+        :param max_frames: the maximum number of frames to read
+        :type max_frames: int
+        :param prefetch: the number of frames to read ahead in a background thread, <=0 to disable
+        :type prefetch: int
+        :param lazy_encoding: whether to forward the decoded frames and only encode them when required
+        :type lazy_encoding: bool
+        :param batch_size: the number of frames to forward as a list, forwards them one by one if <=1
+        :type batch_size: int
+        :param image_format: the format to encode the frames in (JPEG/PNG/BMP/WEBP)
+        :type image_format: str
+        :param quality: the quality to use for JPEG and WebP (0-100), <0 for the encoder's default
+        :type quality: int
+        :param png_compression: the compression level to use for PNG (0-9), <0 for the encoder's default
+        :type png_compression: int
+        :param num_encoders: the number of threads for encoding the frames, <=1 to encode in the reading thread
+        :type num_encoders: int
+        :param crop: the rectangle 'x,y,width,height' (0-based) to crop the frames to, None or empty for no cropping
+        :type crop: str
+        :param resize_width: the width to resize the frames to, <=0 to preserve the aspect ratio using the height
+        :type resize_width: int
+        :param resize_height: the height to resize the frames to, <=0 to preserve the aspect ratio using the width
+        :type resize_height: int
+        :param resize_mode: how to resize if both width and height are specified (stretch/fit/fill)
+        :type resize_mode: str
+        :param interpolation: the interpolation to use for resizing (nearest/linear/cubic/area/lanczos)
+        :type interpolation: str
+        :param data_type: the type of output to generate from the images
+        :type data_type: str
+        :param logger_name: the name to use for the logger
+        :type logger_name: str
+        :param logging_level: the logging level to use
+        :type logging_level: str
+        """
+        super().__init__(logger_name=logger_name, logging_level=logging_level)
+        self.source = source
+        self.stream_format = stream_format
+        self.width = width
+        self.height = height
+        self.pixel_format = pixel_format
+        self.data_type = data_type
+        self.from_frame = from_frame
+        self.to_frame = to_frame
+        self.nth_frame = nth_frame
+        self.max_frames = max_frames
+        self.prefetch = prefetch
+        self.lazy_encoding = lazy_encoding
+        self.batch_size = batch_size
+        self.image_format = image_format
+        self.quality = quality
+        self.png_compression = png_compression
+        self.num_encoders = num_encoders
+        self.crop = crop
+        self.resize_width = resize_width
+        self.resize_height = resize_height
+        self.resize_mode = resize_mode
+        self.interpolation = interpolation
+        self.prefix = prefix
+        self._fp = None
+        self._frame_no = None
+        self._frame_count = None
+        self._inputs = None
+        self._current_input = None
+        self._prefetcher = None
+        self._encode_params = None
+        self._crop = None
+        self._pass_through = None
+
+    def name(self) -> str:
+        """
+        Returns the name of the handler, used as sub-command.
+
+        :return: the name
+        :rtype: str
+        """
+        return "from-raw-pipe"
+
+    def description(self) -> str:
+        """
+        Returns a description of the reader.
+
+        :return: the description
+        :rtype: str
+        """
+        return "Reads frames from a raw video (fixed-size frames) or MJPEG (concatenated JPEG images) stream piped into stdin or a named pipe (FIFO), e.g., the output of 'ffmpeg -f rawvideo -pix_fmt bgr24 -' or 'ffmpeg -f mjpeg -'. Raw frames get read into a preallocated buffer, MJPEG frames get forwarded as they are if no transformation or re-encoding is required."
+
+    def _create_argparser(self) -> argparse.ArgumentParser:
+        """
+        Creates an argument parser. Derived classes need to fill in the options.
+
+        :return: the parser
+        :rtype: argparse.ArgumentParser
+        """
+        parser = super()._create_argparser()
+        parser.add_argument("-i", "--source", type=str, default=STDIN, help="The named pipe (FIFO) or file to read the stream from; '-' reads from stdin.", required=False)
+        parser.add_argument("-f", "--stream_format", choices=STREAM_FORMATS, default=STREAM_FORMAT_RAWVIDEO, help="The format of the stream: 'rawvideo' for fixed-size frames (requires --width/--height/--pixel_format), 'mjpeg' for concatenated JPEG images.", required=False)
+        parser.add_argument("-W", "--width", type=int, default=-1, help="The width of the raw frames.", required=False)
+        parser.add_argument("-H", "--height", type=int, default=-1, help="The height of the raw frames.", required=False)
+        parser.add_argument("--pixel_format", choices=sorted(PIXEL_FORMATS.keys()), default=PIXEL_FORMAT_BGR24, help="The pixel format of the raw frames (ffmpeg's -pix_fmt).", required=False)
+        parser.add_argument("-t", "--data_type", choices=DATATYPES, type=str, default=None, help="The type of data to forward", required=True)
+        parser.add_argument("-F", "--from_frame", type=int, default=1, help="Determines with which frame to start the stream (1-based index).", required=False)
+        parser.add_argument("-T", "--to_frame", type=int, default=-1, help="Determines after which frame to stop (1-based index); ignored if <=0.", required=False)
+        parser.add_argument("-n", "--nth_frame", type=int, default=1, help="Determines whether frames get skipped and only evert nth frame gets forwarded.", required=False)
+        parser.add_argument("-m", "--max_frames", type=int, default=-1, help="Determines the maximum number of frames to read; ignored if <=0.", required=False)
+        parser.add_argument("--prefetch", type=int, default=0, help="The number of frames to read ahead in a background thread, overlapping reading with the processing of the frames; disabled if <=0.", required=False)
+        parser.add_argument("--lazy_encoding", action="store_true", help="Whether to forward the decoded frames as they are and only encode them (see --image_format) when a downstream plugin requires the image data; the video plugins use the decoded frames directly. Requires more memory per frame.", required=False)
+        parser.add_argument("--batch_size", type=int, default=1, help="The number of frames to forward as a list in one go, reducing the per-item overhead of the pipeline; forwards the frames one by one if <=1.", required=False)
+        parser.add_argument("--image_format", choices=FRAME_FORMATS, default=FORMAT_JPEG, help="The image format to encode the frames in; MJPEG frames get forwarded without re-encoding when using JPEG without cropping/resizing.", required=False)
+        parser.add_argument("--quality", type=int, default=-1, help="The quality to use for encoding the frames as JPEG or WEBP (0-100); uses the encoder's default if <0.", required=False)
+        parser.add_argument("--png_compression", type=int, default=-1, help="The compression level to use for encoding the frames as PNG (0-9); uses the encoder's default if <0.", required=False)
+        parser.add_argument("--num_encoders", type=int, default=1, help="The number of threads to use for encoding the frames, forwarding the frames in their original order; encodes in the reading thread if <=1.", required=False)
+        parser.add_argument("--crop", type=str, default=None, help="The rectangle to crop the frames to before resizing/encoding them, format: 'x,y,width,height' (0-based); gets clipped at the frame borders.", required=False)
+        parser.add_argument("--resize_width", type=int, default=-1, help="The width to resize the frames to before encoding them; preserves the aspect ratio using --resize_height if <=0.", required=False)
+        parser.add_argument("--resize_height", type=int, default=-1, help="The height to resize the frames to before encoding them; preserves the aspect ratio using --resize_width if <=0.", required=False)
+        parser.add_argument("--resize_mode", choices=RESIZE_MODES, default=RESIZE_FIT, help="How to resize the frames if both width and height are specified: 'stretch' ignores the aspect ratio, 'fit' scales the frames to fit within the dimensions, 'fill' scales them to cover the dimensions and crops the centre.", required=False)
+        parser.add_argument("--interpolation", choices=sorted(INTERPOLATIONS.keys()), default=INTERPOLATION_AREA, help="The interpolation to use for resizing the frames.", required=False)
+        parser.add_argument("-p", "--prefix", type=str, help="The prefix to use for the frames", required=False, default="pipe-")
+        return parser
+
+    def _apply_args(self, ns: argparse.Namespace):
+        """
+        Initializes the object with the arguments of the parsed namespace.
+
+        :param ns: the parsed arguments
+        :type ns: argparse.Namespace
+        """
+        super()._apply_args(ns)
+        self.source = ns.source
+        self.stream_format = ns.stream_format
+        self.width = ns.width
+        self.height = ns.height
+        self.pixel_format = ns.pixel_format
+        self.data_type = ns.data_type
+        self.from_frame = ns.from_frame
+        self.to_frame = ns.to_frame
+        self.nth_frame = ns.nth_frame
+        self.max_frames = ns.max_frames
+        self.prefetch = ns.prefetch
+        self.lazy_encoding = ns.lazy_encoding
+        self.batch_size = ns.batch_size
+        self.image_format = ns.image_format
+        self.quality = ns.quality
+        self.png_compression = ns.png_compression
+        self.num_encoders = ns.num_encoders
+        self.crop = ns.crop
+        self.resize_width = ns.resize_width
+        self.resize_height = ns.resize_height
+        self.resize_mode = ns.resize_mode
+        self.interpolation = ns.interpolation
+        self.prefix = ns.prefix
+
+    def generates(self) -> List:
+        """
+        Returns the list of classes that get produced.
+
+        :return: the list of classes
+        :rtype: list
+        """
+        if self.data_type is None:
+            return [ImageData]
+        else:
+            return [data_type_to_class(self.data_type)]
+
+    def initialize(self):
+        """
+        Initializes the processing, e.g., for opening files or databases.
+        """
+        super().initialize()
+        if self.data_type is None:
+            raise Exception("No data type defined!")
+        if self.source is None:
+            self.source = STDIN
+        if self.stream_format is None:
+            self.stream_format = STREAM_FORMAT_RAWVIDEO
+        if self.stream_format not in STREAM_FORMATS:
+            raise Exception("Unknown stream format: %s" % self.stream_format)
+        if self.pixel_format is None:
+            self.pixel_format = PIXEL_FORMAT_BGR24
+        if self.pixel_format not in PIXEL_FORMATS:
+            raise Exception("Unknown pixel format: %s" % self.pixel_format)
+        if self.stream_format == STREAM_FORMAT_RAWVIDEO:
+            if (self.width is None) or (self.width <= 0) or (self.height is None) or (self.height <= 0):
+                raise Exception("Width and height of the frames required for raw video streams!")
+        if (self.from_frame is None) or (self.from_frame < 0):
+            self.from_frame = 1
+        if self.to_frame is None:
+            self.to_frame = -1
+        if self.nth_frame is None:
+            self.nth_frame = 1
+        if self.nth_frame < 1:
+            raise Exception("nth_frame must be at least 1, provided: %d" % self.nth_frame)
+        if self.max_frames is None:
+            self.max_frames = -1
+        if self.prefetch is None:
+            self.prefetch = 0
+        if self.lazy_encoding is None:
+            self.lazy_encoding = False
+        if self.batch_size is None:
+            self.batch_size = 1
+        if self.image_format is None:
+            self.image_format = FORMAT_JPEG
+        if self.quality is None:
+            self.quality = -1
+        if self.png_compression is None:
+            self.png_compression = -1
+        if self.num_encoders is None:
+            self.num_encoders = 1
+        self._encode_params = encode_params(self.image_format, quality=self.quality, png_compression=self.png_compression)
+        if self.resize_width is None:
+            self.resize_width = -1
+        if self.resize_height is None:
+            self.resize_height = -1
+        if self.resize_mode is None:
+            self.resize_mode = RESIZE_FIT
+        if self.resize_mode not in RESIZE_MODES:
+            raise Exception("Unknown resize mode: %s" % self.resize_mode)
+        if self.interpolation is None:
+            self.interpolation = INTERPOLATION_AREA
+        if self.interpolation not in INTERPOLATIONS:
+            raise Exception("Unknown interpolation: %s" % self.interpolation)
+        self._crop = parse_crop(self.crop)
+        if self.prefix is None:
+            self.prefix = ""
+        # forward the JPEG images of the stream without decoding/re-encoding them?
+        self._pass_through = (self.stream_format == STREAM_FORMAT_MJPEG) \
+            and (self.image_format == FORMAT_JPEG) \
+            and (self._crop is None) and (self.resize_width <= 0) and (self.resize_height <= 0) \
+            and not self.lazy_encoding
+        if self._pass_through:
+            self.logger().info("Forwarding JPEG images of stream without re-encoding")
+        self._inputs = [self.source]
+
+    def read(self) -> Iterable:
+        """
+        Loads the data and returns the items one by one.
+
+        :return: the data
+        :rtype: Iterable
+        """
+        self._current_input = self._inputs.pop(0)
+        self.session.current_input = self.prefix + ("stdin" if (self._current_input == STDIN) else self._current_input)
+        self.logger().info("Reading from pipe: " + str(self._current_input))
+
+        items = self._read_input()
+        if (self.num_encoders > 1) and not self.lazy_encoding:
+            items = encode_frames(items, self.num_encoders)
+        if self.prefetch > 0:
+            self._prefetcher = Prefetcher(items, self.prefetch)
+            items = self._prefetcher
+        if self.batch_size > 1:
+            items = batch_items(items, self.batch_size, self.session)
+        for item in items:
+            yield item
+        if self._prefetcher is not None:
+            self.logger().info("Prefetch: " + self._prefetcher.stats())
+            self._prefetcher = None
+
+    def _frames(self) -> Iterable:
+        """
+        Returns the frames of the stream, either raw frames (buffer gets reused) or JPEG images.
+
+        :return: the frames
+        :rtype: Iterable
+        """
+        if self.stream_format == STREAM_FORMAT_MJPEG:
+            return read_mjpeg_frames(self._fp, logger=self.logger())
+        else:
+            return read_raw_frames(self._fp, self.width, self.height, self.pixel_format, logger=self.logger())
+
+    def _to_data(self, cls, frame, image_name: str):
+        """
+        Turns the raw frame or JPEG image into a data container.
+
+        :param cls: the data container class to use
+        :param frame: the raw frame (np.ndarray) or JPEG image (bytes)
+        :param image_name: the name for the image
+        :type image_name: str
+        :return: the container, None if the JPEG image could not be decoded
+        """
+        lazy = self.lazy_encoding or (self.num_encoders > 1)
+        if isinstance(frame, bytes):
+            if self._pass_through:
+                size = jpeg_size(frame)
+                if size is not None:
+                    return cls(image_name=image_name, data=frame, image_format=FORMAT_JPEG, image_size=size)
+            frame = cv2.imdecode(np.frombuffer(frame, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                self.logger().warning("Failed to decode JPEG image: %s" % image_name)
+                return None
+        else:
+            buffer = frame
+            frame = raw_to_bgr(buffer, self.pixel_format)
+        frame = transform_frame(frame, crop=self._crop, resize_width=self.resize_width,
+                                resize_height=self.resize_height, resize_mode=self.resize_mode,
+                                interpolation=self.interpolation)
+        # the read buffer gets reused, frames that are kept around need their own copy
+        if lazy and (self.stream_format == STREAM_FORMAT_RAWVIDEO) and np.shares_memory(frame, buffer):
+            frame = frame.copy()
+        return frame_to_data(cls, frame, image_name, lazy=lazy,
+                             image_format=self.image_format, params=self._encode_params)
+
+    def _read_input(self) -> Iterable:
+        """
+        Reads the frames from the current input.
+
+        :return: the data
+        :rtype: Iterable
+        """
+        self._fp = open_pipe(self._current_input)
+        self._frame_no = 0
+        self._frame_count = 0
+
+        cls = data_type_to_class(self.data_type)
+
+        count = 0
+        try:
+            for frame in self._frames():
+                # next frame
+                self._frame_no += 1
+                count += 1
+
+                # within frame window?
+                if self.from_frame > 0:
+                    if self._frame_no < self.from_frame:
+                        continue
+                if self.to_frame > 0:
+                    if self._frame_no >= self.to_frame:
+                        break
+
+                # skip frame?
+                if (self.nth_frame > 1) and (count < self.nth_frame):
+                    continue
+
+                # max frames reached?
+                if (self.max_frames > 0) and (self._frame_count >= self.max_frames):
+                    break
+
+                count = 0
+                filename = os.path.join(
+                    self.session.current_input,
+                    "%s%08d%s" % (self.prefix, self._frame_no, FRAME_FORMAT_EXTENSIONS[self.image_format]))
+                item = self._to_data(cls, frame, os.path.basename(filename))
+                if item is None:
+                    continue
+                self._frame_count += 1
+                yield item
+        finally:
+            self._close()
+
+    def _close(self):
+        """
+        Closes the stream, if necessary.
+        """
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def has_finished(self) -> bool:
+        """
+        Returns whether reading has finished.
+
+        :return: True if finished
+        :rtype: bool
+        """
+        return len(self._inputs) == 0
+
+    def finalize(self):
+        """
+        Finishes the reading, e.g., for closing files or databases.
+        """
+        if self._prefetcher is not None:
+            self._prefetcher.stop()
+            self._prefetcher = None
+        if self._current_input is not None:
+            super().finalize()
+            self._close()
@@ -1,15 +1,43 @@
 import argparse
 import cv2
+import glob
 import math
 import os
-from typing import List, Iterable, Union
+import random
+import time
+import traceback
+import numpy as np
+from collections import deque
+from functools import partial
+from typing import Dict, List, Iterable, Optional, Union
 
-from seppl.variables import VariableSupporter, variable_list
+from seppl.variables import VariableSupporter, variable_list, expand_variables
 from seppl.io import locate_files
 from wai.logging import LOGGING_WARNING
 
-from kasperl.api import Reader
+from kasperl.api import Reader, Session
 from idc.api import DATATYPES, data_type_to_class, DataTypeSupporter, ImageData, FORMAT_JPEG
+from idc.video.util.archive import ARCHIVE_SEPARATOR, is_archive_path, locate_members, file_stat, path_exists
+from idc.video.util.batch import batch_items, batch_items_per_input
+from idc.video.util.capture import BACKEND_ANY, BACKENDS, THREADS_DEFAULT, auto_threads, parse_capture_params, open_capture, seek_frame
+from idc.video.util.checkpoint import Checkpoint
+from idc.video.util.manifest import MANIFEST_EXTENSIONS, FIELD_PATH, FIELD_ERROR, FIELD_FPS, FIELD_FRAME_COUNT, FIELD_DURATION, manifest_format, load_manifest, is_current, probe_video
+from idc.video.util.keyframes import KEYFRAMES_OFF, KEYFRAMES_NEAREST, KEYFRAMES_MODES, read_keyframes, nearest_keyframes
+from idc.video.util.keyframes import keyframe_positions, split_segments
+from idc.video.util.parallel import ORDER_FILE, ORDER_INTERLEAVED, ORDERS, DecoderPool
+from idc.video.util.encoder import encode_frames
+from idc.video.util.index import get_index
+from idc.video.util.frame_cache import FrameCache
+from idc.video.util.frame_list import UNIT_FRAME, UNIT_TIME, UNITS, load_frame_list, lookup_frame_list
+from idc.video.util.frames import FRAME_FORMATS, FRAME_FORMAT_EXTENSIONS, CHANNEL_ORDER_BGR, encode_params, frame_to_data
+from idc.video.util.prefetch import Prefetcher
+from idc.video.util.read_ahead import ReadAhead
+from idc.video.util.sampling import SAMPLING_UNIFORM, SAMPLINGS, probe_frame_count, draw_sample
+from idc.video.util.shm_ring import FrameRing, slot_size_bytes
+from idc.video.util.sharding import SHARD_POLICY_COUNT, SHARD_POLICY_SIZE, SHARD_POLICY_DURATION, SHARD_POLICIES, assign_shards, resume_position
+from idc.video.util.work_queue import STATE_CLAIMED, WorkQueue
+from idc.video.util.timestamps import TIME_EPSILON, parse_time, next_grid_time
+from idc.video.util.transform import RESIZE_FIT, RESIZE_MODES, INTERPOLATION_AREA, INTERPOLATIONS, parse_crop, transform_frame
 
 
 class VideoFileReader(Reader, VariableSupporter, DataTypeSupporter):
@@ -19,8 +47,22 @@ class VideoFileReader(Reader, VariableSupporter, DataTypeSupporter):
 
     def __init__(self, source: Union[str, List[str]] = None, source_list: Union[str, List[str]] = None,
                  from_frame: int = None, to_frame: int = None, nth_frame: int = None,
-                 fps_factor: float = None, max_frames: int = None, fast: bool = None,
-                 prefix: str = None, data_type: str = None, resume_from: str = None,
+                 fps_factor: float = None, max_frames: int = None, fast: bool = None, seek: bool = None,
+                 from_time: str = None, to_time: str = None, every_ms: float = None,
+                 frame_list: Union[str, Dict] = None, frame_list_unit: str = None, frame_list_gap: int = None,
+                 num_samples: int = None, sampling: str = None, seed: int = None,
+                 keyframes: str = None, num_workers: int = None, worker_order: str = None, num_segments: int = None,
+                 shm_slots: int = None, shm_slot_size: float = None,
+                 index: bool = None, index_dir: str = None, cache_dir: str = None, cache_size: int = None, cache_scale: float = None,
+                 prefetch: int = None, read_ahead: int = None, staging_dir: str = None, staging_size: int = None,
+                 lazy_encoding: bool = None, batch_size: int = None,
+                 backend: str = None, decoder_threads: int = None, capture_params: List[str] = None,
+                 image_format: str = None, quality: int = None, png_compression: int = None, num_encoders: int = None,
+                 crop: str = None, resize_width: int = None, resize_height: int = None, resize_mode: str = None,
+                 interpolation: str = None, prefix: str = None, data_type: str = None, resume_from: str = None,
+                 shard_index: int = None, num_shards: int = None, shard_policy: str = None,
+                 queue_dir: str = None, queue_timeout: float = None, queue_wait: bool = None,
+                 checkpoint: str = None, checkpoint_interval: int = None,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the reader.
@@ -39,10 +81,104 @@ class VideoFileReader(Reader, VariableSupporter, DataTypeSupporter):
         :type max_frames: int
         :param fast: whether to perform fast frame extraction
         :type fast: bool
+        :param seek: whether to seek to the first frame rather than decoding all the frames preceding it
+        :type seek: bool
+        :param from_time: the timestamp ([[HH:]MM:]SS[.fff]) of the first frame to use, None to start from the beginning
+        :type from_time: str
+        :param to_time: the timestamp ([[HH:]MM:]SS[.fff]) before which to stop, None to read till the end
+        :type to_time: str
+        :param every_ms: the interval in milliseconds between forwarded frames (overrides nth_frame/fps_factor), <=0 to disable
+        :type every_ms: float
+        :param frame_list: the CSV file with the frames (video, frame number or timestamp) to extract or the already loaded frame lists, None to disable
+        :type frame_list: str or dict
+        :param frame_list_unit: the unit of the frames in the frame list (frame/time)
+        :type frame_list_unit: str
+        :param frame_list_gap: the maximum number of frames to decode forward rather than seeking when extracting listed frames without an index
+        :type frame_list_gap: int
+        :param num_samples: the number of frames to sample randomly across all videos, <=0 to disable
+        :type num_samples: int
+        :param sampling: how to sample the frames (uniform/stratified)
+        :type sampling: str
+        :param seed: the seed for the random sampling, None for a random seed
+        :type seed: int
+        :param keyframes: whether to only extract keyframes (off/all/nearest)
+        :type keyframes: str
+        :param num_workers: the number of worker processes for decoding files in parallel, <=1 to decode in this process
+        :type num_workers: int
+        :param worker_order: how to forward the frames decoded by the workers (file/interleaved)
+        :type worker_order: str
+        :param num_segments: the number of segments to split each video into for decoding them in parallel, <=1 to disable
+        :type num_segments: int
+        :param shm_slots: the number of shared memory slots for handing over the frames from the worker processes, <=0 to disable
+        :type shm_slots: int
+        :param shm_slot_size: the size of a shared memory slot in MB
+        :type shm_slot_size: float
+        :param index: whether to use a frame index for frame counts, keyframe positions and progress
+        :type index: bool
+        :param index_dir: the directory for the frame index files, None to store them next to the videos
+        :type index_dir: str
+        :param cache_dir: the directory for caching the decoded frames, None to disable
+        :type cache_dir: str
+        :param cache_size: the maximum size of the frame cache in MB
+        :type cache_size: int
+        :param cache_scale: the factor to scale the frames with before caching them (0-1]
+        :type cache_scale: float
+        :param prefetch: the number of frames to decode ahead in a background thread, <=0 to disable
+        :type prefetch: int
+        :param read_ahead: the number of upcoming files to read ahead in a background thread, <=0 to disable
+        :type read_ahead: int
+        :param staging_dir: the local directory to stage the files read ahead in, None to only warm the page cache
+        :type staging_dir: str
+        :param staging_size: the maximum size in MB of the files staged in the staging directory
+        :type staging_size: int
+        :param lazy_encoding: whether to forward the decoded frames and only encode them when required
+        :type lazy_encoding: bool
+        :param batch_size: the number of frames to forward as a list, forwards them one by one if <=1
+        :type batch_size: int
+        :param backend: the capture backend to use (any/ffmpeg/gstreamer/v4l2)
+        :type backend: str
+        :param decoder_threads: the number of decoder threads, 0 for the backend's default, -1 to determine from the available cores
+        :type decoder_threads: int
+        :param capture_params: additional parameters (NAME=VALUE) for opening the capture
+        :type capture_params: list
+        :param image_format: the format to encode the frames in (JPEG/PNG/BMP/WEBP)
+        :type image_format: str
+        :param quality: the quality to use for JPEG and WebP (0-100), <0 for the encoder's default
+        :type quality: int
+        :param png_compression: the compression level to use for PNG (0-9), <0 for the encoder's default
+        :type png_compression: int
+        :param num_encoders: the number of threads for encoding the frames, <=1 to encode in the reading thread
+        :type num_encoders: int
+        :param crop: the rectangle 'x,y,width,height' (0-based) to crop the frames to, None or empty for no cropping
+        :type crop: str
+        :param resize_width: the width to resize the frames to, <=0 to preserve the aspect ratio using the height
+        :type resize_width: int
+        :param resize_height: the height to resize the frames to, <=0 to preserve the aspect ratio using the width
+        :type resize_height: int
+        :param resize_mode: how to resize if both width and height are specified (stretch/fit/fill)
+        :type resize_mode: str
+        :param interpolation: the interpolation to use for resizing (nearest/linear/cubic/area/lanczos)
+        :type interpolation: str
         :param data_type: the type of output to generate from the images
         :type data_type: str
         :param resume_from: the file to resume from (glob)
         :type resume_from: str
+        :param shard_index: the shard to read (0-based)
+        :type shard_index: int
+        :param num_shards: the number of shards to split the inputs into, <=1 to disable
+        :type num_shards: int
+        :param shard_policy: how to assign the inputs to the shards (count/size/duration)
+        :type shard_policy: str
+        :param queue_dir: the directory of the work queue shared with other processes, None to disable
+        :type queue_dir: str
+        :param queue_timeout: the time in seconds after which claims of other processes are considered stale
+        :type queue_timeout: float
+        :param queue_wait: whether to wait for videos claimed by other processes to finish (or their claims to go stale)
+        :type queue_wait: bool
+        :param checkpoint: the state file for recording the last processed frame per video, None to disable
+        :type checkpoint: str
+        :param checkpoint_interval: the number of processed frames after which to save the state file
+        :type checkpoint_interval: int
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -58,13 +194,83 @@ class VideoFileReader(Reader, VariableSupporter, DataTypeSupporter):
         self.fps_factor = fps_factor
         self.max_frames = max_frames
         self.fast = fast
+        self.seek = seek
+        self.from_time = from_time
+        self.to_time = to_time
+        self.every_ms = every_ms
+        self.frame_list = frame_list
+        self.frame_list_unit = frame_list_unit
+        self.frame_list_gap = frame_list_gap
+        self.num_samples = num_samples
+        self.sampling = sampling
+        self.seed = seed
+        self.keyframes = keyframes
+        self.num_workers = num_workers
+        self.worker_order = worker_order
+        self.num_segments = num_segments
+        self.shm_slots = shm_slots
+        self.shm_slot_size = shm_slot_size
+        self.index = index
+        self.index_dir = index_dir
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+        self.cache_scale = cache_scale
+        self.prefetch = prefetch
+        self.read_ahead = read_ahead
+        self.staging_dir = staging_dir
+        self.staging_size = staging_size
+        self.lazy_encoding = lazy_encoding
+        self.batch_size = batch_size
+        self.backend = backend
+        self.decoder_threads = decoder_threads
+        self.capture_params = capture_params
+        self.image_format = image_format
+        self.quality = quality
+        self.png_compression = png_compression
+        self.num_encoders = num_encoders
+        self.crop = crop
+        self.resize_width = resize_width
+        self.resize_height = resize_height
+        self.resize_mode = resize_mode
+        self.interpolation = interpolation
         self.prefix = prefix
         self.resume_from = resume_from
+        self.shard_index = shard_index
+        self.num_shards = num_shards
+        self.shard_policy = shard_policy
+        self.queue_dir = queue_dir
+        self.queue_timeout = queue_timeout
+        self.queue_wait = queue_wait
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
         self._cap = None
         self._frame_no = None
         self._frame_count = None
         self._current_input = None
         self._inputs = None
+        self._pool = None
+        self._prefetcher = None
+        self._read_ahead = None
+        self._local_input = None
+        self._encode_params = None
+        self._decoder_threads = None
+        self._capture_params = None
+        self._index = None
+        self._cache = None
+        self._manifest = None
+        self._queue = None
+        self._deferred = None
+        self._claimed = None
+        self._progress_next = None
+        self._progress_start = None
+        self._checkpoint = None
+        self._emitted = None
+        self._resume_frame_no = 0
+        self._resume_frame_count = 0
+        self._crop = None
+        self._from_msec = None
+        self._to_msec = None
+        self._frame_lists = None
         self.actual_nth_frame = 0
 
     def name(self) -> str:
@@ -93,9 +299,17 @@ class VideoFileReader(Reader, VariableSupporter, DataTypeSupporter):
         :rtype: argparse.ArgumentParser
         """
         parser = super()._create_argparser()
-        parser.add_argument("-i", "--input", type=str, help="Path to the video file(s) to read; glob syntax is supported; " + variable_list(obj=self), required=False, nargs="*")
-        parser.add_argument("-I", "--input_list", type=str, help="Path to the text file(s) listing the video files to read; " + variable_list(obj=self), required=False, nargs="*")
+        parser.add_argument("-i", "--input", type=str, help="Path to the video file(s) to read; glob syntax is supported; members of zip/tar archives can be read without extracting them, using 'ARCHIVE" + ARCHIVE_SEPARATOR + "/MEMBER' (globs are supported for both, e.g., 'bundle.tar" + ARCHIVE_SEPARATOR + "/cam1/*.mp4'); " + variable_list(obj=self), required=False, nargs="*")
+        parser.add_argument("-I", "--input_list", type=str, help="Path to the text file(s) listing the video files to read; manifests generated by idc-video-probe (" + "|".join(MANIFEST_EXTENSIONS.keys()) + ") can be used as well, making their meta-data available (e.g., frame counts for --num_samples); " + variable_list(obj=self), required=False, nargs="*")
         parser.add_argument("--resume_from", type=str, help="Glob expression matching the file to resume from, e.g., '*/012345.avi'", required=False)
+        parser.add_argument("--shard_index", type=int, default=0, help="The shard of the inputs to read (0-based), see --num_shards.", required=False)
+        parser.add_argument("--num_shards", type=int, default=1, help="The number of shards to split the located inputs into, e.g., for distributing the work across several nodes; the assignment is deterministic, i.e., the same on every node and for every rerun; --resume_from is applied within the shard; disabled if <=1.", required=False)
+        parser.add_argument("--shard_policy", choices=SHARD_POLICIES, default=SHARD_POLICY_COUNT, help="How to assign the inputs to the shards: count = round-robin, same number of videos per shard; size = balanced by file size; duration = balanced by duration (from manifests supplied via --input_list, otherwise probed).", required=False)
+        parser.add_argument("--queue_dir", type=str, default=None, help="The directory of a work queue shared by several processes (on the same or different machines, e.g., via NFS): each process claims one video at a time and marks it as done or failed (in the 'claimed', 'done' and 'failed' sub-directories); videos that are done or failed get skipped, delete their markers to process them again; all processes need to use the same inputs; worker processes are not supported in this mode; disabled if not specified.", required=False)
+        parser.add_argument("--queue_timeout", type=float, default=600.0, help="The time in seconds after which claims that have not been refreshed by their process are considered stale (e.g., crashed process) and can be reclaimed (see --queue_dir).", required=False)
+        parser.add_argument("--queue_wait", action="store_true", help="Whether to wait for the videos claimed by other processes to be finished rather than stopping once no more videos can be claimed, in order to reclaim stale claims (see --queue_dir).", required=False)
+        parser.add_argument("--checkpoint", type=str, default=None, help="The JSON state file for recording the last processed frame of each video; when restarting, videos that were finished get skipped and the others resume (seeking) after their last processed frame. Not supported when using worker processes.", required=False)
+        parser.add_argument("--checkpoint_interval", type=int, default=100, help="The number of processed frames after which to save the state file (see --checkpoint).", required=False)
         parser.add_argument("-t", "--data_type", choices=DATATYPES, type=str, default=None, help="The type of data to forward", required=True)
         parser.add_argument("-F", "--from_frame", type=int, default=1, help="Determines with which frame to start the stream (1-based index).", required=False)
         parser.add_argument("-T", "--to_frame", type=int, default=-1, help="Determines after which frame to stop (1-based index); ignored if <=0.", required=False)
@@ -103,6 +317,45 @@ class VideoFileReader(Reader, VariableSupporter, DataTypeSupporter):
         parser.add_argument("-f", "--fps_factor", type=float, default=None, help="Multiplier applied to the frames-per-second (fps) of the video and rounded up (ceiling) to determine the actual nth frame to return; overrides -n/--nth_frame.", required=False)
         parser.add_argument("-m", "--max_frames", type=int, default=-1, help="Determines the maximum number of frames to read; ignored if <=0.", required=False)
         parser.add_argument("--fast", action="store_true", help="Whether to perform fast frame extraction.", required=False)
+        parser.add_argument("--seek", action="store_true", help="Whether to seek to the first frame (-F/--from_frame) rather than decoding all the frames preceding it; falls back to decoding if the video does not support accurate seeking.", required=False)
+        parser.add_argument("--from_time", type=str, default=None, help="The timestamp of the first frame to use, either in seconds or in the format [[HH:]MM:]SS[.fff]; uses the presentation timestamps of the frames; seeks to the timestamp if --seek is used.", required=False)
+        parser.add_argument("--to_time", type=str, default=None, help="The timestamp (exclusive) at which to stop, either in seconds or in the format [[HH:]MM:]SS[.fff]; uses the presentation timestamps of the frames.", required=False)
+        parser.add_argument("--every_ms", type=float, default=-1, help="Forwards a frame every X milliseconds, based on the presentation timestamps of the frames rather than frame counts; overrides -n/--nth_frame and -f/--fps_factor; the frames in between only get grabbed, not decoded; disabled if <=0.", required=False)
+        parser.add_argument("--frame_list", type=str, default=None, help="The CSV file listing the frames to extract: first column is the video (path or file name), second one the frame number (1-based) or the timestamp (see --frame_list_unit); a header row is skipped; videos that are not listed get skipped; the frames get extracted in order by either seeking or decoding forward, whichever is cheaper; all other frame selection options apart from -m/--max_frames get ignored.", required=False)
+        parser.add_argument("--frame_list_unit", choices=UNITS, default=UNIT_FRAME, help="The unit of the second column in the frame list: 'frame' for frame numbers, 'time' for timestamps in seconds or [[HH:]MM:]SS[.fff].", required=False)
+        parser.add_argument("--frame_list_gap", type=int, default=250, help="The maximum number of frames to decode forward rather than seeking when extracting the frames of the frame list; with --index, the keyframe positions determine whether seeking is cheaper.", required=False)
+        parser.add_argument("--num_samples", type=int, default=-1, help="The number of frames to sample randomly across all the videos: the frame counts of the videos get probed (in parallel when using --num_workers; exact frame counts require --index), the sample gets drawn up front and the frames extracted like with --frame_list; -F/--from_frame and -T/--to_frame restrict the frames to sample from; disabled if <=0.", required=False)
+        parser.add_argument("--sampling", choices=SAMPLINGS, default=SAMPLING_UNIFORM, help="How to sample the frames: 'uniform' samples from the frames of all videos combined, 'stratified' the same number of frames from each video.", required=False)
+        parser.add_argument("--seed", type=int, default=None, help="The seed to use for sampling; a random seed gets used and logged if not specified.", required=False)
+        parser.add_argument("-k", "--keyframes", choices=KEYFRAMES_MODES, default=KEYFRAMES_OFF, help="Whether to only extract keyframes, skipping the decoding of all other frames: 'all' forwards all keyframes, 'nearest' the keyframe nearest to every nth frame (see -n/--nth_frame and -f/--fps_factor).", required=False)
+        parser.add_argument("--num_workers", type=int, default=1, help="The number of worker processes to use for decoding the video files in parallel; decodes in the main process if <=1.", required=False)
+        parser.add_argument("--worker_order", choices=ORDERS, default=ORDER_FILE, help="How to forward the frames when using worker processes: 'file' forwards the frames file by file in the order of the inputs, 'interleaved' as soon as they are available.", required=False)
+        parser.add_argument("--num_segments", type=int, default=1, help="The number of segments (aligned to keyframes) to split each video into for decoding them in parallel using worker processes (uses --num_workers processes if >1, otherwise one per segment); frames are forwarded in their original order; disabled if <=1.", required=False)
+        parser.add_argument("--shm_slots", type=int, default=0, help="The number of slots of the ring buffer in shared memory for handing over the decoded frames from the worker processes to the main process without pickling them (requires --lazy_encoding, otherwise the workers encode the frames); the slots get distributed among the workers, a worker waits while all its slots are in use; disabled if <=0.", required=False)
+        parser.add_argument("--shm_slot_size", type=float, default=25.0, help="The size in MB of a shared memory slot (see --shm_slots), needs to fit a decoded (and cropped/resized) frame, e.g., 25MB for 4K BGR frames; larger frames get pickled.", required=False)
+        parser.add_argument("--index", action="store_true", help="Whether to use a frame index per video (frame timestamps, keyframe flags and byte offsets), obtained by demuxing the video, for exact frame counts, keyframe positions and progress information; the index gets stored and is rebuilt if the size or modification time of the video changes.", required=False)
+        parser.add_argument("--index_dir", type=str, default=None, help="The directory to store the frame index files in; stored next to the videos if not specified.", required=False)
+        parser.add_argument("--cache_dir", type=str, default=None, help="The directory to cache the decoded frames in (as memory-mapped raw files), for repeated runs over the same videos; the first run decodes all the frames of a video into the cache, later runs serve the frames from the cache; an entry is specific to the video's path, size and modification time, the capture settings and --cache_scale; not used in keyframes mode; disabled if not specified.", required=False)
+        parser.add_argument("--cache_size", type=int, default=4096, help="The maximum size of the frame cache in MB; the least recently used videos get evicted; videos exceeding the size do not get cached.", required=False)
+        parser.add_argument("--cache_scale", type=float, default=1.0, help="The factor (0-1] to scale the frames with before caching them, reducing the size of the cache; the frames get forwarded in the reduced size.", required=False)
+        parser.add_argument("--prefetch", type=int, default=0, help="The number of frames to decode ahead in a background thread, overlapping decoding with the processing of the frames; disabled if <=0.", required=False)
+        parser.add_argument("--read_ahead", type=int, default=0, help="The number of upcoming files to read ahead in a background thread while the current file gets decoded, avoiding stalls at file boundaries with slow (e.g., network) storage; warms the page cache by reading the files sequentially unless --staging_dir is specified; not used with worker processes; disabled if <=0.", required=False)
+        parser.add_argument("--staging_dir", type=str, default=None, help="The local directory to copy the files read ahead to (see --read_ahead), decoding the files from there; the copies get removed once the files have been processed.", required=False)
+        parser.add_argument("--staging_size", type=int, default=4096, help="The maximum size in MB of the copies in the staging directory (see --staging_dir), including the file currently being decoded; larger files only get read into the page cache.", required=False)
+        parser.add_argument("--lazy_encoding", action="store_true", help="Whether to forward the decoded frames as they are and only encode them (see --image_format) when a downstream plugin requires the image data; the video plugins use the decoded frames directly. Requires more memory per frame. When decoding with worker processes (--num_workers/--num_segments), only applies in conjunction with --shm_slots, otherwise the workers encode the frames.", required=False)
+        parser.add_argument("--batch_size", type=int, default=1, help="The number of frames to forward as a list in one go, reducing the per-item overhead of the pipeline; a batch never spans multiple inputs; forwards the frames one by one if <=1.", required=False)
+        parser.add_argument("--backend", choices=sorted(BACKENDS.keys()), default=BACKEND_ANY, help="The backend to use for capturing the frames.", required=False)
+        parser.add_argument("--decoder_threads", type=int, default=THREADS_DEFAULT, help="The number of threads the backend should use for decoding; 0 uses the backend's default; -1 determines the number from the CPU cores available to the process (taking CPU affinity and cgroup limits into account), shared between concurrent decoders.", required=False)
+        parser.add_argument("--capture_params", type=str, nargs="*", default=None, help="Additional parameters for opening the capture, format: NAME=VALUE with NAME being the name of an OpenCV CAP_PROP_* constant (prefix can be omitted), e.g., HW_ACCELERATION=1.", required=False)
+        parser.add_argument("--image_format", choices=FRAME_FORMATS, default=FORMAT_JPEG, help="The image format to encode the frames in.", required=False)
+        parser.add_argument("--quality", type=int, default=-1, help="The quality to use for encoding the frames as JPEG or WEBP (0-100); uses the encoder's default if <0.", required=False)
+        parser.add_argument("--png_compression", type=int, default=-1, help="The compression level to use for encoding the frames as PNG (0-9); uses the encoder's default if <0.", required=False)
+        parser.add_argument("--num_encoders", type=int, default=1, help="The number of threads to use for encoding the frames, forwarding the frames in their original order; encodes in the reading thread if <=1.", required=False)
+        parser.add_argument("--crop", type=str, default=None, help="The rectangle to crop the frames to before resizing/encoding them, format: 'x,y,width,height' (0-based); gets clipped at the frame borders.", required=False)
+        parser.add_argument("--resize_width", type=int, default=-1, help="The width to resize the frames to before encoding them; preserves the aspect ratio using --resize_height if <=0.", required=False)
+        parser.add_argument("--resize_height", type=int, default=-1, help="The height to resize the frames to before encoding them; preserves the aspect ratio using --resize_width if <=0.", required=False)
+        parser.add_argument("--resize_mode", choices=RESIZE_MODES, default=RESIZE_FIT, help="How to resize the frames if both width and height are specified: 'stretch' ignores the aspect ratio, 'fit' scales the frames to fit within the dimensions, 'fill' scales them to cover the dimensions and crops the centre.", required=False)
+        parser.add_argument("--interpolation", choices=sorted(INTERPOLATIONS.keys()), default=INTERPOLATION_AREA, help="The interpolation to use for resizing the frames.", required=False)
         parser.add_argument("-p", "--prefix", type=str, help="The prefix to use for the frames", required=False, default="")
         return parser
 
@@ -123,8 +376,55 @@ class VideoFileReader(Reader, VariableSupporter, DataTypeSupporter):
         self.fps_factor = ns.fps_factor
         self.max_frames = ns.max_frames
         self.fast = ns.fast
+        self.seek = ns.seek
+        self.from_time = ns.from_time
+        self.to_time = ns.to_time
+        self.every_ms = ns.every_ms
+        self.frame_list = ns.frame_list
+        self.frame_list_unit = ns.frame_list_unit
+        self.frame_list_gap = ns.frame_list_gap
+        self.num_samples = ns.num_samples
+        self.sampling = ns.sampling
+        self.seed = ns.seed
+        self.keyframes = ns.keyframes
+        self.num_workers = ns.num_workers
+        self.worker_order = ns.worker_order
+        self.num_segments = ns.num_segments
+        self.shm_slots = ns.shm_slots
+        self.shm_slot_size = ns.shm_slot_size
+        self.index = ns.index
+        self.index_dir = ns.index_dir
+        self.cache_dir = ns.cache_dir
+        self.cache_size = ns.cache_size
+        self.cache_scale = ns.cache_scale
+        self.prefetch = ns.prefetch
+        self.read_ahead = ns.read_ahead
+        self.staging_dir = ns.staging_dir
+        self.staging_size = ns.staging_size
+        self.lazy_encoding = ns.lazy_encoding
+        self.batch_size = ns.batch_size
+        self.backend = ns.backend
+        self.decoder_threads = ns.decoder_threads
+        self.capture_params = ns.capture_params
+        self.image_format = ns.image_format
+        self.quality = ns.quality
+        self.png_compression = ns.png_compression
+        self.num_encoders = ns.num_encoders
+        self.crop = ns.crop
+        self.resize_width = ns.resize_width
+        self.resize_height = ns.resize_height
+        self.resize_mode = ns.resize_mode
+        self.interpolation = ns.interpolation
         self.prefix = ns.prefix
         self.resume_from = ns.resume_from
+        self.shard_index = ns.shard_index
+        self.num_shards = ns.num_shards
+        self.shard_policy = ns.shard_policy
+        self.queue_dir = ns.queue_dir
+        self.queue_timeout = ns.queue_timeout
+        self.queue_wait = ns.queue_wait
+        self.checkpoint = ns.checkpoint
+        self.checkpoint_interval = ns.checkpoint_interval
 
     def generates(self) -> List:
         """
@@ -157,8 +457,148 @@ class VideoFileReader(Reader, VariableSupporter, DataTypeSupporter):
             self.max_frames = -1
         if self.fast is None:
             self.fast = False
+        if self.seek is None:
+            self.seek = False
+        if self.every_ms is None:
+            self.every_ms = -1
+        self._from_msec = -1 if (self.from_time is None) else parse_time(self.from_time) * 1000.0
+        self._to_msec = -1 if (self.to_time is None) else parse_time(self.to_time) * 1000.0
+        if self.frame_list_unit is None:
+            self.frame_list_unit = UNIT_FRAME
+        if self.frame_list_gap is None:
+            self.frame_list_gap = 250
+        self._frame_lists = None
+        if isinstance(self.frame_list, dict):
+            self._frame_lists = self.frame_list
+        elif self.frame_list is not None:
+            self._frame_lists = load_frame_list(self.frame_list, unit=self.frame_list_unit)
+        if self.num_samples is None:
+            self.num_samples = -1
+        if self.sampling is None:
+            self.sampling = SAMPLING_UNIFORM
+        if self.sampling not in SAMPLINGS:
+            raise Exception("Unknown sampling: %s" % self.sampling)
+        if (self.num_samples > 0) and (self._frame_lists is not None):
+            raise Exception("Sampling and frame lists cannot be used at the same time!")
+        if self.keyframes is None:
+            self.keyframes = KEYFRAMES_OFF
+        if self.keyframes not in KEYFRAMES_MODES:
+            raise Exception("Unknown keyframes mode: %s" % self.keyframes)
+        if self.num_workers is None:
+            self.num_workers = 1
+        if self.worker_order is None:
+            self.worker_order = ORDER_FILE
+        if self.worker_order not in ORDERS:
+            raise Exception("Unknown worker order: %s" % self.worker_order)
+        if self.num_segments is None:
+            self.num_segments = 1
+        if self.shm_slots is None:
+            self.shm_slots = 0
+        if self.shm_slot_size is None:
+            self.shm_slot_size = 25.0
+        if (self.shm_slots > 0) and (self.shm_slot_size <= 0):
+            raise Exception("Shared memory slot size must be >0, provided: %f" % self.shm_slot_size)
+        if self.index is None:
+            self.index = False
+        if self.cache_size is None:
+            self.cache_size = 4096
+        if self.cache_scale is None:
+            self.cache_scale = 1.0
+        if (self.cache_scale <= 0) or (self.cache_scale > 1):
+            raise Exception("Cache scale must be within (0-1], provided: %f" % self.cache_scale)
+        self._cache = None
+        if self.cache_dir is not None:
+            self._cache = FrameCache(self.cache_dir, self.cache_size * 1024 * 1024, scale=self.cache_scale, logger=self.logger())
+        if self.prefetch is None:
+            self.prefetch = 0
+        if self.lazy_encoding is None:
+            self.lazy_encoding = False
+        if self.lazy_encoding and ((self.num_workers > 1) or (self.num_segments > 1)) and (self.shm_slots <= 0):
+            self.logger().warning("Worker processes encode the frames unless using --shm_slots, --lazy_encoding only applies to frames decoded in the main process!")
+        if self.batch_size is None:
+            self.batch_size = 1
+        if self.backend is None:
+            self.backend = BACKEND_ANY
+        if self.backend not in BACKENDS:
+            raise Exception("Unknown capture backend: %s" % self.backend)
+        if self.decoder_threads is None:
+            self.decoder_threads = THREADS_DEFAULT
+        self._decoder_threads = self.decoder_threads
+        if self._decoder_threads < 0:
+            self._decoder_threads = auto_threads(self._num_decoders())
+            self.logger().info("Decoder threads: %d" % self._decoder_threads)
+        self._capture_params = parse_capture_params(self.capture_params)
+        if self.image_format is None:
+            self.image_format = FORMAT_JPEG
+        if self.quality is None:
+            self.quality = -1
+        if self.png_compression is None:
+            self.png_compression = -1
+        if self.num_encoders is None:
+            self.num_encoders = 1
+        self._encode_params = encode_params(self.image_format, quality=self.quality, png_compression=self.png_compression)
+        if self.resize_width is None:
+            self.resize_width = -1
+        if self.resize_height is None:
+            self.resize_height = -1
+        if self.resize_mode is None:
+            self.resize_mode = RESIZE_FIT
+        if self.resize_mode not in RESIZE_MODES:
+            raise Exception("Unknown resize mode: %s" % self.resize_mode)
+        if self.interpolation is None:
+            self.interpolation = INTERPOLATION_AREA
+        if self.interpolation not in INTERPOLATIONS:
+            raise Exception("Unknown interpolation: %s" % self.interpolation)
+        self._crop = parse_crop(self.crop)
         if self.prefix is None:
             self.prefix = ""
+        if self.shard_index is None:
+            self.shard_index = 0
+        if self.num_shards is None:
+            self.num_shards = 1
+        if self.shard_policy is None:
+            self.shard_policy = SHARD_POLICY_COUNT
+        if self.shard_policy not in SHARD_POLICIES:
+            raise Exception("Unknown shard policy: %s" % self.shard_policy)
+        if (self.num_shards > 1) and ((self.shard_index < 0) or (self.shard_index >= self.num_shards)):
+            raise Exception("Shard index must be within 0 and %d, provided: %d" % (self.num_shards - 1, self.shard_index))
+        if self.queue_timeout is None:
+            self.queue_timeout = 600.0
+        if self.queue_wait is None:
+            self.queue_wait = False
+        self._queue = None
+        self._deferred = []
+        self._claimed = None
+        if self.queue_dir is not None:
+            self._queue = WorkQueue(self.queue_dir, timeout=self.queue_timeout, logger=self.logger())
+            if (self.num_workers > 1) or (self.num_segments > 1):
+                self.logger().warning("Worker processes are not supported in combination with --queue_dir, ignoring!")
+                self.num_workers = 1
+                self.num_segments = 1
+        if self.read_ahead is None:
+            self.read_ahead = 0
+        if self.staging_size is None:
+            self.staging_size = 4096
+        self._read_ahead = None
+        self._local_input = None
+        if self.read_ahead > 0:
+            if (self.num_workers > 1) or (self.num_segments > 1):
+                self.logger().warning("Read-ahead is not supported in combination with worker processes, ignoring!")
+            else:
+                self._read_ahead = ReadAhead(staging_dir=self.staging_dir, staging_size=self.staging_size * 1024 * 1024, logger=self.logger())
+                self._read_ahead.start()
+        if self.checkpoint_interval is None:
+            self.checkpoint_interval = 100
+        self._checkpoint = None
+        if self.checkpoint is not None:
+            if (self.num_workers > 1) or (self.num_segments > 1):
+                self.logger().warning("Checkpoints are not supported when using worker processes, ignoring!")
+            else:
+                self._checkpoint = Checkpoint(self.checkpoint, interval=self.checkpoint_interval)
+                self._checkpoint.load()
+        self._emitted = deque()
+        self._resume_frame_no = 0
+        self._resume_frame_count = 0
         self._inputs = None
 
     def read(self) -> Iterable:
@@ -169,12 +609,318 @@ class VideoFileReader(Reader, VariableSupporter, DataTypeSupporter):
         :rtype: Iterable
         """
         if self._inputs is None:
-            self._inputs = locate_files(self.source, input_lists=self.source_list, fail_if_empty=True, resume_from=self.resume_from)
-        self._current_input = self._inputs.pop(0)
+            self._inputs = self._locate_inputs()
+            if self.num_samples > 0:
+                self._draw_sample()
+        if (len(self._inputs) == 0) and not self._deferred:
+            return
+        if (self.num_workers > 1) or (self.num_segments > 1):
+            items = self._read_parallel()
+            if self.batch_size > 1:
+                # frames of several inputs arrive interleaved
+                items = batch_items_per_input(items, self.batch_size, self.session)
+            for item in items:
+                yield item
+            return
+        if self._queue is not None:
+            self._current_input = self._claim_next()
+            if self._current_input is None:
+                return
+        else:
+            self._current_input = self._inputs.pop(0)
         self.session.current_input = self._current_input
         self.logger().info("Reading from: " + str(self.session.current_input))
+        if self._checkpoint is not None:
+            self._emitted.clear()
+            self._resume_frame_no, self._resume_frame_count, finished = self._checkpoint.get(self._current_input)
+            if finished:
+                self.logger().info("Already finished according to checkpoint, skipping: %s" % self._current_input)
+                if self._claimed is not None:
+                    self._queue.done(self._claimed)
+                    self._claimed = None
+                return
+        if self._read_ahead is not None:
+            # acquire before scheduling, otherwise the staged copy of the current input gets removed
+            self._local_input = self._read_ahead.acquire(self._current_input)
+            self._read_ahead.schedule(self._inputs[:self.read_ahead])
+
+        items = self._read_input()
+        if (self.num_encoders > 1) and not self.lazy_encoding:
+            items = encode_frames(items, self.num_encoders)
+        if self.prefetch > 0:
+            self._prefetcher = Prefetcher(items, self.prefetch)
+            items = self._prefetcher
+        if self.batch_size > 1:
+            items = batch_items(items, self.batch_size, self.session)
+        try:
+            for item in items:
+                yield item
+                # item(s) have been processed
+                if self._checkpoint is not None:
+                    for _ in range(len(item) if isinstance(item, list) else 1):
+                        frame_no, frame_count = self._emitted.popleft()
+                        self._checkpoint.update(self._current_input, frame_no, frame_count)
+        except Exception:
+            if self._claimed is None:
+                raise
+            self.logger().error("Failed to read, marking as failed: %s" % self._current_input)
+            self._queue.failed(self._claimed, traceback.format_exc())
+            self._claimed = None
+            if self._prefetcher is not None:
+                self._prefetcher.stop()
+                self._prefetcher = None
+            self._release_input()
+            return
+        if self._prefetcher is not None:
+            self.logger().info("Prefetch: " + self._prefetcher.stats())
+            self._prefetcher = None
+        self._release_input()
+        if self._checkpoint is not None:
+            self._checkpoint.finish(self._current_input)
+        if self._claimed is not None:
+            self._queue.done(self._claimed)
+            self._claimed = None
+
+    def _release_input(self):
+        """
+        Removes the staged copy of the current input, if any.
+        """
+        if (self._read_ahead is not None) and (self._local_input is not None):
+            if self._cap is not None:
+                self._cap.release()
+                self._cap = None
+            self._read_ahead.release(self._current_input)
+        self._local_input = None
+
+    def _claim_next(self) -> Optional[str]:
+        """
+        Claims the next video from the work queue. Videos claimed by other processes get deferred
+        and, when waiting, are checked again until they are finished or their claims go stale.
+
+        :return: the claimed video, None if no more videos to process
+        :rtype: str
+        """
+        while len(self._inputs) > 0:
+            path = self._inputs.pop(0)
+            if self._queue.claim(path):
+                self._claimed = path
+                return path
+            if self._queue.status(path) == STATE_CLAIMED:
+                self._deferred.append(path)
+        if not self.queue_wait:
+            if len(self._deferred) > 0:
+                self.logger().info("Videos claimed by other processes: %d" % len(self._deferred))
+            self._deferred = []
+            return None
+        while len(self._deferred) > 0:
+            deferred = []
+            for path in self._deferred:
+                if self._queue.claim(path):
+                    self._deferred = deferred + self._deferred[self._deferred.index(path) + 1:]
+                    self._claimed = path
+                    return path
+                if self._queue.status(path) == STATE_CLAIMED:
+                    deferred.append(path)
+            self._deferred = deferred
+            if len(self._deferred) > 0:
+                self.logger().info("Waiting for %d video(s) claimed by other processes" % len(self._deferred))
+                time.sleep(min(10.0, max(0.1, self.queue_timeout / 10)))
+        return None
+
+    def _locate_inputs(self) -> List[str]:
+        """
+        Locates the video files to read. The videos listed in manifests get added to the other inputs
+        (skipping the ones that failed to probe) and their records are retained. Archive members
+        (archive!/member, with optional globs) get located within the archives.
+
+        :return: the video files
+        :rtype: list
+        """
+        source = self.source
+        source_list = self.source_list
+        self._manifest = dict()
+        if isinstance(source_list, str):
+            source_list = [source_list]
+        if (source_list is not None) and any(manifest_format(x) is not None for x in source_list):
+            source = [] if (source is None) else ([source] if isinstance(source, str) else list(source))
+            for manifest in [x for x in source_list if manifest_format(x) is not None]:
+                manifest = expand_variables(manifest)
+                for record in load_manifest(manifest):
+                    path = record[FIELD_PATH]
+                    if record.get(FIELD_ERROR) is not None:
+                        self.logger().warning("Skipping video that failed to probe (%s): %s" % (record[FIELD_ERROR], path))
+                    elif not path_exists(path):
+                        self.logger().warning("Video from manifest '%s' does not exist: %s" % (manifest, path))
+                    else:
+                        self._manifest[path] = record
+                        source.append(glob.escape(path))
+            source_list = [x for x in source_list if manifest_format(x) is None]
+            if len(source_list) == 0:
+                source_list = None
+        if isinstance(source, str):
+            source = [source]
+        if (source is not None) and any(is_archive_path(x) for x in source):
+            return self._locate_with_members(source, source_list)
+        if self.num_shards <= 1:
+            return locate_files(source, input_lists=source_list, fail_if_empty=True, resume_from=self.resume_from)
+        return self._select_shard(locate_files(source, input_lists=source_list, fail_if_empty=True))
+
+    def _locate_with_members(self, source: List[str], source_list: Optional[List[str]]) -> List[str]:
+        """
+        Locates the video files, including the members of archives.
+
+        :param source: the inputs, including archive members (archive!/member)
+        :type source: list
+        :param source_list: the input lists, can be None
+        :type source_list: list
+        :return: the video files
+        :rtype: list
+        """
+        members = [expand_variables(x) for x in source if is_archive_path(x)]
+        source = [x for x in source if not is_archive_path(x)]
+        result = []
+        if (len(source) > 0) or (source_list is not None):
+            result.extend(locate_files(source, input_lists=source_list))
+        for pattern in members:
+            result.extend(locate_members(pattern))
+        if len(result) == 0:
+            raise Exception("Failed to locate any files using: %s" % str(self.source))
+        if self.num_shards > 1:
+            return self._select_shard(result)
+        start = resume_position(result, self.resume_from)
+        if start < 0:
+            self.logger().warning("Resume from '%s' not found!" % self.resume_from)
+            start = 0
+        return result[start:]
+
+    def _select_shard(self, paths: List[str]) -> List[str]:
+        """
+        Selects the inputs of the shard. The shards get determined using all the located inputs,
+        --resume_from only gets applied afterwards to keep the assignment stable.
+
+        :param paths: all the located inputs
+        :type paths: list
+        :return: the inputs of the shard
+        :rtype: list
+        """
+        weights = None
+        if self.shard_policy == SHARD_POLICY_SIZE:
+            weights = [file_stat(x)[0] for x in paths]
+        elif self.shard_policy == SHARD_POLICY_DURATION:
+            weights = []
+            for path in paths:
+                record = self._manifest_record(path)
+                if (record is None) or (record.get(FIELD_DURATION) is None):
+                    record = probe_video(path, backend=self.backend)
+                if record[FIELD_DURATION] is None:
+                    self.logger().warning("Failed to determine duration, using 0: %s" % path)
+                weights.append(record[FIELD_DURATION] or 0.0)
+        shards = assign_shards(paths, self.num_shards, weights=weights)
+        start = resume_position(paths, self.resume_from)
+        if start < 0:
+            self.logger().warning("Resume from '%s' not found!" % self.resume_from)
+            start = 0
+        result = [x for i, x in enumerate(paths) if (shards[i] == self.shard_index) and (i >= start)]
+        self.logger().info("Shard index %d (of %d shards): %d of %d video(s)" % (self.shard_index, self.num_shards, len(result), len(paths)))
+        return result
+
+    def _manifest_record(self, path: str) -> Optional[Dict]:
+        """
+        Returns the manifest record of the video, if still up-to-date.
+
+        :param path: the video file
+        :type path: str
+        :return: the record, None if not available or outdated
+        :rtype: dict
+        """
+        if (self._manifest is None) or (path not in self._manifest):
+            return None
+        record = self._manifest[path]
+        if not is_current(record, path):
+            self.logger().warning("Manifest record outdated, ignoring: %s" % path)
+            del self._manifest[path]
+            return None
+        return record
+
+    def _num_decoders(self) -> int:
+        """
+        Returns the number of decoders that run concurrently.
+
+        :return: the number of decoders
+        :rtype: int
+        """
+        if self.num_workers > 1:
+            return self.num_workers
+        if self.num_segments > 1:
+            return self.num_segments
+        return 1
+
+    def _probe_frame_counts(self) -> Dict[str, int]:
+        """
+        Determines the number of frames of the inputs, using worker processes if enabled.
+
+        :return: the number of frames per input
+        :rtype: dict
+        """
+        result = dict()
+        inputs = []
+        for path in self._inputs:
+            record = None if self.index else self._manifest_record(path)
+            if (record is not None) and (record.get(FIELD_FRAME_COUNT) is not None):
+                result[path] = record[FIELD_FRAME_COUNT]
+            else:
+                inputs.append(path)
+        if len(result) > 0:
+            self.logger().info("Frame counts from manifest: %d" % len(result))
+
+        if (self.num_workers <= 1) or (len(inputs) == 0):
+            for path in inputs:
+                result[path] = probe_frame_count(path, index=self.index, index_dir=self.index_dir, backend=self.backend,
+                                                 threads=self._decoder_threads, params=self._capture_params)
+            return result
+
+        tasks = [(path, self.index, self.index_dir, self.backend, self._decoder_threads, self._capture_params)
+                 for path in inputs]
+        self._pool = DecoderPool(_probe_file, tasks, self.num_workers, order=ORDER_INTERLEAVED)
+        self._pool.start()
+        try:
+            for index, num_frames in self._pool.results():
+                result[tasks[index][0]] = num_frames
+        finally:
+            self._pool.stop()
+            self._pool = None
+        return result
+
+    def _draw_sample(self):
+        """
+        Probes the frame counts of the inputs and draws the sample, which gets turned into frame lists.
+        Inputs without sampled frames get removed.
+        """
+        self.logger().info("Probing %d video(s)" % len(self._inputs))
+        counts = self._probe_frame_counts()
+        ranges = dict()
+        for path in self._inputs:
+            last = counts[path]
+            if (self.to_frame > 0) and (self.to_frame <= last):
+                last = self.to_frame - 1
+            ranges[path] = (self.from_frame, last)
+        seed = self.seed
+        if seed is None:
+            seed = random.randrange(2**31)
+        self.logger().info("Sampling %d frame(s) (%s) from %d frame(s) using seed: %d"
+                           % (self.num_samples, self.sampling, sum(max(0, x[1] - x[0] + 1) for x in ranges.values()), seed))
+        self._frame_lists = draw_sample(ranges, self.num_samples, sampling=self.sampling, seed=seed)
+        self.frame_list_unit = UNIT_FRAME
+        self._inputs = [x for x in self._inputs if x in self._frame_lists]
 
-        self._cap = cv2.VideoCapture(self.session.current_input)
+    def _read_input(self) -> Iterable:
+        """
+        Reads the frames from the current input.
+
+        :return: the data
+        :rtype: Iterable
+        """
+        self._cap = self._open_capture()
         self._frame_no = 0
         self._frame_count = 0
 
@@ -183,10 +929,33 @@ class VideoFileReader(Reader, VariableSupporter, DataTypeSupporter):
             self.logger().info("fps: %f" % fps)
         except:
             fps = None
+        if not fps:
+            record = self._manifest_record(self.session.current_input)
+            if (record is not None) and record.get(FIELD_FPS):
+                fps = record[FIELD_FPS]
+                self.logger().info("fps from manifest: %f" % fps)
+
+        # frame index
+        self._index = None
+        if self.index:
+            self._index = get_index(self.session.current_input, index_dir=self.index_dir, logger=self.logger())
+            self.logger().info("frames: %d" % self._index.num_frames)
+            if not fps and (self._index.fps is not None):
+                fps = self._index.fps
+            if self.from_frame > self._index.num_frames:
+                self.logger().warning("First frame %d beyond last frame %d, skipping: %s" % (self.from_frame, self._index.num_frames, self.session.current_input))
+                self._cap.release()
+                self._cap = None
+                return
+            self._progress_next = 0
+            self._progress_start = time.time()
 
         # determine actual nth frame to use
         self.actual_nth_frame = self.nth_frame
-        if (self.fps_factor is not None) and (fps is not None):
+        if self.every_ms > 0:
+            self.actual_nth_frame = 1
+            self.logger().info("every ms: %f" % self.every_ms)
+        elif (self.fps_factor is not None) and (fps is not None):
             self.actual_nth_frame = math.ceil(fps * self.fps_factor)
             self.logger().info("nth frame calculated from fps factor: %d" % self.actual_nth_frame)
         elif self.actual_nth_frame > 1:
@@ -194,13 +963,53 @@ class VideoFileReader(Reader, VariableSupporter, DataTypeSupporter):
 
         cls = data_type_to_class(self.data_type)
 
+        # only listed frames?
+        if self._frame_lists is not None:
+            for item in self._read_frame_list(cls, fps):
+                yield item
+            return
+
+        # only keyframes?
+        if self.keyframes != KEYFRAMES_OFF:
+            if self._index is not None:
+                num_frames = self._index.num_frames
+            else:
+                num_frames = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            self._cap.release()
+            self._cap = None
+            for item in self._read_keyframes(cls, num_frames, fps):
+                yield item
+            return
+
+        # time-based selection?
+        use_time = (self._from_msec > 0) or (self._to_msec > 0) or (self.every_ms > 0)
+        next_msec = max(0.0, self._from_msec)
+        first_frame = self.from_frame
+        if (self._from_msec > 0) and fps:
+            # the frame just before the timestamp
+            first_frame = max(first_frame, int(self._from_msec * fps / 1000.0))
+
+        # resume after last processed frame or jump to first frame?
+        resume = self._resume_frame_no
+        if resume > 0:
+            self.logger().info("Resuming after frame: %d" % resume)
+            self._seek(resume + 1, fps)
+        elif self.seek and (first_frame > 1):
+            self._seek(first_frame, fps)
+
         # next frame?
-        count = 0
+        count = self._frame_no
+        if (resume > 0) and (self._frame_no == resume):
+            # continue after the last processed frame
+            self._frame_count = self._resume_frame_count
+            count = 0
+            if (self.every_ms > 0) and fps:
+                next_msec = next_grid_time(next_msec, (resume - 1) * 1000.0 / fps, self.every_ms)
         while (self._cap is not None) and self._cap.isOpened():
             # next frame
             self._frame_no += 1
             count += 1
-            if self.fast:
+            if self.fast or use_time:
                 retval = self._cap.grab()
                 frame_curr = None
             else:
@@ -215,31 +1024,439 @@ class VideoFileReader(Reader, VariableSupporter, DataTypeSupporter):
                     if self._frame_no >= self.to_frame:
                         break
 
+                # within time window?
+                msec = None
+                if use_time:
+                    msec = self._cap.get(cv2.CAP_PROP_POS_MSEC)
+                    if (self._from_msec > 0) and (msec < self._from_msec - TIME_EPSILON):
+                        continue
+                    if (self._to_msec > 0) and (msec >= self._to_msec - TIME_EPSILON):
+                        break
+
                 # skip frame?
                 if (self.actual_nth_frame > 1) and (count < self.actual_nth_frame):
                     continue
+                if (self.every_ms > 0) and (msec < next_msec - TIME_EPSILON):
+                    continue
 
                 # max frames reached?
                 if (self.max_frames > 0) and (self._frame_count >= self.max_frames):
                     break
 
-                if self.fast:
+                # already processed before resuming?
+                if self._frame_no <= resume:
+                    self._frame_count += 1
+                    count = 0
+                    if self.every_ms > 0:
+                        next_msec = next_grid_time(next_msec, msec, self.every_ms)
+                    continue
+
+                if self.fast or use_time:
                     retval, frame_curr = self._cap.retrieve()
                     if not retval:
                         continue
 
                 self._frame_count += 1
                 count = 0
-                data = cv2.imencode(".jpg", frame_curr)[1].tobytes()
-                prefix = (os.path.splitext(os.path.basename(self.session.current_input))[0] + "-") if (len(self.prefix) == 0) else self.prefix
-                filename = os.path.join(
-                    self.session.current_input,
-                    "%s%08d.jpg" % (prefix, self._frame_no))
-                height, width, _ = frame_curr.shape
-                yield cls(image_name=os.path.basename(filename), data=data, image_format=FORMAT_JPEG, image_size=(width, height))
+                if self.every_ms > 0:
+                    next_msec = next_grid_time(next_msec, msec, self.every_ms)
+                self._log_progress()
+                if self._checkpoint is not None:
+                    self._emitted.append((self._frame_no, self._frame_count))
+                yield self._frame_to_data(cls, frame_curr)
+            else:
+                self._cap.release()
+                self._cap = None
+
+    def _open_capture(self):
+        """
+        Opens the video capture for the current input, serving the frames from the frame cache if enabled.
+
+        :return: the video capture
+        """
+        path = self.session.current_input
+        local = path if (self._local_input is None) else self._local_input
+        open_func = partial(open_capture, local, backend=self.backend, threads=self._decoder_threads, params=self._capture_params)
+        if (self._cache is not None) and (self.keyframes == KEYFRAMES_OFF):
+            params = {"backend": self.backend, "capture_params": self.capture_params}
+            cap = self._cache.open(path, open_func, params=params)
+            if cap is not None:
+                return cap
+        return open_func()
+
+    def _log_progress(self):
+        """
+        Logs the progress in steps of 10%, if a frame index is available.
+        """
+        if (self._index is None) or (self._index.num_frames == 0):
+            return
+        last = self._index.num_frames
+        if (self.to_frame > 0) and (self.to_frame <= last):
+            last = self.to_frame - 1
+        first = min(self.from_frame, last)
+        percent = 100 * (self._frame_no - first + 1) / max(1, last - first + 1)
+        if percent < self._progress_next:
+            return
+        elapsed = time.time() - self._progress_start
+        remaining = elapsed * (100 - percent) / percent if (percent > 0) else 0
+        self.logger().info("Progress: frame %d/%d (%.0f%%), estimated time remaining: %.1fs" % (self._frame_no, last, percent, remaining))
+        self._progress_next = (int(percent) // 10 + 1) * 10
+
+    def _frame_to_data(self, cls, frame_curr):
+        """
+        Crops/resizes the BGR frame and turns it into a data container, using the current frame number for the name.
+
+        :param cls: the data container class to use
+        :param frame_curr: the frame to convert
+        :return: the data container
+        """
+        prefix = (os.path.splitext(os.path.basename(self.session.current_input))[0] + "-") if (len(self.prefix) == 0) else self.prefix
+        filename = os.path.join(
+            self.session.current_input,
+            "%s%08d%s" % (prefix, self._frame_no, FRAME_FORMAT_EXTENSIONS[self.image_format]))
+        frame_curr = transform_frame(frame_curr, crop=self._crop, resize_width=self.resize_width,
+                                     resize_height=self.resize_height, resize_mode=self.resize_mode,
+                                     interpolation=self.interpolation)
+        return frame_to_data(cls, frame_curr, os.path.basename(filename),
+                             lazy=self.lazy_encoding or (self.num_encoders > 1),
+                             image_format=self.image_format, params=self._encode_params)
+
+    def _read_frame_list(self, cls, fps: float) -> Iterable:
+        """
+        Reads only the frames listed for the current input. The frames get processed in order,
+        for each frame either seeking or decoding forward, whichever is cheaper.
+
+        :param cls: the data container class to use
+        :param fps: the frames-per-second of the video, if available
+        :type fps: float
+        :return: the data
+        :rtype: Iterable
+        """
+        values = lookup_frame_list(self._frame_lists, self.session.current_input)
+        if values is None:
+            self.logger().info("No frames listed, skipping: %s" % self.session.current_input)
+            self._cap.release()
+            self._cap = None
+            return
+        if self.frame_list_unit == UNIT_TIME:
+            if self._index is not None:
+                frames = [self._index.frame_at(x) for x in values]
+            elif fps:
+                frames = [int(math.floor(x * fps + TIME_EPSILON)) + 1 for x in values]
             else:
+                raise Exception("Failed to determine frame rate, cannot convert timestamps: %s" % self.session.current_input)
+            frames = sorted(set(frames))
+        else:
+            frames = values
+        self.logger().info("Frames to extract: %d" % len(frames))
+        # the number of frames according to the container, if available
+        num_frames = 0
+        if self._index is None:
+            num_frames = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+        if self._resume_frame_no > 0:
+            self._frame_count = self._resume_frame_count
+        for frame_no in frames:
+            # already processed before resuming?
+            if frame_no <= self._resume_frame_no:
+                continue
+            if (self._index is not None) and (frame_no > self._index.num_frames):
+                break
+
+            # max frames reached?
+            if (self.max_frames > 0) and (self._frame_count >= self.max_frames):
+                break
+
+            # seek or decode forward
+            if self._seek_cheaper(frame_no):
+                # failing to seek past the (estimated) end: don't decode the whole video to find nothing
+                if not self._seek(frame_no, fps, fallback=(num_frames <= 0) or (frame_no <= num_frames)):
+                    self.logger().info("Frame %d beyond end of video (%d frames), stopping: %s" % (frame_no, num_frames, self.session.current_input))
+                    self._cap.release()
+                    self._cap = None
+                    break
+            while (self._cap is not None) and (self._frame_no < frame_no - 1):
+                if self._cap.grab():
+                    self._frame_no += 1
+                else:
+                    self._cap.release()
+                    self._cap = None
+            if self._cap is None:
+                break
+            retval, frame_curr = self._cap.read()
+            if not retval:
                 self._cap.release()
                 self._cap = None
+                break
+
+            self._frame_no += 1
+            self._frame_count += 1
+            self._log_progress()
+            if self._checkpoint is not None:
+                self._emitted.append((self._frame_no, self._frame_count))
+            yield self._frame_to_data(cls, frame_curr)
+
+    def _seek_cheaper(self, frame_no: int) -> bool:
+        """
+        Determines whether seeking to the frame is cheaper than decoding forward. With a frame index,
+        seeking is cheaper if there is a keyframe between the current position and the frame,
+        otherwise the gap between the current position and the frame is used.
+
+        :param frame_no: the frame to position the capture at (1-based index)
+        :type frame_no: int
+        :return: True if seeking is cheaper
+        :rtype: bool
+        """
+        gap = frame_no - self._frame_no - 1
+        if gap <= 0:
+            return False
+        if self._index is not None:
+            return self._index.keyframe_before(frame_no) > self._frame_no + 1
+        return gap > self.frame_list_gap
+
+    def _read_keyframes(self, cls, num_frames: int, fps: float) -> Iterable:
+        """
+        Reads only the keyframes from the current input.
+        The time window gets applied using the frame rate, --every_ms is not supported.
+
+        :param cls: the data container class to use
+        :param num_frames: the number of frames in the video, ignored if <=0
+        :type num_frames: int
+        :param fps: the frames-per-second of the video, if available
+        :type fps: float
+        :return: the data
+        :rtype: Iterable
+        """
+        path = self.session.current_input if (self._local_input is None) else self._local_input
+        keyframes = read_keyframes(path, from_frame=self.from_frame, seek=self.seek)
+        if self.keyframes == KEYFRAMES_NEAREST:
+            keyframes = nearest_keyframes(keyframes, max(self.from_frame, self.actual_nth_frame), self.actual_nth_frame,
+                                          last=self.to_frame, num_frames=num_frames)
+        if self.every_ms > 0:
+            self.logger().warning("Keyframes mode does not support --every_ms, ignoring!")
+        for frame_no, frame_curr in keyframes:
+            # within frame window?
+            if self.to_frame > 0:
+                if frame_no >= self.to_frame:
+                    break
+
+            # within time window?
+            if fps:
+                msec = (frame_no - 1) * 1000.0 / fps
+                if (self._from_msec > 0) and (msec < self._from_msec - TIME_EPSILON):
+                    continue
+                if (self._to_msec > 0) and (msec >= self._to_msec - TIME_EPSILON):
+                    break
+
+            # max frames reached?
+            if (self.max_frames > 0) and (self._frame_count >= self.max_frames):
+                break
+
+            self._frame_no = frame_no
+            self._frame_count += 1
+
+            # already processed before resuming?
+            if frame_no <= self._resume_frame_no:
+                continue
+
+            self._log_progress()
+            if self._checkpoint is not None:
+                self._emitted.append((self._frame_no, self._frame_count))
+            yield self._frame_to_data(cls, frame_curr)
+
+    def _worker_options(self) -> dict:
+        """
+        Returns the options for the readers in the worker processes.
+
+        :return: the options
+        :rtype: dict
+        """
+        return {
+            "data_type": self.data_type,
+            "from_frame": self.from_frame,
+            "to_frame": self.to_frame,
+            "nth_frame": self.nth_frame,
+            "fps_factor": self.fps_factor,
+            "max_frames": self.max_frames,
+            "fast": self.fast,
+            "seek": self.seek,
+            "from_time": self.from_time,
+            "to_time": self.to_time,
+            "every_ms": self.every_ms,
+            "frame_list": self._frame_lists,
+            "frame_list_unit": self.frame_list_unit,
+            "frame_list_gap": self.frame_list_gap,
+            "keyframes": self.keyframes,
+            "backend": self.backend,
+            "decoder_threads": self._decoder_threads,
+            "capture_params": self.capture_params,
+            "index": self.index,
+            "index_dir": self.index_dir,
+            "cache_dir": self.cache_dir,
+            "cache_size": self.cache_size,
+            "cache_scale": self.cache_scale,
+            "image_format": self.image_format,
+            "quality": self.quality,
+            "png_compression": self.png_compression,
+            "num_encoders": self.num_encoders,
+            "crop": self.crop,
+            "resize_width": self.resize_width,
+            "resize_height": self.resize_height,
+            "resize_mode": self.resize_mode,
+            "interpolation": self.interpolation,
+            "prefix": self.prefix,
+            "logging_level": self.logging_level,
+        }
+
+    def _segment_tasks(self, path: str) -> List:
+        """
+        Splits the video into segments aligned to keyframes and generates a task per segment.
+        The first frame of each segment is chosen such that the same frames get selected
+        as when decoding the video in one go.
+
+        :param path: the video file to split
+        :type path: str
+        :return: the list of (options, path) tasks
+        :rtype: list
+        """
+        cap = open_capture(path, backend=self.backend, threads=self._decoder_threads, params=self._capture_params)
+        try:
+            fps = cap.get(cv2.CAP_PROP_FPS)
+        except:
+            fps = None
+        finally:
+            cap.release()
+        nth_frame = self.nth_frame
+        if (self.fps_factor is not None) and fps:
+            nth_frame = math.ceil(fps * self.fps_factor)
+
+        if self.index:
+            index = get_index(path, index_dir=self.index_dir, logger=self.logger())
+            keyframes, num_frames = index.keyframes(), index.num_frames
+        else:
+            keyframes, num_frames = keyframe_positions(path)
+        last = num_frames + 1
+        if (self.to_frame > 0) and (self.to_frame < last):
+            last = self.to_frame
+        first_frame = max(self.from_frame, nth_frame)
+        result = []
+        for start, end in split_segments(self.from_frame, last, self.num_segments, keyframes):
+            if start <= first_frame:
+                start = first_frame
+            else:
+                start = first_frame + math.ceil((start - first_frame) / nth_frame) * nth_frame
+            if start >= end:
+                continue
+            options = self._worker_options()
+            options["from_frame"] = start
+            options["to_frame"] = end
+            options["nth_frame"] = nth_frame
+            options["fps_factor"] = None
+            options["seek"] = True
+            result.append((options, path))
+        self.logger().info("Split into %d segment(s): %s" % (len(result), path))
+        return result
+
+    def _read_parallel(self) -> Iterable:
+        """
+        Decodes all remaining inputs using worker processes.
+
+        :return: the data
+        :rtype: Iterable
+        """
+        inputs = self._inputs
+        self._inputs = []
+        order = self.worker_order
+        num_workers = self.num_workers
+        tasks = []
+        segments = self.num_segments > 1
+        if segments and (self._frame_lists is not None):
+            self.logger().warning("Segments are not supported in combination with --frame_list, ignoring!")
+            segments = False
+        elif segments and ((self.every_ms > 0) or (self._from_msec > 0)):
+            self.logger().warning("Segments are not supported in combination with --from_time/--every_ms, ignoring!")
+            segments = False
+        elif segments and (self.keyframes != KEYFRAMES_OFF):
+            self.logger().warning("Segments are not supported in keyframes mode, ignoring!")
+            segments = False
+        elif segments and (self._cache is not None):
+            self.logger().warning("Segments are not supported in combination with --cache_dir, ignoring!")
+            segments = False
+        if segments:
+            if order != ORDER_FILE:
+                self.logger().warning("Segments require the frames to be forwarded file by file, ignoring worker order: %s" % order)
+                order = ORDER_FILE
+            if num_workers <= 1:
+                num_workers = self.num_segments
+            for path in inputs:
+                tasks.extend(self._segment_tasks(path))
+        else:
+            options = self._worker_options()
+            tasks = []
+            for path in inputs:
+                if self._frame_lists is not None:
+                    # only pass on the frames of this input
+                    options = dict(options)
+                    frames = lookup_frame_list(self._frame_lists, path)
+                    options["frame_list"] = {path: frames} if (frames is not None) else dict()
+                tasks.append((options, path))
+        ring = None
+        if self.shm_slots > 0:
+            if self.lazy_encoding:
+                ring = FrameRing(self.shm_slots, slot_size_bytes(self.shm_slot_size), logger=self.logger())
+                for options, _ in tasks:
+                    options["lazy_encoding"] = True
+            else:
+                self.logger().warning("Shared memory requires --lazy_encoding, ignoring!")
+        self.logger().info("Decoding %d file(s) using %d worker(s)" % (len(inputs), num_workers))
+        cls = data_type_to_class(self.data_type)
+        self._pool = DecoderPool(_decode_file, tasks, num_workers, order=order, ring=ring)
+        self._pool.start()
+        try:
+            for index, (image_name, data, image_size) in self._pool.results():
+                path = tasks[index][1]
+                if self._current_input != path:
+                    self._current_input = path
+                    self._frame_count = 0
+                    self.logger().info("Reading from: " + str(self._current_input))
+                if (self.max_frames > 0) and (self._frame_count >= self.max_frames):
+                    continue
+                self._frame_count += 1
+                self.session.current_input = self._current_input
+                if isinstance(data, np.ndarray):
+                    yield frame_to_data(cls, data, image_name, lazy=True, image_format=self.image_format, params=self._encode_params)
+                else:
+                    yield cls(image_name=image_name, data=data, image_format=self.image_format, image_size=image_size)
+        finally:
+            self._pool.stop()
+            self._pool = None
+
+    def _seek(self, frame_no: int, fps: float = None, fallback: bool = True) -> bool:
+        """
+        Positions the video capture at the specified frame. Reopens the video and falls back
+        to decoding all the preceding frames if the video does not support accurate seeking.
+
+        :param frame_no: the frame to position the capture at (1-based index)
+        :type frame_no: int
+        :param fps: the frames-per-second of the video, if available
+        :type fps: float
+        :param fallback: whether to fall back to decoding if seeking fails
+        :type fallback: bool
+        :return: True if successfully positioned (or fallen back to decoding)
+        :rtype: bool
+        """
+        self.logger().info("Seeking to frame: %d" % frame_no)
+        if seek_frame(self._cap, frame_no - 1, fps=fps):
+            self._frame_no = frame_no - 1
+            return True
+        elif not fallback:
+            return False
+        else:
+            self.logger().warning("Failed to seek to frame %d, falling back to decoding: %s" % (frame_no, self.session.current_input))
+            self._cap.release()
+            self._cap = self._open_capture()
+            self._frame_no = 0
+            return True
 
     def has_finished(self) -> bool:
         """
@@ -248,12 +1465,30 @@ class VideoFileReader(Reader, VariableSupporter, DataTypeSupporter):
         :return: True if finished
         :rtype: bool
         """
-        return (self._inputs is not None) and len(self._inputs) == 0
+        return (self._inputs is not None) and (len(self._inputs) == 0) and not self._deferred
 
     def finalize(self):
         """
         Finishes the reading, e.g., for closing files or databases.
         """
+        if self._claimed is not None:
+            # not finished, return to queue
+            self._queue.release(self._claimed)
+            self._claimed = None
+        if self._pool is not None:
+            self._pool.stop()
+            self._pool = None
+        if self._prefetcher is not None:
+            self._prefetcher.stop()
+            self._prefetcher = None
+        if self._read_ahead is not None:
+            self._read_ahead.stop()
+            self.logger().info("Read-ahead: " + self._read_ahead.stats())
+            self._read_ahead = None
+            self._local_input = None
+        if self._checkpoint is not None:
+            self._checkpoint.save()
+            self._checkpoint = None
         if self._current_input is not None:
             super().finalize()
             self._current_input = None
@@ -261,3 +1496,38 @@ class VideoFileReader(Reader, VariableSupporter, DataTypeSupporter):
             if self._cap is not None:
                 self._cap.release()
                 self._cap = None
+
+
+def _probe_file(task) -> Iterable:
+    """
+    Determines the number of frames of a single video file, used by the worker processes.
+
+    :param task: the tuple of video file, whether to use the frame index, the index directory, the capture backend, the number of decoder threads and the capture parameters
+    :type task: tuple
+    :return: iterator with the number of frames
+    """
+    path, index, index_dir, backend, threads, params = task
+    yield probe_frame_count(path, index=index, index_dir=index_dir, backend=backend, threads=threads, params=params)
+
+
+def _decode_file(task) -> Iterable:
+    """
+    Decodes the frames of a single video file, used by the worker processes.
+
+    :param task: the tuple of reader options and video file
+    :type task: tuple
+    :return: iterator of image name, image bytes (or BGR frame when encoding lazily) and image size tuples
+    """
+    options, path = task
+    reader = VideoFileReader(**options)
+    reader.session = Session()
+    reader.initialize()
+    reader._inputs = [path]
+    try:
+        for item in reader.read():
+            if reader.lazy_encoding:
+                yield item.image_name, item.frame_as(CHANNEL_ORDER_BGR), item.image_size
+            else:
+                yield item.image_name, item.data, item.image_size
+    finally:
+        reader.finalize()
@@ -1,12 +1,19 @@
 import argparse
-import cv2
 import os
+from collections import deque
 from typing import List, Iterable
 
 from wai.logging import LOGGING_WARNING
 
 from kasperl.api import Reader
 from idc.api import DATATYPES, data_type_to_class, DataTypeSupporter, ImageData, FORMAT_JPEG
+from idc.video.util.batch import batch_items
+from idc.video.util.capture import BACKEND_ANY, BACKENDS, THREADS_DEFAULT, auto_threads, parse_capture_params, open_capture
+from idc.video.util.encoder import encode_frames
+from idc.video.util.frames import FRAME_FORMATS, FRAME_FORMAT_EXTENSIONS, encode_params, frame_to_data
+from idc.video.util.latest_frame import LatestFrameCapture
+from idc.video.util.prefetch import Prefetcher
+from idc.video.util.transform import RESIZE_FIT, RESIZE_MODES, INTERPOLATION_AREA, INTERPOLATIONS, parse_crop, transform_frame
 
 
 class WebcamReader(Reader, DataTypeSupporter):
@@ -16,7 +23,12 @@ class WebcamReader(Reader, DataTypeSupporter):
 
     def __init__(self, webcam_id: int = None, from_frame: int = None, to_frame: int = None,
                  nth_frame: int = None, max_frames: int = None, fast: bool = None,
-                 prefix: str = None, data_type: str = None,
+                 latest_frame: bool = None, latest_frame_buffer: int = None,
+                 prefetch: int = None, lazy_encoding: bool = None, batch_size: int = None,
+                 backend: str = None, decoder_threads: int = None, capture_params: List[str] = None,
+                 image_format: str = None, quality: int = None, png_compression: int = None, num_encoders: int = None,
+                 crop: str = None, resize_width: int = None, resize_height: int = None, resize_mode: str = None,
+                 interpolation: str = None, prefix: str = None, data_type: str = None,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the reader.
@@ -33,6 +45,40 @@ class WebcamReader(Reader, DataTypeSupporter):
         :type max_frames: int
         :param fast: whether to perform fast frame extraction
         :type fast: bool
+        :param latest_frame: whether to capture continuously in a background thread and only forward the most recent frames
+        :type latest_frame: bool
+        :param latest_frame_buffer: the number of most recent frames to keep when capturing in the background
+        :type latest_frame_buffer: int
+        :param prefetch: the number of frames to decode ahead in a background thread, <=0 to disable
+        :type prefetch: int
+        :param lazy_encoding: whether to forward the decoded frames and only encode them when required
+        :type lazy_encoding: bool
+        :param batch_size: the number of frames to forward as a list, forwards them one by one if <=1
+        :type batch_size: int
+        :param backend: the capture backend to use (any/ffmpeg/gstreamer/v4l2)
+        :type backend: str
+        :param decoder_threads: the number of decoder threads, 0 for the backend's default, -1 to determine from the available cores
+        :type decoder_threads: int
+        :param capture_params: additional parameters (NAME=VALUE) for opening the capture
+        :type capture_params: list
+        :param image_format: the format to encode the frames in (JPEG/PNG/BMP/WEBP)
+        :type image_format: str
+        :param quality: the quality to use for JPEG and WebP (0-100), <0 for the encoder's default
+        :type quality: int
+        :param png_compression: the compression level to use for PNG (0-9), <0 for the encoder's default
+        :type png_compression: int
+        :param num_encoders: the number of threads for encoding the frames, <=1 to encode in the reading thread
+        :type num_encoders: int
+        :param crop: the rectangle 'x,y,width,height' (0-based) to crop the frames to, None or empty for no cropping
+        :type crop: str
+        :param resize_width: the width to resize the frames to, <=0 to preserve the aspect ratio using the height
+        :type resize_width: int
+        :param resize_height: the height to resize the frames to, <=0 to preserve the aspect ratio using the width
+        :type resize_height: int
+        :param resize_mode: how to resize if both width and height are specified (stretch/fit/fill)
+        :type resize_mode: str
+        :param interpolation: the interpolation to use for resizing (nearest/linear/cubic/area/lanczos)
+        :type interpolation: str
         :param data_type: the type of output to generate from the images
         :type data_type: str
         :param logger_name: the name to use for the logger
@@ -48,12 +94,36 @@ class WebcamReader(Reader, DataTypeSupporter):
         self.nth_frame = nth_frame
         self.max_frames = max_frames
         self.fast = fast
+        self.latest_frame = latest_frame
+        self.latest_frame_buffer = latest_frame_buffer
+        self.prefetch = prefetch
+        self.lazy_encoding = lazy_encoding
+        self.batch_size = batch_size
+        self.backend = backend
+        self.decoder_threads = decoder_threads
+        self.capture_params = capture_params
+        self.image_format = image_format
+        self.quality = quality
+        self.png_compression = png_compression
+        self.num_encoders = num_encoders
+        self.crop = crop
+        self.resize_width = resize_width
+        self.resize_height = resize_height
+        self.resize_mode = resize_mode
+        self.interpolation = interpolation
         self.prefix = prefix
         self._cap = None
         self._frame_no = None
         self._frame_count = None
         self._inputs = None
         self._current_input = None
+        self._prefetcher = None
+        self._latest = None
+        self._capture_times = None
+        self._encode_params = None
+        self._decoder_threads = None
+        self._capture_params = None
+        self._crop = None
 
     def name(self) -> str:
         """
@@ -88,6 +158,23 @@ class WebcamReader(Reader, DataTypeSupporter):
         parser.add_argument("-n", "--nth_frame", type=int, default=1, help="Determines whether frames get skipped and only evert nth frame gets forwarded.", required=False)
         parser.add_argument("-m", "--max_frames", type=int, default=-1, help="Determines the maximum number of frames to read; ignored if <=0.", required=False)
         parser.add_argument("--fast", action="store_true", help="Whether to perform fast frame extraction.", required=False)
+        parser.add_argument("--latest_frame", action="store_true", help="Whether to capture frames continuously in a background thread and only forward the most recent one(s) (see --latest_frame_buffer), dropping stale frames when the processing is slower than the camera; the frame numbers include the dropped frames, which also count towards --nth_frame; dropped frames and capture-to-forward latency get logged at info level; --fast is ignored.", required=False)
+        parser.add_argument("--latest_frame_buffer", type=int, default=1, help="The number of most recent frames to keep when using --latest_frame.", required=False)
+        parser.add_argument("--prefetch", type=int, default=0, help="The number of frames to decode ahead in a background thread, overlapping decoding with the processing of the frames; disabled if <=0.", required=False)
+        parser.add_argument("--lazy_encoding", action="store_true", help="Whether to forward the decoded frames as they are and only encode them (see --image_format) when a downstream plugin requires the image data; the video plugins use the decoded frames directly. Requires more memory per frame.", required=False)
+        parser.add_argument("--batch_size", type=int, default=1, help="The number of frames to forward as a list in one go, reducing the per-item overhead of the pipeline; a batch never spans multiple inputs; forwards the frames one by one if <=1.", required=False)
+        parser.add_argument("--backend", choices=sorted(BACKENDS.keys()), default=BACKEND_ANY, help="The backend to use for capturing the frames.", required=False)
+        parser.add_argument("--decoder_threads", type=int, default=THREADS_DEFAULT, help="The number of threads the backend should use for decoding; 0 uses the backend's default; -1 determines the number from the CPU cores available to the process (taking CPU affinity and cgroup limits into account), shared between concurrent decoders.", required=False)
+        parser.add_argument("--capture_params", type=str, nargs="*", default=None, help="Additional parameters for opening the capture, format: NAME=VALUE with NAME being the name of an OpenCV CAP_PROP_* constant (prefix can be omitted), e.g., HW_ACCELERATION=1.", required=False)
+        parser.add_argument("--image_format", choices=FRAME_FORMATS, default=FORMAT_JPEG, help="The image format to encode the frames in.", required=False)
+        parser.add_argument("--quality", type=int, default=-1, help="The quality to use for encoding the frames as JPEG or WEBP (0-100); uses the encoder's default if <0.", required=False)
+        parser.add_argument("--png_compression", type=int, default=-1, help="The compression level to use for encoding the frames as PNG (0-9); uses the encoder's default if <0.", required=False)
+        parser.add_argument("--num_encoders", type=int, default=1, help="The number of threads to use for encoding the frames, forwarding the frames in their original order; encodes in the reading thread if <=1.", required=False)
+        parser.add_argument("--crop", type=str, default=None, help="The rectangle to crop the frames to before resizing/encoding them, format: 'x,y,width,height' (0-based); gets clipped at the frame borders.", required=False)
+        parser.add_argument("--resize_width", type=int, default=-1, help="The width to resize the frames to before encoding them; preserves the aspect ratio using --resize_height if <=0.", required=False)
+        parser.add_argument("--resize_height", type=int, default=-1, help="The height to resize the frames to before encoding them; preserves the aspect ratio using --resize_width if <=0.", required=False)
+        parser.add_argument("--resize_mode", choices=RESIZE_MODES, default=RESIZE_FIT, help="How to resize the frames if both width and height are specified: 'stretch' ignores the aspect ratio, 'fit' scales the frames to fit within the dimensions, 'fill' scales them to cover the dimensions and crops the centre.", required=False)
+        parser.add_argument("--interpolation", choices=sorted(INTERPOLATIONS.keys()), default=INTERPOLATION_AREA, help="The interpolation to use for resizing the frames.", required=False)
         parser.add_argument("-p", "--prefix", type=str, help="The prefix to use for the frames", required=False, default="webcam-")
         return parser
 
@@ -106,6 +193,23 @@ class WebcamReader(Reader, DataTypeSupporter):
         self.nth_frame = ns.nth_frame
         self.max_frames = ns.max_frames
         self.fast = ns.fast
+        self.latest_frame = ns.latest_frame
+        self.latest_frame_buffer = ns.latest_frame_buffer
+        self.prefetch = ns.prefetch
+        self.lazy_encoding = ns.lazy_encoding
+        self.batch_size = ns.batch_size
+        self.backend = ns.backend
+        self.decoder_threads = ns.decoder_threads
+        self.capture_params = ns.capture_params
+        self.image_format = ns.image_format
+        self.quality = ns.quality
+        self.png_compression = ns.png_compression
+        self.num_encoders = ns.num_encoders
+        self.crop = ns.crop
+        self.resize_width = ns.resize_width
+        self.resize_height = ns.resize_height
+        self.resize_mode = ns.resize_mode
+        self.interpolation = ns.interpolation
         self.prefix = ns.prefix
 
     def generates(self) -> List:
@@ -139,6 +243,51 @@ class WebcamReader(Reader, DataTypeSupporter):
             self.max_frames = -1
         if self.fast is None:
             self.fast = False
+        if self.latest_frame is None:
+            self.latest_frame = False
+        if self.latest_frame_buffer is None:
+            self.latest_frame_buffer = 1
+        if self.latest_frame_buffer < 1:
+            raise Exception("latest_frame_buffer must be at least 1, provided: %d" % self.latest_frame_buffer)
+        if self.prefetch is None:
+            self.prefetch = 0
+        if self.lazy_encoding is None:
+            self.lazy_encoding = False
+        if self.batch_size is None:
+            self.batch_size = 1
+        if self.backend is None:
+            self.backend = BACKEND_ANY
+        if self.backend not in BACKENDS:
+            raise Exception("Unknown capture backend: %s" % self.backend)
+        if self.decoder_threads is None:
+            self.decoder_threads = THREADS_DEFAULT
+        self._decoder_threads = self.decoder_threads
+        if self._decoder_threads < 0:
+            self._decoder_threads = auto_threads(1)
+            self.logger().info("Decoder threads: %d" % self._decoder_threads)
+        self._capture_params = parse_capture_params(self.capture_params)
+        if self.image_format is None:
+            self.image_format = FORMAT_JPEG
+        if self.quality is None:
+            self.quality = -1
+        if self.png_compression is None:
+            self.png_compression = -1
+        if self.num_encoders is None:
+            self.num_encoders = 1
+        self._encode_params = encode_params(self.image_format, quality=self.quality, png_compression=self.png_compression)
+        if self.resize_width is None:
+            self.resize_width = -1
+        if self.resize_height is None:
+            self.resize_height = -1
+        if self.resize_mode is None:
+            self.resize_mode = RESIZE_FIT
+        if self.resize_mode not in RESIZE_MODES:
+            raise Exception("Unknown resize mode: %s" % self.resize_mode)
+        if self.interpolation is None:
+            self.interpolation = INTERPOLATION_AREA
+        if self.interpolation not in INTERPOLATIONS:
+            raise Exception("Unknown interpolation: %s" % self.interpolation)
+        self._crop = parse_crop(self.crop)
         if self.prefix is None:
             self.prefix = ""
         self._inputs = [self.webcam_id]
@@ -154,7 +303,36 @@ class WebcamReader(Reader, DataTypeSupporter):
         self.session.current_input = self.prefix + str(self._current_input)
         self.logger().info("Reading from webcam: " + str(self._current_input))
 
-        self._cap = cv2.VideoCapture(self._current_input)
+        if self.latest_frame:
+            self._capture_times = deque()
+            items = self._read_latest()
+        else:
+            items = self._read_input()
+        if (self.num_encoders > 1) and not self.lazy_encoding:
+            items = encode_frames(items, self.num_encoders)
+        if self.prefetch > 0:
+            self._prefetcher = Prefetcher(items, self.prefetch)
+            items = self._prefetcher
+        if self.batch_size > 1:
+            items = batch_items(items, self.batch_size, self.session)
+        for item in items:
+            if self._latest is not None:
+                for _ in range(len(item) if isinstance(item, list) else 1):
+                    self._latest.record_latency(self._capture_times.popleft())
+            yield item
+        if self._prefetcher is not None:
+            self.logger().info("Prefetch: " + self._prefetcher.stats())
+            self._prefetcher = None
+        self._stop_latest()
+
+    def _read_input(self) -> Iterable:
+        """
+        Reads the frames from the current input.
+
+        :return: the data
+        :rtype: Iterable
+        """
+        self._cap = open_capture(self._current_input, backend=self.backend, threads=self._decoder_threads, params=self._capture_params)
         self._frame_no = 0
         self._frame_count = 0
 
@@ -196,16 +374,94 @@ class WebcamReader(Reader, DataTypeSupporter):
 
                 self._frame_count += 1
                 count = 0
-                data = cv2.imencode(".jpg", frame_curr)[1].tobytes()
-                filename = os.path.join(
-                    self.session.current_input,
-                    "%s%08d.jpg" % (self.prefix, self._frame_no))
-                height, width, _ = frame_curr.shape
-                yield cls(image_name=os.path.basename(filename), data=data, image_format=FORMAT_JPEG, image_size=(width, height))
+                yield self._to_data(cls, frame_curr)
             else:
                 self._cap.release()
                 self._cap = None
 
+    def _to_data(self, cls, frame_curr):
+        """
+        Transforms the frame and turns it into a data container.
+
+        :param cls: the data container class to use
+        :param frame_curr: the frame to convert
+        :type frame_curr: np.ndarray
+        :return: the container
+        """
+        frame_curr = transform_frame(frame_curr, crop=self._crop, resize_width=self.resize_width,
+                                     resize_height=self.resize_height, resize_mode=self.resize_mode,
+                                     interpolation=self.interpolation)
+        filename = os.path.join(
+            self.session.current_input,
+            "%s%08d%s" % (self.prefix, self._frame_no, FRAME_FORMAT_EXTENSIONS[self.image_format]))
+        return frame_to_data(cls, frame_curr, os.path.basename(filename),
+                             lazy=self.lazy_encoding or (self.num_encoders > 1),
+                             image_format=self.image_format, params=self._encode_params)
+
+    def _read_latest(self) -> Iterable:
+        """
+        Reads the frames from the current input in a background thread, only forwarding the most recent ones.
+
+        :return: the data
+        :rtype: Iterable
+        """
+        self._cap = open_capture(self._current_input, backend=self.backend, threads=self._decoder_threads, params=self._capture_params)
+        self._frame_no = 0
+        self._frame_count = 0
+        try:
+            if (self._cap is None) or not self._cap.isOpened():
+                return
+            self._latest = LatestFrameCapture(self._cap, buffer_size=self.latest_frame_buffer)
+            self._latest.start()
+
+            cls = data_type_to_class(self.data_type)
+
+            # the capture number of the last forwarded frame, frames dropped by the capture thread count towards nth_frame
+            last = max(0, self.from_frame - 1)
+            while True:
+                latest = self._latest.next()
+                if latest is None:
+                    break
+                self._frame_no, frame_curr, capture_time = latest
+
+                # within frame window?
+                if self.from_frame > 0:
+                    if self._frame_no < self.from_frame:
+                        continue
+                if self.to_frame > 0:
+                    if self._frame_no >= self.to_frame:
+                        break
+
+                # skip frame?
+                if (self.nth_frame > 1) and (self._frame_no - last < self.nth_frame):
+                    continue
+
+                # max frames reached?
+                if (self.max_frames > 0) and (self._frame_count >= self.max_frames):
+                    break
+
+                self._frame_count += 1
+                last = self._frame_no
+                self._capture_times.append(capture_time)
+                yield self._to_data(cls, frame_curr)
+        finally:
+            # stop the capture thread before releasing the capture
+            if self._latest is not None:
+                self._latest.stop()
+            if self._cap is not None:
+                self._cap.release()
+                self._cap = None
+
+    def _stop_latest(self):
+        """
+        Stops the background capture, if active, and logs its statistics.
+        """
+        if self._latest is None:
+            return
+        self._latest.stop()
+        self.logger().info("Latest frame: " + self._latest.stats())
+        self._latest = None
+
     def has_finished(self) -> bool:
         """
         Returns whether reading has finished.
@@ -219,6 +475,10 @@ class WebcamReader(Reader, DataTypeSupporter):
         """
         Finishes the reading, e.g., for closing files or databases.
         """
+        if self._prefetcher is not None:
+            self._prefetcher.stop()
+            self._prefetcher = None
+        self._stop_latest()
         if self._current_input is not None:
             super().finalize()
             # close video file
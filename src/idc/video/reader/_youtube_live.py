@@ -1,7 +1,6 @@
 import argparse
 import logging
 
-import cv2
 import os
 from typing import List, Iterable
 
@@ -10,6 +9,11 @@ from vidgear.gears import CamGear
 
 from kasperl.api import Reader
 from idc.api import DATATYPES, data_type_to_class, DataTypeSupporter, ImageData, FORMAT_JPEG
+from idc.video.util.batch import batch_items
+from idc.video.util.encoder import encode_frames
+from idc.video.util.frames import FRAME_FORMATS, FRAME_FORMAT_EXTENSIONS, encode_params, frame_to_data
+from idc.video.util.prefetch import Prefetcher
+from idc.video.util.transform import RESIZE_FIT, RESIZE_MODES, INTERPOLATION_AREA, INTERPOLATIONS, parse_crop, transform_frame
 
 
 class YoutubeLiveReader(Reader, DataTypeSupporter):
@@ -19,7 +23,10 @@ class YoutubeLiveReader(Reader, DataTypeSupporter):
 
     def __init__(self, url: str = None, resolution: str = None, from_frame: int = None, to_frame: int = None,
                  nth_frame: int = None, max_frames: int = None, fast: bool = None,
-                 prefix: str = None, data_type: str = None,
+                 prefetch: int = None, lazy_encoding: bool = None, batch_size: int = None,
+                 image_format: str = None, quality: int = None, png_compression: int = None, num_encoders: int = None,
+                 crop: str = None, resize_width: int = None, resize_height: int = None, resize_mode: str = None,
+                 interpolation: str = None, prefix: str = None, data_type: str = None,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the reader.
@@ -38,6 +45,30 @@ class YoutubeLiveReader(Reader, DataTypeSupporter):
         :type max_frames: int
         :param fast: whether to perform fast frame extraction
         :type fast: bool
+        :param prefetch: the number of frames to decode ahead in a background thread, <=0 to disable
+        :type prefetch: int
+        :param lazy_encoding: whether to forward the decoded frames and only encode them when required
+        :type lazy_encoding: bool
+        :param batch_size: the number of frames to forward as a list, forwards them one by one if <=1
+        :type batch_size: int
+        :param image_format: the format to encode the frames in (JPEG/PNG/BMP/WEBP)
+        :type image_format: str
+        :param quality: the quality to use for JPEG and WebP (0-100), <0 for the encoder's default
+        :type quality: int
+        :param png_compression: the compression level to use for PNG (0-9), <0 for the encoder's default
+        :type png_compression: int
+        :param num_encoders: the number of threads for encoding the frames, <=1 to encode in the reading thread
+        :type num_encoders: int
+        :param crop: the rectangle 'x,y,width,height' (0-based) to crop the frames to, None or empty for no cropping
+        :type crop: str
+        :param resize_width: the width to resize the frames to, <=0 to preserve the aspect ratio using the height
+        :type resize_width: int
+        :param resize_height: the height to resize the frames to, <=0 to preserve the aspect ratio using the width
+        :type resize_height: int
+        :param resize_mode: how to resize if both width and height are specified (stretch/fit/fill)
+        :type resize_mode: str
+        :param interpolation: the interpolation to use for resizing (nearest/linear/cubic/area/lanczos)
+        :type interpolation: str
         :param data_type: the type of output to generate from the images
         :type data_type: str
         :param logger_name: the name to use for the logger
@@ -54,12 +85,27 @@ class YoutubeLiveReader(Reader, DataTypeSupporter):
         self.nth_frame = nth_frame
         self.max_frames = max_frames
         self.fast = fast
+        self.prefetch = prefetch
+        self.lazy_encoding = lazy_encoding
+        self.batch_size = batch_size
+        self.image_format = image_format
+        self.quality = quality
+        self.png_compression = png_compression
+        self.num_encoders = num_encoders
+        self.crop = crop
+        self.resize_width = resize_width
+        self.resize_height = resize_height
+        self.resize_mode = resize_mode
+        self.interpolation = interpolation
         self.prefix = prefix
         self._cap = None
         self._frame_no = None
         self._frame_count = None
         self._inputs = None
         self._current_input = None
+        self._prefetcher = None
+        self._encode_params = None
+        self._crop = None
 
     def name(self) -> str:
         """
@@ -95,6 +141,18 @@ class YoutubeLiveReader(Reader, DataTypeSupporter):
         parser.add_argument("-n", "--nth_frame", type=int, default=1, help="Determines whether frames get skipped and only evert nth frame gets forwarded.", required=False)
         parser.add_argument("-m", "--max_frames", type=int, default=-1, help="Determines the maximum number of frames to read; ignored if <=0.", required=False)
         parser.add_argument("--fast", action="store_true", help="Whether to perform fast frame extraction.", required=False)
+        parser.add_argument("--prefetch", type=int, default=0, help="The number of frames to decode ahead in a background thread, overlapping decoding with the processing of the frames; disabled if <=0.", required=False)
+        parser.add_argument("--lazy_encoding", action="store_true", help="Whether to forward the decoded frames as they are and only encode them (see --image_format) when a downstream plugin requires the image data; the video plugins use the decoded frames directly. Requires more memory per frame.", required=False)
+        parser.add_argument("--batch_size", type=int, default=1, help="The number of frames to forward as a list in one go, reducing the per-item overhead of the pipeline; a batch never spans multiple inputs; forwards the frames one by one if <=1.", required=False)
+        parser.add_argument("--image_format", choices=FRAME_FORMATS, default=FORMAT_JPEG, help="The image format to encode the frames in.", required=False)
+        parser.add_argument("--quality", type=int, default=-1, help="The quality to use for encoding the frames as JPEG or WEBP (0-100); uses the encoder's default if <0.", required=False)
+        parser.add_argument("--png_compression", type=int, default=-1, help="The compression level to use for encoding the frames as PNG (0-9); uses the encoder's default if <0.", required=False)
+        parser.add_argument("--num_encoders", type=int, default=1, help="The number of threads to use for encoding the frames, forwarding the frames in their original order; encodes in the reading thread if <=1.", required=False)
+        parser.add_argument("--crop", type=str, default=None, help="The rectangle to crop the frames to before resizing/encoding them, format: 'x,y,width,height' (0-based); gets clipped at the frame borders.", required=False)
+        parser.add_argument("--resize_width", type=int, default=-1, help="The width to resize the frames to before encoding them; preserves the aspect ratio using --resize_height if <=0.", required=False)
+        parser.add_argument("--resize_height", type=int, default=-1, help="The height to resize the frames to before encoding them; preserves the aspect ratio using --resize_width if <=0.", required=False)
+        parser.add_argument("--resize_mode", choices=RESIZE_MODES, default=RESIZE_FIT, help="How to resize the frames if both width and height are specified: 'stretch' ignores the aspect ratio, 'fit' scales the frames to fit within the dimensions, 'fill' scales them to cover the dimensions and crops the centre.", required=False)
+        parser.add_argument("--interpolation", choices=sorted(INTERPOLATIONS.keys()), default=INTERPOLATION_AREA, help="The interpolation to use for resizing the frames.", required=False)
         parser.add_argument("-p", "--prefix", type=str, help="The prefix to use for the frames", required=False, default="youtube-")
         return parser
 
@@ -114,6 +172,18 @@ class YoutubeLiveReader(Reader, DataTypeSupporter):
         self.nth_frame = ns.nth_frame
         self.max_frames = ns.max_frames
         self.fast = ns.fast
+        self.prefetch = ns.prefetch
+        self.lazy_encoding = ns.lazy_encoding
+        self.batch_size = ns.batch_size
+        self.image_format = ns.image_format
+        self.quality = ns.quality
+        self.png_compression = ns.png_compression
+        self.num_encoders = ns.num_encoders
+        self.crop = ns.crop
+        self.resize_width = ns.resize_width
+        self.resize_height = ns.resize_height
+        self.resize_mode = ns.resize_mode
+        self.interpolation = ns.interpolation
         self.prefix = ns.prefix
 
     def generates(self) -> List:
@@ -149,6 +219,34 @@ class YoutubeLiveReader(Reader, DataTypeSupporter):
             self.max_frames = -1
         if self.fast is None:
             self.fast = False
+        if self.prefetch is None:
+            self.prefetch = 0
+        if self.lazy_encoding is None:
+            self.lazy_encoding = False
+        if self.batch_size is None:
+            self.batch_size = 1
+        if self.image_format is None:
+            self.image_format = FORMAT_JPEG
+        if self.quality is None:
+            self.quality = -1
+        if self.png_compression is None:
+            self.png_compression = -1
+        if self.num_encoders is None:
+            self.num_encoders = 1
+        self._encode_params = encode_params(self.image_format, quality=self.quality, png_compression=self.png_compression)
+        if self.resize_width is None:
+            self.resize_width = -1
+        if self.resize_height is None:
+            self.resize_height = -1
+        if self.resize_mode is None:
+            self.resize_mode = RESIZE_FIT
+        if self.resize_mode not in RESIZE_MODES:
+            raise Exception("Unknown resize mode: %s" % self.resize_mode)
+        if self.interpolation is None:
+            self.interpolation = INTERPOLATION_AREA
+        if self.interpolation not in INTERPOLATIONS:
+            raise Exception("Unknown interpolation: %s" % self.interpolation)
+        self._crop = parse_crop(self.crop)
         if self.prefix is None:
             self.prefix = ""
         if self.resolution is None:
@@ -165,6 +263,28 @@ class YoutubeLiveReader(Reader, DataTypeSupporter):
         self._current_input = self._inputs.pop(0)
         self.session.current_input = self.prefix + str(self._current_input)
         self.logger().info("Reading from Youtube: " + str(self._current_input))
+
+        items = self._read_input()
+        if (self.num_encoders > 1) and not self.lazy_encoding:
+            items = encode_frames(items, self.num_encoders)
+        if self.prefetch > 0:
+            self._prefetcher = Prefetcher(items, self.prefetch)
+            items = self._prefetcher
+        if self.batch_size > 1:
+            items = batch_items(items, self.batch_size, self.session)
+        for item in items:
+            yield item
+        if self._prefetcher is not None:
+            self.logger().info("Prefetch: " + self._prefetcher.stats())
+            self._prefetcher = None
+
+    def _read_input(self) -> Iterable:
+        """
+        Reads the frames from the current input.
+
+        :return: the data
+        :rtype: Iterable
+        """
         logging_on = self.logger().level < logging.WARNING
 
         self._cap = CamGear(source=self._current_input, stream_mode=True,
@@ -211,12 +331,15 @@ class YoutubeLiveReader(Reader, DataTypeSupporter):
 
                 self._frame_count += 1
                 count = 0
-                data = cv2.imencode(".jpg", frame_curr)[1].tobytes()
+                frame_curr = transform_frame(frame_curr, crop=self._crop, resize_width=self.resize_width,
+                                             resize_height=self.resize_height, resize_mode=self.resize_mode,
+                                             interpolation=self.interpolation)
                 filename = os.path.join(
                     self.session.current_input,
-                    "%s%08d.jpg" % (self.prefix, self._frame_no))
-                height, width, _ = frame_curr.shape
-                yield cls(image_name=os.path.basename(filename), data=data, image_format=FORMAT_JPEG, image_size=(width, height))
+                    "%s%08d%s" % (self.prefix, self._frame_no, FRAME_FORMAT_EXTENSIONS[self.image_format]))
+                yield frame_to_data(cls, frame_curr, os.path.basename(filename),
+                                    lazy=self.lazy_encoding or (self.num_encoders > 1),
+                                    image_format=self.image_format, params=self._encode_params)
             else:
                 self._cap.release()
                 self._cap = None
@@ -234,6 +357,9 @@ class YoutubeLiveReader(Reader, DataTypeSupporter):
         """
         Finishes the reading, e.g., for closing files or databases.
         """
+        if self._prefetcher is not None:
+            self._prefetcher.stop()
+            self._prefetcher = None
         if self._current_input is not None:
             super().finalize()
             # close video file
@@ -0,0 +1,150 @@
+import argparse
+import logging
+import os
+import traceback
+from typing import Dict, Iterable, List
+
+from wai.logging import add_logging_level, init_logging, set_logging_level
+from seppl.io import locate_files
+
+from idc.core import ENV_IDC_LOGLEVEL
+from idc.video.util.capture import BACKEND_ANY, BACKENDS
+from idc.video.util.manifest import MANIFEST_EXTENSIONS, FIELD_PATH, FIELD_ERROR, probe_video, is_current, same_settings, load_manifest, save_manifest
+from idc.video.util.parallel import ORDER_INTERLEAVED, DecoderPool
+
+PROBE = "idc-video-probe"
+
+_logger = logging.getLogger(PROBE)
+
+
+def _probe_task(task) -> Iterable:
+    """
+    Probes a single video, used by the worker processes.
+
+    :param task: the tuple of video file, backend, whether to use the frame index and the index directory
+    :type task: tuple
+    :return: iterator with the record
+    """
+    path, backend, index, index_dir = task
+    yield probe_video(path, backend=backend, index=index, index_dir=index_dir)
+
+
+def probe_videos(paths: List[str], backend: str = BACKEND_ANY, index: bool = False, index_dir: str = None,
+                 num_workers: int = 1, previous: List[Dict] = None) -> List[Dict]:
+    """
+    Probes the videos, using worker processes if required. With previous records, only new videos,
+    videos whose size or modification time changed and videos that were probed with different
+    settings (backend, index) get probed again.
+
+    :param paths: the videos to probe
+    :type paths: list
+    :param backend: the capture backend to use
+    :type backend: str
+    :param index: whether to use the frame index for exact frame counts and duration
+    :type index: bool
+    :param index_dir: the directory with the frame index files, None if stored next to the videos
+    :type index_dir: str
+    :param num_workers: the number of worker processes to use, probes in this process if <=1
+    :type num_workers: int
+    :param previous: the records of a previous run, can be None
+    :type previous: list
+    :return: the records, in the order of the paths
+    :rtype: list
+    """
+    known = dict()
+    if previous is not None:
+        for record in previous:
+            known[record[FIELD_PATH]] = record
+
+    result = dict()
+    todo = []
+    for path in paths:
+        if (path in known) and (known[path].get(FIELD_ERROR) is None) and is_current(known[path], path) \
+                and same_settings(known[path], backend=backend, index=index):
+            result[path] = known[path]
+        else:
+            todo.append(path)
+    _logger.info("Videos to probe: %d (up-to-date: %d)" % (len(todo), len(result)))
+
+    if num_workers <= 1:
+        for path in todo:
+            result[path] = probe_video(path, backend=backend, index=index, index_dir=index_dir)
+    elif len(todo) > 0:
+        tasks = [(path, backend, index, index_dir) for path in todo]
+        pool = DecoderPool(_probe_task, tasks, num_workers, order=ORDER_INTERLEAVED)
+        pool.start()
+        try:
+            for i, record in pool.results():
+                result[todo[i]] = record
+        finally:
+            pool.stop()
+
+    for path in todo:
+        if result[path].get(FIELD_ERROR) is not None:
+            _logger.warning("Failed to probe %s: %s" % (path, result[path][FIELD_ERROR]))
+    return [result[path] for path in paths]
+
+
+def main(args=None):
+    """
+    The main method for parsing command-line arguments.
+
+    :param args: the commandline arguments, uses sys.argv if not supplied
+    :type args: list
+    """
+    init_logging(env_var=ENV_IDC_LOGLEVEL)
+    parser = argparse.ArgumentParser(
+        description="Probes video files (duration, frame rate, frame count, resolution, codec) in parallel and stores the information in a manifest, which can be used as input list for the from-video-file reader.",
+        prog=PROBE,
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-i", "--input", type=str, help="Path to the video file(s) to probe; glob syntax is supported.", required=False, nargs="*")
+    parser.add_argument("-I", "--input_list", type=str, help="Path to the text file(s) listing the video files to probe.", required=False, nargs="*")
+    parser.add_argument("-o", "--output", metavar="FILE", type=str, help="The manifest to write, the format is determined by the extension: " + ", ".join(MANIFEST_EXTENSIONS.keys()), required=True)
+    parser.add_argument("-r", "--refresh", action="store_true", help="Whether to only probe new videos, videos whose size or modification time changed and videos probed with different settings (--backend, --index), re-using the other records of an existing manifest.", required=False)
+    parser.add_argument("-k", "--keep_missing", action="store_true", help="Whether to keep the records of an existing manifest of videos that are no longer part of the inputs when refreshing (as long as the videos still exist).", required=False)
+    parser.add_argument("-n", "--num_workers", type=int, default=1, help="The number of worker processes to use for probing; probes in the main process if <=1.", required=False)
+    parser.add_argument("--backend", choices=sorted(BACKENDS.keys()), default=BACKEND_ANY, help="The backend to use for opening the videos.", required=False)
+    parser.add_argument("--index", action="store_true", help="Whether to use the frame index (obtained by demuxing the video) for exact frame counts and durations.", required=False)
+    parser.add_argument("--index_dir", type=str, default=None, help="The directory to store the frame index files in; stored next to the videos if not specified.", required=False)
+    add_logging_level(parser)
+    parsed = parser.parse_args(args=args)
+    set_logging_level(_logger, parsed.logging_level)
+
+    if (parsed.input is None) and (parsed.input_list is None):
+        raise Exception("Neither input paths nor input lists provided!")
+    paths = locate_files(parsed.input, input_lists=parsed.input_list, fail_if_empty=True)
+
+    previous = None
+    if parsed.refresh and os.path.exists(parsed.output):
+        previous = load_manifest(parsed.output)
+        _logger.info("Loaded %d record(s) from: %s" % (len(previous), parsed.output))
+
+    records = probe_videos(paths, backend=parsed.backend, index=parsed.index, index_dir=parsed.index_dir,
+                           num_workers=parsed.num_workers, previous=previous)
+    if (previous is not None) and parsed.keep_missing:
+        located = set(paths)
+        for record in previous:
+            if (record[FIELD_PATH] not in located) and os.path.exists(record[FIELD_PATH]):
+                records.append(record)
+
+    save_manifest(records, parsed.output)
+    _logger.info("Wrote %d record(s) to: %s" % (len(records), parsed.output))
+
+
+def sys_main() -> int:
+    """
+    Runs the main function using the system cli arguments, and
+    returns a system error code.
+
+    :return: 0 for success, 1 for failure.
+    """
+    try:
+        main()
+        return 0
+    except Exception:
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == '__main__':
+    main()
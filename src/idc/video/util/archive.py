@@ -0,0 +1,362 @@
+import fnmatch
+import glob
+import io
+import os
+import tarfile
+import threading
+import zipfile
+
+from typing import Dict, List, Optional, Tuple
+
+ARCHIVE_SEPARATOR = "!"
+""" separates the archive from the member, e.g., bundle.tar!/cam1/0001.mp4 """
+
+ARCHIVE_FORMAT_ZIP = "zip"
+ARCHIVE_FORMAT_TAR = "tar"
+ARCHIVE_FORMATS = [
+    ARCHIVE_FORMAT_ZIP,
+    ARCHIVE_FORMAT_TAR,
+]
+
+ARCHIVE_EXTENSIONS = {
+    ".zip": ARCHIVE_FORMAT_ZIP,
+    ".tar": ARCHIVE_FORMAT_TAR,
+    ".tar.gz": ARCHIVE_FORMAT_TAR,
+    ".tgz": ARCHIVE_FORMAT_TAR,
+    ".tar.bz2": ARCHIVE_FORMAT_TAR,
+    ".tbz2": ARCHIVE_FORMAT_TAR,
+    ".tar.xz": ARCHIVE_FORMAT_TAR,
+    ".txz": ARCHIVE_FORMAT_TAR,
+}
+
+BUFFER_SIZE = 1024 * 1024
+""" the buffer size for reading members. """
+
+_TAR_INDEX = dict()
+""" the members of the tar archives that were read, keyed by archive (with size and modification time). """
+
+_TAR_INDEX_LOCK = threading.Lock()
+
+
+def archive_format(path: str) -> Optional[str]:
+    """
+    Determines the format of the archive from the file extension.
+
+    :param path: the archive
+    :type path: str
+    :return: the format (zip/tar), None if not an archive
+    :rtype: str
+    """
+    lower = path.lower()
+    for ext in ARCHIVE_EXTENSIONS:
+        if lower.endswith(ext):
+            return ARCHIVE_EXTENSIONS[ext]
+    return None
+
+
+def split_archive_path(path: str) -> Optional[Tuple[str, str]]:
+    """
+    Splits the path into archive and member, e.g., bundle.tar!/cam1/0001.mp4.
+
+    :param path: the path to split
+    :type path: str
+    :return: the tuple of archive and member, None if not a path of an archive member
+    :rtype: tuple
+    """
+    if not isinstance(path, str):
+        return None
+    start = 0
+    while True:
+        pos = path.find(ARCHIVE_SEPARATOR, start)
+        if pos < 0:
+            return None
+        archive = path[:pos]
+        if archive_format(archive) is not None:
+            member = path[pos + len(ARCHIVE_SEPARATOR):].lstrip("/")
+            if len(member) > 0:
+                return archive, member
+        start = pos + 1
+
+
+def is_archive_path(path: str) -> bool:
+    """
+    Checks whether the path refers to an archive member.
+
+    :param path: the path to check
+    :type path: str
+    :return: True if an archive member
+    :rtype: bool
+    """
+    return split_archive_path(path) is not None
+
+
+def archive_path(archive: str, member: str) -> str:
+    """
+    Generates the path for the archive member.
+
+    :param archive: the archive
+    :type archive: str
+    :param member: the name of the member
+    :type member: str
+    :return: the path
+    :rtype: str
+    """
+    return "%s%s/%s" % (archive, ARCHIVE_SEPARATOR, member)
+
+
+def _tar_members(archive: str, stat: os.stat_result = None) -> Dict[str, tarfile.TarInfo]:
+    """
+    Returns the members of the tar archive. Unlike zip archives, tar archives have no central
+    directory, i.e., locating a member requires reading all the headers (decompressing the
+    whole archive if compressed). The members therefore get cached per archive until it changes.
+
+    :param archive: the tar archive
+    :type archive: str
+    :param stat: the stat result of the archive, None to determine
+    :type stat: os.stat_result
+    :return: the members, keyed by name
+    :rtype: dict
+    """
+    if stat is None:
+        stat = os.stat(archive)
+    key = os.path.abspath(archive)
+    version = (stat.st_size, stat.st_mtime_ns)
+    with _TAR_INDEX_LOCK:
+        if (key in _TAR_INDEX) and (_TAR_INDEX[key][0] == version):
+            return _TAR_INDEX[key][1]
+    with tarfile.open(archive) as tf:
+        # later members take precedence, like tarfile.getmember
+        members = {x.name: x for x in tf.getmembers()}
+    with _TAR_INDEX_LOCK:
+        _TAR_INDEX[key] = (version, members)
+    return members
+
+
+def _tar_member(archive: str, member: str, stat: os.stat_result = None) -> tarfile.TarInfo:
+    """
+    Returns the member of the tar archive.
+
+    :param archive: the tar archive
+    :type archive: str
+    :param member: the name of the member
+    :type member: str
+    :param stat: the stat result of the archive, None to determine
+    :type stat: os.stat_result
+    :return: the member
+    :rtype: tarfile.TarInfo
+    """
+    members = _tar_members(archive, stat=stat)
+    if member not in members:
+        raise KeyError("filename %r not found" % member)
+    return members[member]
+
+
+def list_members(archive: str) -> List[str]:
+    """
+    Lists the names of the regular files in the archive.
+
+    :param archive: the archive to list
+    :type archive: str
+    :return: the names of the members
+    :rtype: list
+    """
+    fmt = archive_format(archive)
+    if fmt == ARCHIVE_FORMAT_ZIP:
+        with zipfile.ZipFile(archive) as zf:
+            return [x.filename for x in zf.infolist() if not x.is_dir()]
+    elif fmt == ARCHIVE_FORMAT_TAR:
+        return [x.name for x in _tar_members(archive).values() if x.isfile()]
+    else:
+        raise Exception("Unsupported archive: %s" % archive)
+
+
+def locate_members(pattern: str) -> List[str]:
+    """
+    Locates the archive members matching the pattern. Both the archive and the member can
+    contain globs, e.g., "/data/*.tar!/cam1/*.mp4" (a member '*' also matches '/').
+
+    :param pattern: the pattern to use
+    :type pattern: str
+    :return: the sorted paths of the archive members
+    :rtype: list
+    """
+    parts = split_archive_path(pattern)
+    if parts is None:
+        raise Exception("Not an archive member path: %s" % pattern)
+    archives, member = parts
+    result = []
+    for archive in sorted(glob.glob(archives)):
+        if os.path.isdir(archive):
+            continue
+        for name in sorted(list_members(archive)):
+            if fnmatch.fnmatchcase(name, member):
+                result.append(archive_path(archive, name))
+    return result
+
+
+class _MemberIO(io.RawIOBase):
+    """
+    Raw stream over an archive member, closing the archive when closed.
+    """
+
+    def __init__(self, archive, fp):
+        """
+        Initializes the stream.
+
+        :param archive: the opened zip/tar archive
+        :param fp: the file-like object of the member
+        """
+        super().__init__()
+        self._archive = archive
+        self._fp = fp
+
+    def readable(self) -> bool:
+        """
+        Returns whether the stream can be read from.
+
+        :return: always True
+        :rtype: bool
+        """
+        return True
+
+    def seekable(self) -> bool:
+        """
+        Returns whether the stream supports seeking.
+
+        :return: True if seekable
+        :rtype: bool
+        """
+        return self._fp.seekable()
+
+    def readinto(self, b) -> int:
+        """
+        Reads bytes into the buffer.
+
+        :param b: the buffer to fill
+        :return: the number of bytes read, 0 at the end of the member
+        :rtype: int
+        """
+        data = self._fp.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        """
+        Changes the position in the member.
+
+        :param offset: the offset
+        :type offset: int
+        :param whence: what the offset is relative to (SEEK_SET/SEEK_CUR/SEEK_END)
+        :type whence: int
+        :return: the new position
+        :rtype: int
+        """
+        return self._fp.seek(offset, whence)
+
+    def tell(self) -> int:
+        """
+        Returns the position in the member.
+
+        :return: the position
+        :rtype: int
+        """
+        return self._fp.tell()
+
+    def close(self):
+        """
+        Closes the member and the archive.
+        """
+        if not self.closed:
+            self._fp.close()
+            self._archive.close()
+        super().close()
+
+
+def open_member(path: str) -> io.BufferedReader:
+    """
+    Opens the archive member for reading, without extracting it. Members of uncompressed tar
+    and zip archives support efficient seeking, seeking backwards in compressed members
+    requires decompressing them again from the start.
+
+    :param path: the path of the archive member
+    :type path: str
+    :return: the stream, closing it closes the archive as well
+    :rtype: io.BufferedReader
+    """
+    parts = split_archive_path(path)
+    if parts is None:
+        raise Exception("Not an archive member path: %s" % path)
+    archive, member = parts
+    if archive_format(archive) == ARCHIVE_FORMAT_ZIP:
+        af = zipfile.ZipFile(archive)
+        try:
+            fp = af.open(member)
+        except Exception:
+            af.close()
+            raise
+    else:
+        info = _tar_member(archive, member)
+        af = tarfile.open(archive)
+        try:
+            fp = af.extractfile(info)
+            if fp is None:
+                raise Exception("Not a regular file: %s" % path)
+        except Exception:
+            af.close()
+            raise
+    return io.BufferedReader(_MemberIO(af, fp), buffer_size=BUFFER_SIZE)
+
+
+def open_file(path: str):
+    """
+    Opens the file or archive member for reading in binary mode.
+
+    :param path: the file or path of the archive member
+    :type path: str
+    :return: the file-like object
+    """
+    if is_archive_path(path):
+        return open_member(path)
+    return open(path, "rb")
+
+
+def file_stat(path: str) -> Tuple[int, int]:
+    """
+    Returns size and modification time of the file or archive member. For archive members,
+    the modification time of the archive is used.
+
+    :param path: the file or path of the archive member
+    :type path: str
+    :return: the tuple of size in bytes and modification time in nanoseconds
+    :rtype: tuple
+    """
+    parts = split_archive_path(path)
+    if parts is None:
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+    archive, member = parts
+    stat = os.stat(archive)
+    if archive_format(archive) == ARCHIVE_FORMAT_ZIP:
+        with zipfile.ZipFile(archive) as zf:
+            size = zf.getinfo(member).file_size
+    else:
+        size = _tar_member(archive, member, stat=stat).size
+    return size, stat.st_mtime_ns
+
+
+def path_exists(path: str) -> bool:
+    """
+    Checks whether the file or archive member exists.
+
+    :param path: the file or path of the archive member
+    :type path: str
+    :return: True if it exists
+    :rtype: bool
+    """
+    if not is_archive_path(path):
+        return os.path.exists(path)
+    try:
+        file_stat(path)
+        return True
+    except (OSError, KeyError, zipfile.BadZipFile, tarfile.TarError):
+        return False
@@ -0,0 +1,65 @@
+from typing import Iterable, Iterator
+
+
+def batch_items(items: Iterable, batch_size: int, session) -> Iterator:
+    """
+    Groups the items into lists of up to batch_size items. A batch never spans multiple inputs:
+    when the session's current input changes, the pending batch gets emitted first (with the
+    current input restored to the one the batch belongs to).
+
+    :param items: the items to group
+    :type items: Iterable
+    :param batch_size: the maximum number of items per batch
+    :type batch_size: int
+    :param session: the session that keeps track of the current input
+    :return: the batches
+    """
+    batch = []
+    batch_input = None
+    for item in items:
+        if (len(batch) > 0) and (session.current_input != batch_input):
+            next_input = session.current_input
+            session.current_input = batch_input
+            yield batch
+            session.current_input = next_input
+            batch = []
+        batch_input = session.current_input
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if len(batch) > 0:
+        session.current_input = batch_input
+        yield batch
+
+
+def batch_items_per_input(items: Iterable, batch_size: int, session) -> Iterator:
+    """
+    Groups the items into lists of up to batch_size items, keeping a separate batch per input,
+    for streams that interleave the items of several inputs. A batch gets emitted once it is full
+    (with the current input set to the one the batch belongs to), the incomplete batches get
+    emitted at the end, in the order their inputs appeared.
+
+    :param items: the items to group
+    :type items: Iterable
+    :param batch_size: the maximum number of items per batch
+    :type batch_size: int
+    :param session: the session that keeps track of the current input
+    :return: the batches
+    """
+    batches = dict()
+    for item in items:
+        current_input = session.current_input
+        if current_input not in batches:
+            batches[current_input] = []
+        batch = batches[current_input]
+        batch.append(item)
+        if len(batch) >= batch_size:
+            batches[current_input] = []
+            yield batch
+            # restore, in case it got changed downstream
+            session.current_input = current_input
+    for current_input, batch in batches.items():
+        if len(batch) > 0:
+            session.current_input = current_input
+            yield batch
@@ -0,0 +1,281 @@
+import cv2
+import math
+import os
+import shutil
+import tempfile
+
+from typing import List, Optional
+
+from idc.video.util.archive import is_archive_path, open_member, split_archive_path
+
+BACKEND_ANY = "any"
+BACKEND_FFMPEG = "ffmpeg"
+BACKEND_GSTREAMER = "gstreamer"
+BACKEND_V4L2 = "v4l2"
+BACKENDS = {
+    BACKEND_ANY: cv2.CAP_ANY,
+    BACKEND_FFMPEG: cv2.CAP_FFMPEG,
+    BACKEND_GSTREAMER: cv2.CAP_GSTREAMER,
+    BACKEND_V4L2: cv2.CAP_V4L2,
+}
+
+THREADS_DEFAULT = 0
+""" lets the backend determine the number of decoder threads. """
+
+THREADS_AUTO = -1
+""" determines the number of decoder threads from the available CPU cores. """
+
+
+def frame_position(cap) -> int:
+    """
+    Returns the 0-based index of the frame that the next read/grab will return.
+
+    :param cap: the video capture to query
+    :type cap: cv2.VideoCapture
+    :return: the index, -1 if not available
+    :rtype: int
+    """
+    try:
+        pos = cap.get(cv2.CAP_PROP_POS_FRAMES)
+    except:
+        return -1
+    if pos is None:
+        return -1
+    return int(round(pos))
+
+
+def seek_frame(cap, frame_index: int, fps: float = None) -> bool:
+    """
+    Positions the capture so that the next read/grab returns the frame with the specified 0-based index.
+    Jumps to the frame (or the keyframe preceding it) via CAP_PROP_POS_FRAMES, using CAP_PROP_POS_MSEC
+    if that fails, then decodes forward to the exact frame and confirms the landing position.
+    If False is returned, the position of the capture is undefined and the capture needs to be reopened.
+
+    :param cap: the video capture to position
+    :type cap: cv2.VideoCapture
+    :param frame_index: the 0-based index of the frame to position the capture at
+    :type frame_index: int
+    :param fps: the frames-per-second of the video, required for the CAP_PROP_POS_MSEC fallback
+    :type fps: float
+    :return: whether the capture was successfully positioned
+    :rtype: bool
+    """
+    if frame_index <= 0:
+        return frame_position(cap) == 0
+
+    # jump
+    landed = -1
+    if cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index):
+        landed = frame_position(cap)
+    if (landed < 0) and (fps is not None) and (fps > 0):
+        if cap.set(cv2.CAP_PROP_POS_MSEC, frame_index * 1000.0 / fps):
+            landed = frame_position(cap)
+    if (landed < 0) or (landed > frame_index):
+        return False
+
+    # decode forward
+    while landed < frame_index:
+        if not cap.grab():
+            return False
+        landed += 1
+
+    return frame_position(cap) == frame_index
+
+
+def _cgroup_cpu_limit() -> Optional[float]:
+    """
+    Returns the CPU limit imposed by the cgroup (v2 or v1) of the process.
+
+    :return: the number of CPUs, None if not limited or not available
+    :rtype: float
+    """
+    # cgroup v2
+    try:
+        with open("/sys/fs/cgroup/cpu.max", "r") as fp:
+            quota, period = fp.read().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except Exception:
+        pass
+    # cgroup v1
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "r") as fp:
+            quota = int(fp.read().strip())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us", "r") as fp:
+            period = int(fp.read().strip())
+        if (quota > 0) and (period > 0):
+            return quota / period
+    except Exception:
+        pass
+    return None
+
+
+def available_cpus() -> int:
+    """
+    Returns the number of CPU cores available to the process, taking the CPU affinity
+    and any cgroup CPU limit (e.g., from containers) into account.
+
+    :return: the number of cores
+    :rtype: int
+    """
+    if hasattr(os, "sched_getaffinity"):
+        result = len(os.sched_getaffinity(0))
+    else:
+        result = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit()
+    if limit is not None:
+        result = min(result, max(1, math.ceil(limit)))
+    return max(1, result)
+
+
+def auto_threads(num_decoders: int = 1) -> int:
+    """
+    Determines the number of decoder threads per decoder, sharing the available CPU cores
+    between the decoders that run concurrently.
+
+    :param num_decoders: the number of decoders (e.g., worker processes) that run concurrently
+    :type num_decoders: int
+    :return: the number of threads
+    :rtype: int
+    """
+    return max(1, available_cpus() // max(1, num_decoders))
+
+
+def parse_capture_params(params: Optional[List[str]]) -> List[int]:
+    """
+    Parses the capture parameters in the format NAME=VALUE, with NAME being the name of a
+    CAP_PROP_* constant (the prefix can be omitted), e.g., HW_ACCELERATION=1.
+
+    :param params: the parameters to parse, can be None
+    :type params: list
+    :return: the flat list of property/value pairs for opening a cv2.VideoCapture
+    :rtype: list
+    """
+    result = []
+    if params is None:
+        return result
+    for param in params:
+        if "=" not in param:
+            raise Exception("Capture parameter must be in the format NAME=VALUE, provided: %s" % param)
+        name, value = [x.strip() for x in param.split("=", 1)]
+        name = name.upper()
+        if not name.startswith("CAP_PROP_"):
+            name = "CAP_PROP_" + name
+        if not hasattr(cv2, name):
+            raise Exception("Unknown capture property: %s" % name)
+        try:
+            result.extend([getattr(cv2, name), int(value)])
+        except ValueError:
+            raise Exception("Capture parameter value must be an integer, provided: %s" % param)
+    return result
+
+
+def open_capture(source, backend: str = BACKEND_ANY, threads: int = THREADS_DEFAULT,
+                 params: Optional[List[int]] = None) -> cv2.VideoCapture:
+    """
+    Opens the video capture using the specified backend and open parameters.
+
+    :param source: the file, archive member (archive!/member), URL or device ID to open
+    :param backend: the capture backend to use (any/ffmpeg/gstreamer/v4l2)
+    :type backend: str
+    :param threads: the number of decoder threads, 0 to let the backend decide
+    :type threads: int
+    :param params: additional property/value pairs for opening the capture, see parse_capture_params
+    :type params: list
+    :return: the capture
+    :rtype: cv2.VideoCapture
+    """
+    if backend not in BACKENDS:
+        raise Exception("Unknown capture backend: %s" % backend)
+    open_params = []
+    if threads > 0:
+        open_params.extend([cv2.CAP_PROP_N_THREADS, threads])
+    if params is not None:
+        open_params.extend(params)
+    if is_archive_path(source):
+        return ArchiveCapture(source, backend, open_params)
+    if len(open_params) == 0:
+        return cv2.VideoCapture(source, BACKENDS[backend])
+    return cv2.VideoCapture(source, BACKENDS[backend], open_params)
+
+
+class ArchiveCapture:
+    """
+    Video capture for a member of a zip/tar archive, streaming the member into the decoder.
+    Falls back to extracting the member to a temporary file if the backend does not support
+    reading from streams. Behaves like cv2.VideoCapture, releasing it closes the archive and
+    removes any temporary file.
+    """
+
+    def __init__(self, path: str, backend: str, open_params: List[int]):
+        """
+        Opens the archive member.
+
+        :param path: the path of the archive member (archive!/member)
+        :type path: str
+        :param backend: the capture backend to use (any/ffmpeg/gstreamer/v4l2)
+        :type backend: str
+        :param open_params: the property/value pairs for opening the capture
+        :type open_params: list
+        """
+        self._cap = None
+        self._fp = None
+        self._tmp = None
+        # reading from streams requires an explicit backend
+        api = cv2.CAP_FFMPEG if (backend == BACKEND_ANY) else BACKENDS[backend]
+        self._fp = open_member(path)
+        try:
+            self._cap = cv2.VideoCapture(self._fp, api, open_params)
+        except Exception:
+            self._cap = None
+        if (self._cap is None) or not self._cap.isOpened():
+            self._fp.close()
+            self._fp = None
+            self._cap = self._extract(path, backend, open_params)
+
+    def _extract(self, path: str, backend: str, open_params: List[int]) -> cv2.VideoCapture:
+        """
+        Extracts the member to a temporary file and opens that.
+
+        :param path: the path of the archive member
+        :type path: str
+        :param backend: the capture backend to use
+        :type backend: str
+        :param open_params: the property/value pairs for opening the capture
+        :type open_params: list
+        :return: the capture
+        :rtype: cv2.VideoCapture
+        """
+        member = split_archive_path(path)[1]
+        fd, self._tmp = tempfile.mkstemp(suffix=os.path.splitext(member)[1])
+        with os.fdopen(fd, "wb") as fp_out:
+            with open_member(path) as fp_in:
+                shutil.copyfileobj(fp_in, fp_out)
+        return cv2.VideoCapture(self._tmp, BACKENDS[backend], open_params)
+
+    def __getattr__(self, name: str):
+        """
+        Forwards everything else to the capture.
+
+        :param name: the name of the attribute
+        :type name: str
+        :return: the attribute of the capture
+        """
+        return getattr(self._cap, name)
+
+    def release(self):
+        """
+        Releases the capture, closes the archive and removes the temporary file.
+        """
+        if self._cap is not None:
+            self._cap.release()
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+        if self._tmp is not None:
+            try:
+                os.remove(self._tmp)
+            except FileNotFoundError:
+                pass
+            self._tmp = None
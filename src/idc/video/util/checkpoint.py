@@ -0,0 +1,106 @@
+import json
+import os
+
+from typing import Dict, Tuple
+
+KEY_FRAME_NO = "frame_no"
+KEY_FRAME_COUNT = "frame_count"
+KEY_FINISHED = "finished"
+
+
+class Checkpoint:
+    """
+    Keeps track of the last processed frame per input in a JSON state file, allowing reading
+    to resume mid-video. The state gets saved atomically every n updates.
+    """
+
+    def __init__(self, path: str, interval: int = 100):
+        """
+        Initializes the checkpoint.
+
+        :param path: the state file to use
+        :type path: str
+        :param interval: the number of updates after which to save the state, <=0 to only save explicitly
+        :type interval: int
+        """
+        self.path = path
+        self.interval = interval
+        self._state = None
+        self._updates = 0
+
+    def load(self):
+        """
+        Loads the state file, if it exists.
+        """
+        self._state = dict()
+        self._updates = 0
+        if os.path.exists(self.path):
+            with open(self.path, "r") as fp:
+                self._state = json.load(fp)
+
+    def _key(self, source: str) -> str:
+        """
+        Returns the key to use for the input.
+
+        :param source: the input
+        :type source: str
+        :return: the key
+        :rtype: str
+        """
+        return os.path.abspath(source)
+
+    def get(self, source: str) -> Tuple[int, int, bool]:
+        """
+        Returns the state of the input.
+
+        :param source: the input to get the state for
+        :type source: str
+        :return: the tuple of last processed frame (1-based, 0 if none), number of processed frames and whether finished
+        :rtype: tuple
+        """
+        state: Dict = self._state.get(self._key(source), dict())
+        return state.get(KEY_FRAME_NO, 0), state.get(KEY_FRAME_COUNT, 0), state.get(KEY_FINISHED, False)
+
+    def update(self, source: str, frame_no: int, frame_count: int):
+        """
+        Records the last processed frame, saves the state if the interval has been reached.
+
+        :param source: the input the frame belongs to
+        :type source: str
+        :param frame_no: the frame number (1-based)
+        :type frame_no: int
+        :param frame_count: the number of frames processed from this input so far
+        :type frame_count: int
+        """
+        self._state[self._key(source)] = {
+            KEY_FRAME_NO: frame_no,
+            KEY_FRAME_COUNT: frame_count,
+            KEY_FINISHED: False,
+        }
+        self._updates += 1
+        if (self.interval > 0) and (self._updates >= self.interval):
+            self.save()
+
+    def finish(self, source: str):
+        """
+        Marks the input as finished and saves the state.
+
+        :param source: the input that was finished
+        :type source: str
+        """
+        state = self._state.get(self._key(source), dict())
+        state[KEY_FINISHED] = True
+        self._state[self._key(source)] = state
+        self.save()
+
+    def save(self):
+        """
+        Saves the state.
+        """
+        if self._state is None:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as fp:
+            json.dump(self._state, fp, indent=2)
+        os.replace(tmp, self.path)
+        self._updates = 0
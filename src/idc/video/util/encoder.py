@@ -0,0 +1,36 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
+
+from idc.video.util.frames import RawFrameSupporter
+
+
+def encode_frames(items: Iterable, num_threads: int) -> Iterator:
+    """
+    Encodes the frames of the raw frame containers using a pool of threads (OpenCV releases the GIL
+    while encoding), returning the containers in their original order. Other items are passed through.
+
+    :param items: the containers to encode
+    :type items: Iterable
+    :param num_threads: the number of threads to use
+    :type num_threads: int
+    :return: the encoded containers
+    """
+    max_pending = 2 * num_threads
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        for item in items:
+            if isinstance(item, RawFrameSupporter) and (item.frame is not None):
+                pending.append((item, executor.submit(item.encode)))
+            else:
+                pending.append((item, None))
+            while len(pending) >= max_pending:
+                item, future = pending.popleft()
+                if future is not None:
+                    future.result()
+                yield item
+        while len(pending) > 0:
+            item, future = pending.popleft()
+            if future is not None:
+                future.result()
+            yield item
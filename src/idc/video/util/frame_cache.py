@@ -0,0 +1,394 @@
+import cv2
+import hashlib
+import json
+import os
+import numpy as np
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+from idc.video.util.archive import file_stat
+
+CACHE_VERSION = 1
+""" the version of the cache layout, part of the key. """
+
+CACHE_DATA_EXT = ".frames"
+""" the extension for the raw frame data of a cache entry. """
+
+CACHE_META_EXT = ".json"
+""" the extension for the meta-data of a cache entry, its presence marks the entry as complete. """
+
+KEY_PATH = "path"
+KEY_NUM_FRAMES = "num_frames"
+KEY_HEIGHT = "height"
+KEY_WIDTH = "width"
+KEY_CHANNELS = "channels"
+KEY_FPS = "fps"
+KEY_MSEC = "msec"
+
+
+class CachedCapture:
+    """
+    Mimics cv2.VideoCapture for the properties and methods used by the readers, serving the
+    frames from a memory-mapped cache entry. The frames are read-only views into the mapping.
+    """
+
+    def __init__(self, frames: np.ndarray, msec: np.ndarray, fps: float):
+        """
+        Initializes the capture.
+
+        :param frames: the frames (num_frames x height x width x channels)
+        :type frames: np.ndarray
+        :param msec: the timestamps of the frames in milliseconds
+        :type msec: np.ndarray
+        :param fps: the frames-per-second
+        :type fps: float
+        """
+        self._frames = frames
+        self._msec = msec
+        self._fps = fps
+        self._pos = 0
+
+    def isOpened(self) -> bool:
+        """
+        Returns whether the capture is open.
+
+        :return: True if open
+        :rtype: bool
+        """
+        return self._frames is not None
+
+    def grab(self) -> bool:
+        """
+        Advances to the next frame.
+
+        :return: True if successful
+        :rtype: bool
+        """
+        if (self._frames is None) or (self._pos >= len(self._frames)):
+            return False
+        self._pos += 1
+        return True
+
+    def retrieve(self) -> Tuple[bool, Optional[np.ndarray]]:
+        """
+        Returns the frame that was grabbed last.
+
+        :return: the tuple of success flag and frame
+        :rtype: tuple
+        """
+        if (self._frames is None) or (self._pos == 0):
+            return False, None
+        return True, self._frames[self._pos - 1]
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        """
+        Advances to the next frame and returns it.
+
+        :return: the tuple of success flag and frame
+        :rtype: tuple
+        """
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def get(self, prop: int) -> float:
+        """
+        Returns the value of the property.
+
+        :param prop: the CAP_PROP_* property to get
+        :type prop: int
+        :return: the value, 0 if not supported
+        :rtype: float
+        """
+        if self._frames is None:
+            return 0.0
+        if prop == cv2.CAP_PROP_FPS:
+            return self._fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self._frames))
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self._pos)
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return float(self._msec[self._pos - 1]) if (self._pos > 0) else 0.0
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self._frames.shape[1])
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self._frames.shape[2])
+        return 0.0
+
+    def set(self, prop: int, value: float) -> bool:
+        """
+        Sets the position of the capture.
+
+        :param prop: the CAP_PROP_POS_FRAMES or CAP_PROP_POS_MSEC property
+        :type prop: int
+        :param value: the value to set
+        :type value: float
+        :return: True if successful
+        :rtype: bool
+        """
+        if self._frames is None:
+            return False
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self._pos = min(max(0, int(value)), len(self._frames))
+            return True
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            self._pos = int(np.searchsorted(self._msec, value - 1e-3, side="left"))
+            return True
+        return False
+
+    def release(self):
+        """
+        Releases the memory mapping.
+        """
+        self._frames = None
+        self._msec = None
+
+
+class FrameCache:
+    """
+    Cache for decoded frames, storing the (optionally downscaled) frames of each video in a raw
+    file that gets memory-mapped. Entries are keyed by the video's absolute path, modification time,
+    size and the decode parameters. The total size is capped, evicting the least recently used entries.
+    """
+
+    def __init__(self, cache_dir: str, max_size: int, scale: float = 1.0, logger=None):
+        """
+        Initializes the cache.
+
+        :param cache_dir: the directory to store the cache entries in
+        :type cache_dir: str
+        :param max_size: the maximum size of the cache in bytes
+        :type max_size: int
+        :param scale: the factor to scale the frames with before caching them (0-1]
+        :type scale: float
+        :param logger: the optional logger to use
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.scale = scale
+        self.logger = logger
+
+    def _log(self, msg: str, warning: bool = False):
+        """
+        Logs the message, if a logger is available.
+
+        :param msg: the message to log
+        :type msg: str
+        :param warning: whether to log a warning rather than info
+        :type warning: bool
+        """
+        if self.logger is None:
+            return
+        if warning:
+            self.logger.warning(msg)
+        else:
+            self.logger.info(msg)
+
+    def key(self, path: str, params: Optional[Dict] = None) -> str:
+        """
+        Generates the key for the video.
+
+        :param path: the video file
+        :type path: str
+        :param params: additional decode parameters that influence the frames
+        :type params: dict
+        :return: the key
+        :rtype: str
+        """
+        size, mtime = file_stat(path)
+        key = {
+            "version": CACHE_VERSION,
+            "path": os.path.abspath(path),
+            "mtime": mtime,
+            "size": size,
+            "scale": self.scale,
+            "params": params,
+        }
+        digest = hashlib.sha1(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        return "%s-%s" % (os.path.basename(path), digest)
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """
+        Returns the complete entries in the cache.
+
+        :return: the list of last access time, size and key tuples, least recently used first
+        :rtype: list
+        """
+        result = []
+        if not os.path.exists(self.cache_dir):
+            return result
+        for f in os.listdir(self.cache_dir):
+            if not f.endswith(CACHE_META_EXT):
+                continue
+            key = f[:-len(CACHE_META_EXT)]
+            try:
+                atime = os.stat(os.path.join(self.cache_dir, f)).st_mtime
+                size = os.stat(os.path.join(self.cache_dir, key + CACHE_DATA_EXT)).st_size
+            except OSError:
+                continue
+            result.append((atime, size, key))
+        result.sort()
+        return result
+
+    def _remove(self, key: str):
+        """
+        Removes the entry from the cache, ignoring entries that have been removed already (e.g., by another process).
+
+        :param key: the key of the entry to remove
+        :type key: str
+        """
+        for ext in [CACHE_META_EXT, CACHE_DATA_EXT]:
+            try:
+                os.remove(os.path.join(self.cache_dir, key + ext))
+            except FileNotFoundError:
+                pass
+
+    def _evict(self, required: int, keep: str = None):
+        """
+        Evicts the least recently used entries until the required number of bytes is available.
+
+        :param required: the number of bytes that need to be available
+        :type required: int
+        :param keep: the key of the entry to keep
+        :type keep: str
+        """
+        entries = self._entries()
+        total = sum(x[1] for x in entries)
+        for _, size, key in entries:
+            if total + required <= self.max_size:
+                break
+            if key == keep:
+                continue
+            self._log("Evicting from frame cache: %s" % key)
+            self._remove(key)
+            total -= size
+
+    def _load(self, key: str) -> Optional[CachedCapture]:
+        """
+        Loads the cache entry and marks it as used.
+
+        :param key: the key of the entry
+        :type key: str
+        :return: the capture, None if not available
+        :rtype: CachedCapture
+        """
+        meta_path = os.path.join(self.cache_dir, key + CACHE_META_EXT)
+        data_path = os.path.join(self.cache_dir, key + CACHE_DATA_EXT)
+        try:
+            with open(meta_path, "r") as fp:
+                meta = json.load(fp)
+            shape = (meta[KEY_NUM_FRAMES], meta[KEY_HEIGHT], meta[KEY_WIDTH], meta[KEY_CHANNELS])
+            if meta[KEY_NUM_FRAMES] == 0:
+                frames = np.zeros(shape, dtype=np.uint8)
+            else:
+                frames = np.memmap(data_path, dtype=np.uint8, mode="r", shape=shape)
+            os.utime(meta_path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self._log("Failed to load frame cache entry %s: %s" % (key, str(e)), warning=True)
+            self._remove(key)
+            return None
+        return CachedCapture(frames, np.asarray(meta[KEY_MSEC], dtype=np.float64), meta[KEY_FPS])
+
+    def _build(self, path: str, key: str, cap) -> bool:
+        """
+        Decodes all the frames of the video and stores them in the cache.
+
+        :param path: the video file
+        :type path: str
+        :param key: the key of the entry
+        :type key: str
+        :param cap: the video capture to decode the frames with
+        :type cap: cv2.VideoCapture
+        :return: whether the entry was stored, fails if the video cannot be read or exceeds the cache size
+        :rtype: bool
+        """
+        if not cap.isOpened():
+            self._log("Failed to open video, not caching: %s" % path, warning=True)
+            return False
+        data_path = os.path.join(self.cache_dir, key + CACHE_DATA_EXT)
+        meta_path = os.path.join(self.cache_dir, key + CACHE_META_EXT)
+        tmp = "%s.%d.tmp" % (data_path, os.getpid())
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        msec = []
+        shape = None
+        size = 0
+        try:
+            with open(tmp, "wb") as fp:
+                while True:
+                    retval, frame = cap.read()
+                    if not retval:
+                        break
+                    msec.append(cap.get(cv2.CAP_PROP_POS_MSEC))
+                    if self.scale < 1.0:
+                        frame = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+                    if frame.ndim == 2:
+                        frame = frame[:, :, np.newaxis]
+                    if shape is None:
+                        shape = frame.shape
+                        estimate = max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT))) * frame.nbytes
+                        if estimate > self.max_size:
+                            self._log("Video exceeds frame cache size, not caching: %s" % path, warning=True)
+                            return False
+                        self._evict(estimate, keep=key)
+                    elif frame.shape != shape:
+                        raise Exception("Frame size changed from %s to %s" % (str(shape), str(frame.shape)))
+                    size += frame.nbytes
+                    if size > self.max_size:
+                        self._log("Video exceeds frame cache size, not caching: %s" % path, warning=True)
+                        return False
+                    fp.write(np.ascontiguousarray(frame, dtype=np.uint8).data)
+            if shape is None:
+                self._log("No frames decoded, not caching: %s" % path, warning=True)
+                return False
+            os.replace(tmp, data_path)
+            meta = {
+                KEY_PATH: os.path.abspath(path),
+                KEY_NUM_FRAMES: len(msec),
+                KEY_HEIGHT: shape[0],
+                KEY_WIDTH: shape[1],
+                KEY_CHANNELS: shape[2],
+                KEY_FPS: fps,
+                KEY_MSEC: msec,
+            }
+            with open(meta_path + ".tmp", "w") as fp:
+                json.dump(meta, fp)
+            os.replace(meta_path + ".tmp", meta_path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self._evict(0, keep=key)
+        return True
+
+    def open(self, path: str, open_func: Callable, params: Optional[Dict] = None) -> Optional[CachedCapture]:
+        """
+        Returns the capture serving the frames of the video from the cache, decoding the video
+        and storing its frames first if not yet cached.
+
+        :param path: the video file
+        :type path: str
+        :param open_func: the function for opening a cv2.VideoCapture for the video, takes no arguments
+        :type open_func: Callable
+        :param params: additional decode parameters that influence the frames
+        :type params: dict
+        :return: the capture, None if the video cannot be cached
+        :rtype: CachedCapture
+        """
+        key = self.key(path, params=params)
+        result = self._load(key)
+        if result is not None:
+            self._log("Serving frames from cache: %s" % key)
+            # the size cap might have been lowered
+            self._evict(0, keep=key)
+            return result
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._log("Caching frames: %s" % path)
+        cap = open_func()
+        try:
+            if not self._build(path, key, cap):
+                return None
+        finally:
+            cap.release()
+        return self._load(key)
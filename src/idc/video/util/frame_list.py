@@ -0,0 +1,83 @@
+import csv
+import os
+
+from typing import Dict, List, Optional, Union
+
+from idc.video.util.timestamps import parse_time
+
+UNIT_FRAME = "frame"
+UNIT_TIME = "time"
+UNITS = [
+    UNIT_FRAME,
+    UNIT_TIME,
+]
+
+
+def load_frame_list(path: str, unit: str = UNIT_FRAME) -> Dict[str, List[Union[int, float]]]:
+    """
+    Loads the CSV file with the frames to extract. The first column contains the video (path or file name),
+    the second one the frame number (1-based) or the timestamp (seconds or [[HH:]MM:]SS[.fff]).
+    Additional columns are ignored, as is a header row.
+
+    :param path: the CSV file to load
+    :type path: str
+    :param unit: the unit of the second column (frame/time)
+    :type unit: str
+    :return: the frame numbers or timestamps (in seconds) per video, sorted and without duplicates
+    :rtype: dict
+    """
+    if unit not in UNITS:
+        raise Exception("Unknown unit: %s" % unit)
+    result = dict()
+    with open(path, "r", newline="") as fp:
+        for i, row in enumerate(csv.reader(fp)):
+            if (len(row) == 0) or ((len(row) == 1) and (len(row[0].strip()) == 0)):
+                continue
+            if len(row) < 2:
+                raise Exception("Expected at least two columns in row #%d of frame list: %s" % (i + 1, path))
+            value = None
+            try:
+                if unit == UNIT_FRAME:
+                    value = int(row[1].strip())
+                else:
+                    value = parse_time(row[1])
+            except Exception:
+                pass
+            if value is None:
+                # header?
+                if i == 0:
+                    continue
+                raise Exception("Invalid %s in row #%d of frame list: %s" % (unit, i + 1, path))
+            if (unit == UNIT_FRAME) and (value < 1):
+                raise Exception("Frame numbers are 1-based, found %d in row #%d of frame list: %s" % (value, i + 1, path))
+            video = row[0].strip()
+            if video not in result:
+                result[video] = set()
+            result[video].add(value)
+    return {k: sorted(v) for k, v in result.items()}
+
+
+def lookup_frame_list(frame_lists: Dict[str, List], path: str) -> Optional[List]:
+    """
+    Returns the frames for the video, matching the video against the exact path, the absolute path
+    and the file name. The frames of all matching entries get combined, in case the video is listed
+    using different notations.
+
+    :param frame_lists: the frame lists, see load_frame_list
+    :type frame_lists: dict
+    :param path: the video to look up
+    :type path: str
+    :return: the frame numbers or timestamps (sorted, without duplicates), None if the video is not listed
+    :rtype: list
+    """
+    abspath = os.path.abspath(path)
+    basename = os.path.basename(path)
+    result = None
+    for key in frame_lists:
+        if (key == path) or (key == basename) or (os.path.abspath(key) == abspath):
+            if result is None:
+                result = set()
+            result.update(frame_lists[key])
+    if result is None:
+        return None
+    return sorted(result)
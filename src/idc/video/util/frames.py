@@ -0,0 +1,327 @@
+import cv2
+import numpy as np
+
+from typing import Dict, List, Tuple
+from PIL import Image
+
+from kasperl.api import safe_deepcopy
+from idc.api import ImageData, DepthData, ImageClassificationData, ImageSegmentationData, ObjectDetectionData
+from idc.api import FORMATS, FORMAT_JPEG, FORMAT_PNG, FORMAT_EXTENSIONS
+
+FORMAT_WEBP = "WEBP"
+FRAME_FORMATS = FORMATS + [FORMAT_WEBP]
+FRAME_FORMAT_EXTENSIONS = dict(FORMAT_EXTENSIONS)
+FRAME_FORMAT_EXTENSIONS[FORMAT_WEBP] = ".webp"
+
+CHANNEL_ORDER_BGR = "BGR"
+CHANNEL_ORDER_RGB = "RGB"
+CHANNEL_ORDERS = [
+    CHANNEL_ORDER_BGR,
+    CHANNEL_ORDER_RGB,
+]
+
+
+def convert_channel_order(frame: np.ndarray, channel_order: str, target_order: str) -> np.ndarray:
+    """
+    Converts the frame into the target channel order.
+
+    :param frame: the frame to convert
+    :type frame: np.ndarray
+    :param channel_order: the channel order of the frame (BGR/RGB)
+    :type channel_order: str
+    :param target_order: the channel order to convert to (BGR/RGB)
+    :type target_order: str
+    :return: the frame, the same array if no conversion was necessary
+    :rtype: np.ndarray
+    """
+    if channel_order not in CHANNEL_ORDERS:
+        raise Exception("Unknown channel order: %s" % channel_order)
+    if target_order not in CHANNEL_ORDERS:
+        raise Exception("Unknown channel order: %s" % target_order)
+    if (channel_order == target_order) or (frame.ndim < 3):
+        return frame
+    # BGR <-> RGB are the same operation
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+
+def encode_params(image_format: str, quality: int = -1, png_compression: int = -1) -> List[int]:
+    """
+    Generates the parameters for encoding frames in the specified format.
+
+    :param image_format: the image format to generate the parameters for
+    :type image_format: str
+    :param quality: the quality to use for JPEG and WebP (0-100), uses the encoder's default if <0
+    :type quality: int
+    :param png_compression: the compression level to use for PNG (0-9), uses the encoder's default if <0
+    :type png_compression: int
+    :return: the parameters for cv2.imencode
+    :rtype: list
+    """
+    if image_format not in FRAME_FORMATS:
+        raise Exception("Unsupported image format: %s" % image_format)
+    result = []
+    if (quality is not None) and (quality >= 0):
+        if quality > 100:
+            raise Exception("Quality must be within 0-100, provided: %d" % quality)
+        if image_format == FORMAT_JPEG:
+            result = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        elif image_format == FORMAT_WEBP:
+            result = [cv2.IMWRITE_WEBP_QUALITY, max(1, quality)]
+    if (png_compression is not None) and (png_compression >= 0):
+        if png_compression > 9:
+            raise Exception("PNG compression must be within 0-9, provided: %d" % png_compression)
+        if image_format == FORMAT_PNG:
+            result = [cv2.IMWRITE_PNG_COMPRESSION, png_compression]
+    return result
+
+
+def encode_frame(frame: np.ndarray, image_format: str = FORMAT_JPEG, params: List[int] = None) -> bytes:
+    """
+    Encodes the BGR frame in the specified format.
+
+    :param frame: the BGR frame to encode
+    :type frame: np.ndarray
+    :param image_format: the image format to use
+    :type image_format: str
+    :param params: the parameters for the encoder, see encode_params
+    :type params: list
+    :return: the encoded frame
+    :rtype: bytes
+    """
+    if image_format not in FRAME_FORMAT_EXTENSIONS:
+        raise Exception("Unsupported image format: %s" % image_format)
+    if params is None:
+        params = []
+    retval, buffer = cv2.imencode(FRAME_FORMAT_EXTENSIONS[image_format], frame, params)
+    if not retval:
+        raise Exception("Failed to encode frame as: %s" % image_format)
+    return buffer.tobytes()
+
+
+class RawFrameSupporter:
+    """
+    Mixin for image containers that carry the decoded frame as numpy array and only
+    generate the image bytes or the Pillow image when they are actually required.
+    """
+
+    def __init__(self, *args, frame: np.ndarray = None, channel_order: str = CHANNEL_ORDER_BGR,
+                 encode_params: List[int] = None, **kwargs):
+        """
+        Initializes the container.
+
+        :param frame: the decoded frame
+        :type frame: np.ndarray
+        :param channel_order: the channel order of the frame (BGR/RGB)
+        :type channel_order: str
+        :param encode_params: the parameters for encoding the frame, see encode_params
+        :type encode_params: list
+        """
+        super().__init__(*args, **kwargs)
+        if channel_order not in CHANNEL_ORDERS:
+            raise Exception("Unknown channel order: %s" % channel_order)
+        self._frame = frame
+        """ the decoded frame. """
+        self._channel_order = channel_order
+        """ the channel order of the frame. """
+        self._encode_params = encode_params
+        """ the parameters for encoding the frame. """
+
+    @property
+    def frame(self) -> np.ndarray:
+        """
+        Returns the decoded frame, if still available.
+
+        :return: the frame, None if not available
+        :rtype: np.ndarray
+        """
+        return self._frame
+
+    @property
+    def channel_order(self) -> str:
+        """
+        Returns the channel order of the frame.
+
+        :return: the channel order (BGR/RGB)
+        :rtype: str
+        """
+        return self._channel_order
+
+    def frame_as(self, channel_order: str) -> np.ndarray:
+        """
+        Returns the frame in the specified channel order.
+
+        :param channel_order: the channel order to return the frame in (BGR/RGB)
+        :type channel_order: str
+        :return: the frame, None if not available
+        :rtype: np.ndarray
+        """
+        if self._frame is None:
+            return None
+        return convert_channel_order(self._frame, self._channel_order, channel_order)
+
+    @property
+    def data(self) -> bytes:
+        """
+        Returns the image bytes, encodes the frame (or the image generated from it) if necessary.
+
+        :return: the data
+        """
+        if self._data is None:
+            if self._frame is not None:
+                self._data = encode_frame(self.frame_as(CHANNEL_ORDER_BGR), self._image_format, self._encode_params)
+            elif self._image is not None:
+                image = self._image if (self._image.mode in ["L", "RGB"]) else self._image.convert("RGB")
+                frame = convert_channel_order(np.asarray(image), CHANNEL_ORDER_RGB, CHANNEL_ORDER_BGR)
+                self._data = encode_frame(frame, self._image_format, self._encode_params)
+        return self._data
+
+    @data.setter
+    def data(self, data: bytes):
+        """
+        Uses the provided data, discards the frame.
+
+        :param data: the data to use
+        """
+        ImageData.data.fset(self, data)
+        self._frame = None
+
+    @property
+    def image(self) -> Image.Image:
+        """
+        Returns the image, generates it from the frame if necessary.
+
+        :return: the pillow image data structure, None if not available or failed to load
+        :rtype: Image.Image
+        """
+        if (self._image is None) and (self._data is None) and (self._frame is not None):
+            self._image = Image.fromarray(self.frame_as(CHANNEL_ORDER_RGB))
+        return ImageData.image.fget(self)
+
+    def encode(self):
+        """
+        Encodes the frame and discards it afterwards.
+        """
+        self.data
+        self._frame = None
+
+    def save_image(self, path: str, make_dirs: bool = False) -> bool:
+        """
+        Saves the image under the specified path, encodes the frame if necessary.
+
+        :param path: the path to save the image under
+        :type path: str
+        :param make_dirs: whether to create any missing parent dirs
+        :type make_dirs: bool
+        :return: whether the file was saved
+        :rtype: bool
+        """
+        self.data
+        return super().save_image(path, make_dirs=make_dirs)
+
+    def duplicate(self, source: str = None, force_no_source: bool = None,
+                  name: str = None, data: bytes = None,
+                  image: Image.Image = None, image_format: str = None,
+                  size: Tuple[int, int] = None,
+                  metadata: Dict = None, annotation=None):
+        """
+        Duplicates the container overwriting existing data with any provided data.
+        The frame is carried over unless data or an image is provided.
+
+        :param source: the source to use
+        :type source: str
+        :param force_no_source: if True, then source is set to None
+        :type force_no_source: bool
+        :param name: the name to use
+        :type name: str
+        :param data: the data to use
+        :type data: bytes
+        :param image: the Pillow image to use
+        :type image: Image.Image
+        :param image_format: the image format
+        :type image_format: str
+        :param size: the size tuple
+        :type size: tuple
+        :param metadata: the metadata
+        :type metadata: dict
+        :param annotation: the annotations
+        :return: the duplicated container
+        """
+        result = super().duplicate(source=source, force_no_source=force_no_source, name=name, data=data,
+                                   image=image, image_format=image_format, size=size,
+                                   metadata=metadata, annotation=annotation)
+        if (result._data is None) and (result._image is None):
+            result._frame = safe_deepcopy(self._frame)
+            result._channel_order = self._channel_order
+            result._encode_params = self._encode_params
+        return result
+
+
+class RawFrameDepthData(RawFrameSupporter, DepthData):
+    pass
+
+
+class RawFrameImageClassificationData(RawFrameSupporter, ImageClassificationData):
+    pass
+
+
+class RawFrameImageSegmentationData(RawFrameSupporter, ImageSegmentationData):
+    pass
+
+
+class RawFrameObjectDetectionData(RawFrameSupporter, ObjectDetectionData):
+    pass
+
+
+RAW_FRAME_CLASSES = {
+    DepthData: RawFrameDepthData,
+    ImageClassificationData: RawFrameImageClassificationData,
+    ImageSegmentationData: RawFrameImageSegmentationData,
+    ObjectDetectionData: RawFrameObjectDetectionData,
+}
+
+
+def frame_to_data(cls, frame: np.ndarray, image_name: str, lazy: bool = False,
+                  channel_order: str = CHANNEL_ORDER_BGR, image_format: str = FORMAT_JPEG,
+                  params: List[int] = None):
+    """
+    Turns the decoded frame into a data container of the specified class.
+
+    :param cls: the data container class to use
+    :param frame: the decoded frame
+    :type frame: np.ndarray
+    :param image_name: the name for the image
+    :type image_name: str
+    :param lazy: whether to keep the frame and only encode it when required
+    :type lazy: bool
+    :param channel_order: the channel order of the frame (BGR/RGB)
+    :type channel_order: str
+    :param image_format: the format to encode the frame in
+    :type image_format: str
+    :param params: the parameters for the encoder, see encode_params
+    :type params: list
+    :return: the data container
+    """
+    height, width = frame.shape[:2]
+    if lazy:
+        if cls not in RAW_FRAME_CLASSES:
+            raise Exception("Unsupported class for raw frames: %s" % str(cls))
+        return RAW_FRAME_CLASSES[cls](image_name=image_name, frame=frame, channel_order=channel_order,
+                                      encode_params=params, image_format=image_format, image_size=(width, height))
+    data = encode_frame(convert_channel_order(frame, channel_order, CHANNEL_ORDER_BGR), image_format, params)
+    return cls(image_name=image_name, data=data, image_format=image_format, image_size=(width, height))
+
+
+def data_to_frame(item, channel_order: str = CHANNEL_ORDER_BGR) -> np.ndarray:
+    """
+    Returns the image of the container as numpy array in the specified channel order.
+    Uses the raw frame if available, avoiding decoding the image.
+
+    :param item: the container to get the frame from
+    :param channel_order: the channel order to return the frame in (BGR/RGB)
+    :type channel_order: str
+    :return: the frame
+    :rtype: np.ndarray
+    """
+    if isinstance(item, RawFrameSupporter) and (item.frame is not None):
+        return item.frame_as(channel_order)
+    return convert_channel_order(np.array(item.image), CHANNEL_ORDER_RGB, channel_order)
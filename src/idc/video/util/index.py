@@ -0,0 +1,294 @@
+import av
+import bisect
+import hashlib
+import os
+import struct
+import numpy as np
+
+from fractions import Fraction
+from typing import List, Optional
+
+from idc.video.util.archive import is_archive_path, open_member, split_archive_path, file_stat
+from idc.video.util.keyframes import frame_rate
+
+INDEX_EXT = ".fidx"
+""" the extension for frame index files. """
+
+INDEX_MAGIC = b"IDCFIDX\x00"
+INDEX_VERSION = 1
+
+_HEADER = struct.Struct("<8sIqqqqqqqq")
+""" magic, version, file size, file mtime (ns), time base (num/den), frame rate (num/den), start time, number of frames. """
+
+RECORD_DTYPE = np.dtype([("pts", "<i8"), ("offset", "<i8"), ("keyframe", "u1")])
+""" the record for each frame: presentation timestamp, byte offset of the packet (-1 if unknown), keyframe flag. """
+
+
+class FrameIndex:
+    """
+    The frame index of a video file: presentation timestamp, byte offset and keyframe flag
+    of each frame in presentation order, obtained by demuxing the video.
+    """
+
+    def __init__(self, records: np.ndarray, time_base: Fraction, rate: Fraction, start_time: int,
+                 file_size: int, file_mtime: int):
+        """
+        Initializes the index.
+
+        :param records: the records of the frames in presentation order, see RECORD_DTYPE
+        :type records: np.ndarray
+        :param time_base: the time base of the timestamps
+        :type time_base: Fraction
+        :param rate: the frame rate of the video
+        :type rate: Fraction
+        :param start_time: the start time of the video stream (in time base units)
+        :type start_time: int
+        :param file_size: the size of the video file
+        :type file_size: int
+        :param file_mtime: the modification time of the video file in nanoseconds
+        :type file_mtime: int
+        """
+        self.records = records
+        self.time_base = time_base
+        self.rate = rate
+        self.start_time = start_time
+        self.file_size = file_size
+        self.file_mtime = file_mtime
+        self._keyframes = None
+        self._timestamps = None
+
+    @property
+    def num_frames(self) -> int:
+        """
+        Returns the number of frames in the video.
+
+        :return: the number of frames
+        :rtype: int
+        """
+        return len(self.records)
+
+    @property
+    def fps(self) -> float:
+        """
+        Returns the frame rate.
+
+        :return: the frames-per-second, None if not available
+        :rtype: float
+        """
+        if not self.rate:
+            return None
+        return float(self.rate)
+
+    def keyframes(self) -> List[int]:
+        """
+        Returns the frame numbers of the keyframes.
+
+        :return: the sorted keyframe numbers (1-based)
+        :rtype: list
+        """
+        if self._keyframes is None:
+            self._keyframes = (np.flatnonzero(self.records["keyframe"]) + 1).tolist()
+        return self._keyframes
+
+    def keyframe_before(self, frame_no: int) -> int:
+        """
+        Returns the keyframe at or preceding the frame.
+
+        :param frame_no: the frame number (1-based)
+        :type frame_no: int
+        :return: the keyframe number (1-based), -1 if there is none
+        :rtype: int
+        """
+        keyframes = self.keyframes()
+        pos = bisect.bisect_right(keyframes, frame_no)
+        if pos == 0:
+            return -1
+        return keyframes[pos - 1]
+
+    def timestamp(self, frame_no: int) -> float:
+        """
+        Returns the timestamp of the frame.
+
+        :param frame_no: the frame number (1-based)
+        :type frame_no: int
+        :return: the timestamp in seconds, relative to the start of the stream
+        :rtype: float
+        """
+        return float((int(self.records["pts"][frame_no - 1]) - self.start_time) * self.time_base)
+
+    def frame_at(self, seconds: float) -> int:
+        """
+        Returns the frame that is displayed at the timestamp.
+
+        :param seconds: the timestamp in seconds, relative to the start of the stream
+        :type seconds: float
+        :return: the frame number (1-based), the first frame if the timestamp precedes it
+        :rtype: int
+        """
+        if self._timestamps is None:
+            self._timestamps = (self.records["pts"] - self.start_time) * float(self.time_base)
+        return max(1, int(np.searchsorted(self._timestamps, seconds + 1e-6, side="right")))
+
+    def offset(self, frame_no: int) -> int:
+        """
+        Returns the byte offset of the packet of the frame.
+
+        :param frame_no: the frame number (1-based)
+        :type frame_no: int
+        :return: the offset, -1 if not known
+        :rtype: int
+        """
+        return int(self.records["offset"][frame_no - 1])
+
+    def matches(self, path: str) -> bool:
+        """
+        Checks whether the index matches the video file, using its size and modification time.
+
+        :param path: the video file to check against
+        :type path: str
+        :return: True if the index is up-to-date
+        :rtype: bool
+        """
+        size, mtime = file_stat(path)
+        return (size == self.file_size) and (mtime == self.file_mtime)
+
+    def save(self, path: str):
+        """
+        Saves the index in binary format.
+
+        :param path: the file to save the index to
+        :type path: str
+        """
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as fp:
+            fp.write(_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, self.file_size, self.file_mtime,
+                                  self.time_base.numerator, self.time_base.denominator,
+                                  self.rate.numerator, self.rate.denominator,
+                                  self.start_time, self.num_frames))
+            fp.write(self.records.astype(RECORD_DTYPE, copy=False).tobytes())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'FrameIndex':
+        """
+        Loads the index from the binary file.
+
+        :param path: the file to load
+        :type path: str
+        :return: the index
+        :rtype: FrameIndex
+        """
+        with open(path, "rb") as fp:
+            header = fp.read(_HEADER.size)
+            if len(header) != _HEADER.size:
+                raise Exception("Truncated frame index: %s" % path)
+            magic, version, file_size, file_mtime, tb_num, tb_den, rate_num, rate_den, start_time, num_frames = _HEADER.unpack(header)
+            if magic != INDEX_MAGIC:
+                raise Exception("Not a frame index: %s" % path)
+            if version != INDEX_VERSION:
+                raise Exception("Unsupported frame index version %d: %s" % (version, path))
+            records = np.frombuffer(fp.read(num_frames * RECORD_DTYPE.itemsize), dtype=RECORD_DTYPE)
+            if len(records) != num_frames:
+                raise Exception("Truncated frame index: %s" % path)
+        return FrameIndex(records, Fraction(tb_num, tb_den), Fraction(rate_num, rate_den), start_time,
+                          file_size, file_mtime)
+
+
+def build_index(path: str) -> FrameIndex:
+    """
+    Builds the frame index for the video by demuxing it, i.e., without decoding any frames.
+
+    :param path: the video file to index
+    :type path: str
+    :return: the index
+    :rtype: FrameIndex
+    """
+    size, mtime = file_stat(path)
+    container = av.open(open_member(path) if is_archive_path(path) else path)
+    try:
+        stream = container.streams.video[0]
+        if frame_rate(stream) is None:
+            raise Exception("Failed to determine frame rate: %s" % path)
+        rate = stream.average_rate if stream.average_rate else stream.guessed_rate
+        pts = []
+        offsets = []
+        keyframe = []
+        for packet in container.demux(stream):
+            if packet.size == 0:
+                continue
+            ts = packet.pts if (packet.pts is not None) else packet.dts
+            if ts is None:
+                continue
+            pts.append(ts)
+            offsets.append(packet.pos if (packet.pos is not None) else -1)
+            keyframe.append(1 if packet.is_keyframe else 0)
+        records = np.zeros(len(pts), dtype=RECORD_DTYPE)
+        records["pts"] = pts
+        records["offset"] = offsets
+        records["keyframe"] = keyframe
+        # presentation order
+        records = records[np.argsort(records["pts"], kind="stable")]
+        return FrameIndex(records, Fraction(stream.time_base), Fraction(rate),
+                          stream.start_time if (stream.start_time is not None) else 0,
+                          size, mtime)
+    finally:
+        container.close()
+
+
+def index_path(path: str, index_dir: Optional[str] = None) -> str:
+    """
+    Returns the path of the frame index for the video. Without a directory, the index is stored
+    next to the video (or next to the archive for archive members). Otherwise, a hash of the video's
+    absolute path is used to avoid name clashes.
+
+    :param path: the video file to get the index file for
+    :type path: str
+    :param index_dir: the directory to store the index files in, None to store them next to the videos
+    :type index_dir: str
+    :return: the index file
+    :rtype: str
+    """
+    if (index_dir is None) and is_archive_path(path):
+        index_dir = os.path.dirname(split_archive_path(path)[0])
+    if index_dir is None:
+        return path + INDEX_EXT
+    digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(index_dir, "%s-%s%s" % (os.path.basename(path), digest, INDEX_EXT))
+
+
+def get_index(path: str, index_dir: Optional[str] = None, logger=None) -> FrameIndex:
+    """
+    Returns the frame index for the video, loading it from disk if it is up-to-date, otherwise
+    (re-)building and saving it. Failing to save the index is not an error.
+
+    :param path: the video file to get the index for
+    :type path: str
+    :param index_dir: the directory with the index files, None if stored next to the videos
+    :type index_dir: str
+    :param logger: the optional logger to use
+    :return: the index
+    :rtype: FrameIndex
+    """
+    idx_path = index_path(path, index_dir=index_dir)
+    if os.path.exists(idx_path):
+        try:
+            index = FrameIndex.load(idx_path)
+            if index.matches(path):
+                return index
+            if logger is not None:
+                logger.info("Frame index outdated: %s" % idx_path)
+        except Exception as e:
+            if logger is not None:
+                logger.warning("Failed to load frame index %s: %s" % (idx_path, str(e)))
+
+    if logger is not None:
+        logger.info("Building frame index: %s" % path)
+    index = build_index(path)
+    try:
+        if index_dir is not None:
+            os.makedirs(index_dir, exist_ok=True)
+        index.save(idx_path)
+    except Exception as e:
+        if logger is not None:
+            logger.warning("Failed to save frame index %s: %s" % (idx_path, str(e)))
+    return index
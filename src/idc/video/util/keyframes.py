@@ -0,0 +1,194 @@
+import av
+import bisect
+
+from typing import Iterable, Iterator, List, Tuple, Any
+
+from idc.video.util.archive import is_archive_path, open_member
+
+KEYFRAMES_OFF = "off"
+KEYFRAMES_ALL = "all"
+KEYFRAMES_NEAREST = "nearest"
+KEYFRAMES_MODES = [
+    KEYFRAMES_OFF,
+    KEYFRAMES_ALL,
+    KEYFRAMES_NEAREST,
+]
+
+
+def frame_rate(stream) -> float:
+    """
+    Returns the frame rate of the PyAV video stream.
+
+    :param stream: the video stream to get the frame rate for
+    :return: the frame rate, None if not available
+    :rtype: float
+    """
+    rate = stream.average_rate
+    if not rate:
+        rate = stream.guessed_rate
+    if not rate:
+        return None
+    return float(rate)
+
+
+def pts_to_frame_no(pts: int, stream) -> int:
+    """
+    Turns the presentation timestamp into a frame number (1-based), using the frame rate of the stream.
+
+    :param pts: the presentation timestamp to convert
+    :type pts: int
+    :param stream: the PyAV video stream the timestamp belongs to
+    :return: the frame number
+    :rtype: int
+    """
+    start = stream.start_time if (stream.start_time is not None) else 0
+    return int(round(float((pts - start) * stream.time_base) * frame_rate(stream))) + 1
+
+
+def frame_no_to_pts(frame_no: int, stream) -> int:
+    """
+    Turns the frame number (1-based) into a presentation timestamp, using the frame rate of the stream.
+
+    :param frame_no: the frame number to convert
+    :type frame_no: int
+    :param stream: the PyAV video stream to generate the timestamp for
+    :return: the presentation timestamp
+    :rtype: int
+    """
+    start = stream.start_time if (stream.start_time is not None) else 0
+    return start + int((frame_no - 1) / frame_rate(stream) / stream.time_base)
+
+
+def read_keyframes(path: str, from_frame: int = 1, seek: bool = False) -> Iterator[Tuple[int, Any]]:
+    """
+    Decodes only the keyframes of the video, the decoder skips all other packets.
+
+    :param path: the video file to read
+    :type path: str
+    :param from_frame: the first frame to consider (1-based index)
+    :type from_frame: int
+    :param seek: whether to seek to the keyframe preceding the first frame rather than demuxing all packets before it
+    :type seek: bool
+    :return: iterator of frame number (1-based) and BGR frame tuples
+    """
+    container = av.open(open_member(path) if is_archive_path(path) else path)
+    try:
+        stream = container.streams.video[0]
+        stream.codec_context.skip_frame = "NONKEY"
+        if frame_rate(stream) is None:
+            raise Exception("Failed to determine frame rate: %s" % path)
+        if seek and (from_frame > 1):
+            container.seek(frame_no_to_pts(from_frame, stream), stream=stream, backward=True, any_frame=False)
+        for frame in container.decode(stream):
+            if frame.pts is None:
+                continue
+            frame_no = pts_to_frame_no(frame.pts, stream)
+            if frame_no < from_frame:
+                continue
+            yield frame_no, frame.to_ndarray(format="bgr24")
+    finally:
+        container.close()
+
+
+def keyframe_positions(path: str) -> Tuple[List[int], int]:
+    """
+    Determines the frame numbers of the keyframes by only demuxing the video, i.e., without decoding it.
+
+    :param path: the video file to inspect
+    :type path: str
+    :return: the tuple of sorted keyframe numbers (1-based) and the number of frames
+    :rtype: tuple
+    """
+    container = av.open(open_member(path) if is_archive_path(path) else path)
+    try:
+        stream = container.streams.video[0]
+        if frame_rate(stream) is None:
+            raise Exception("Failed to determine frame rate: %s" % path)
+        keyframes = []
+        num_frames = 0
+        for packet in container.demux(stream):
+            if packet.size == 0:
+                continue
+            num_frames += 1
+            if packet.is_keyframe and (packet.pts is not None):
+                keyframes.append(pts_to_frame_no(packet.pts, stream))
+        keyframes.sort()
+        return keyframes, num_frames
+    finally:
+        container.close()
+
+
+def split_segments(first: int, last: int, num_segments: int, keyframes: List[int]) -> List[Tuple[int, int]]:
+    """
+    Splits the range of frames into segments of roughly equal length, with all but the first
+    segment starting at a keyframe. Fewer segments are returned if there are not enough keyframes.
+
+    :param first: the first frame of the range (1-based index)
+    :type first: int
+    :param last: the frame (1-based) that ends the range (exclusive)
+    :type last: int
+    :param num_segments: the number of segments to generate
+    :type num_segments: int
+    :param keyframes: the sorted frame numbers (1-based) of the keyframes
+    :type keyframes: list
+    :return: the list of segments, tuples of first and end (exclusive) frame
+    :rtype: list
+    """
+    if last <= first:
+        return []
+    bounds = [first]
+    for i in range(1, num_segments):
+        target = first + int(round((last - first) * i / num_segments))
+        pos = bisect.bisect_left(keyframes, target)
+        candidates = keyframes[max(0, pos - 1):pos + 1]
+        if len(candidates) == 0:
+            continue
+        nearest = min(candidates, key=lambda k: abs(k - target))
+        if bounds[-1] < nearest < last:
+            bounds.append(nearest)
+    bounds.append(last)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def nearest_keyframes(keyframes: Iterable[Tuple[int, Any]], first: int, step: int,
+                      last: int = -1, num_frames: int = -1) -> Iterator[Tuple[int, Any]]:
+    """
+    Selects the keyframes that are nearest to every step-th frame, starting with the first frame.
+    Each keyframe is returned at most once.
+
+    :param keyframes: the frame number/frame tuples of the keyframes, in order
+    :param first: the first frame to find the nearest keyframe for (1-based index)
+    :type first: int
+    :param step: the increment in frames
+    :type step: int
+    :param last: the frame (1-based) before which to stop, ignored if <=0
+    :type last: int
+    :param num_frames: the total number of frames in the video, ignored if <=0
+    :type num_frames: int
+    :return: iterator of the selected frame number/frame tuples
+    """
+    target = first
+    prev = None
+    last_selected = None
+    for curr in keyframes:
+        while (prev is None) or (target <= curr[0]):
+            if (last > 0) and (target >= last):
+                break
+            if (prev is None) and (target > curr[0]):
+                break
+            if (prev is None) or (curr[0] - target < target - prev[0]):
+                selected = curr
+            else:
+                selected = prev
+            if selected[0] != last_selected:
+                last_selected = selected[0]
+                yield selected
+            target += step
+        if (last > 0) and (target >= last):
+            return
+        prev = curr
+
+    # targets beyond the last keyframe
+    if (prev is not None) and (prev[0] != last_selected):
+        if ((last <= 0) or (target < last)) and ((num_frames <= 0) or (target <= num_frames)):
+            yield prev
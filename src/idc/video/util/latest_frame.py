@@ -0,0 +1,127 @@
+import threading
+import time
+
+from collections import deque
+from typing import Optional, Tuple
+
+import numpy as np
+
+WAIT_TIMEOUT = 0.1
+""" the timeout in seconds when waiting for frames, before checking whether to stop. """
+
+
+class LatestFrameCapture:
+    """
+    Reads the frames of a capture continuously in a background thread and only keeps the most
+    recent one(s), so that a slow consumer always obtains the freshest frame rather than frames
+    that are stale from sitting in the driver's buffer. Frames that get replaced before being
+    consumed are counted as dropped. The time of capture gets recorded with each frame, the
+    consumer reports the latency at the time of forwarding the frame.
+    """
+
+    def __init__(self, cap, buffer_size: int = 1):
+        """
+        Initializes the capture thread.
+
+        :param cap: the opened capture to read from
+        :param buffer_size: the number of most recent frames to keep
+        :type buffer_size: int
+        """
+        self.cap = cap
+        self.buffer_size = max(1, buffer_size)
+        self.num_captured = 0
+        """ the number of frames read from the capture. """
+        self.num_dropped = 0
+        """ the number of frames that got replaced before being consumed. """
+        self.num_latencies = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self._frames = deque()
+        self._cond = threading.Condition()
+        self._ended = False
+        self._failure = None
+        self._stopped = None
+        self._thread = None
+
+    def _run(self):
+        """
+        Reads the frames, executed in the background thread.
+        """
+        try:
+            while not self._stopped.is_set():
+                retval, frame = self.cap.read()
+                now = time.time()
+                if not retval:
+                    break
+                with self._cond:
+                    self.num_captured += 1
+                    if len(self._frames) >= self.buffer_size:
+                        self._frames.popleft()
+                        self.num_dropped += 1
+                    self._frames.append((self.num_captured, frame, now))
+                    self._cond.notify_all()
+        except BaseException as e:
+            self._failure = e
+        finally:
+            with self._cond:
+                self._ended = True
+                self._cond.notify_all()
+
+    def start(self):
+        """
+        Starts the background thread.
+        """
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def next(self) -> Optional[Tuple[int, np.ndarray, float]]:
+        """
+        Waits for the next frame, i.e., the oldest of the most recent frames that were kept.
+
+        :return: the tuple of frame number (1-based, including dropped frames), frame and time of capture, None if no more frames
+        :rtype: tuple
+        """
+        with self._cond:
+            while (len(self._frames) == 0) and not self._ended:
+                self._cond.wait(WAIT_TIMEOUT)
+            if len(self._frames) > 0:
+                return self._frames.popleft()
+        if self._failure is not None:
+            raise self._failure
+        return None
+
+    def record_latency(self, capture_time: float):
+        """
+        Records the latency between capturing and forwarding a frame.
+
+        :param capture_time: the time the frame was captured
+        :type capture_time: float
+        """
+        latency = time.time() - capture_time
+        self.num_latencies += 1
+        self.latency_total += latency
+        if latency > self.latency_max:
+            self.latency_max = latency
+
+    def stop(self):
+        """
+        Stops the background thread and waits for it to finish.
+        """
+        if self._thread is None:
+            return
+        self._stopped.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def stats(self) -> str:
+        """
+        Returns the counters as string.
+
+        :return: the counters
+        :rtype: str
+        """
+        latency_mean = (self.latency_total / self.num_latencies) if (self.num_latencies > 0) else 0.0
+        return "captured=%d, dropped=%d, latency mean=%.3fs, max=%.3fs" \
+               % (self.num_captured, self.num_dropped, latency_mean, self.latency_max)
@@ -0,0 +1,239 @@
+import csv
+import cv2
+import json
+import os
+
+from typing import Dict, Iterable, List, Optional
+
+from idc.video.util.archive import file_stat
+from idc.video.util.capture import BACKEND_ANY, open_capture
+from idc.video.util.index import get_index
+
+MANIFEST_FORMAT_JSONL = "jsonl"
+MANIFEST_FORMAT_CSV = "csv"
+MANIFEST_FORMATS = [
+    MANIFEST_FORMAT_JSONL,
+    MANIFEST_FORMAT_CSV,
+]
+
+MANIFEST_EXTENSIONS = {
+    ".jsonl": MANIFEST_FORMAT_JSONL,
+    ".csv": MANIFEST_FORMAT_CSV,
+}
+
+FIELD_PATH = "path"
+FIELD_SIZE = "size"
+FIELD_MTIME = "mtime"
+FIELD_DURATION = "duration"
+FIELD_FPS = "fps"
+FIELD_FRAME_COUNT = "frame_count"
+FIELD_WIDTH = "width"
+FIELD_HEIGHT = "height"
+FIELD_CODEC = "codec"
+FIELD_ERROR = "error"
+FIELD_BACKEND = "backend"
+FIELD_INDEX = "index"
+FIELDS = [
+    FIELD_PATH,
+    FIELD_SIZE,
+    FIELD_MTIME,
+    FIELD_DURATION,
+    FIELD_FPS,
+    FIELD_FRAME_COUNT,
+    FIELD_WIDTH,
+    FIELD_HEIGHT,
+    FIELD_CODEC,
+    FIELD_ERROR,
+    FIELD_BACKEND,
+    FIELD_INDEX,
+]
+
+_INT_FIELDS = [FIELD_SIZE, FIELD_MTIME, FIELD_FRAME_COUNT, FIELD_WIDTH, FIELD_HEIGHT]
+_FLOAT_FIELDS = [FIELD_DURATION, FIELD_FPS]
+_BOOL_FIELDS = [FIELD_INDEX]
+
+
+def manifest_format(path: str) -> Optional[str]:
+    """
+    Determines the format of the manifest from the file extension.
+
+    :param path: the manifest file
+    :type path: str
+    :return: the format (jsonl/csv), None if not a manifest
+    :rtype: str
+    """
+    return MANIFEST_EXTENSIONS.get(os.path.splitext(path)[1].lower(), None)
+
+
+def _fourcc(value: float) -> Optional[str]:
+    """
+    Turns the numeric FOURCC code into a string.
+
+    :param value: the code as returned by CAP_PROP_FOURCC
+    :type value: float
+    :return: the code, None if not available
+    :rtype: str
+    """
+    code = int(value)
+    if code <= 0:
+        return None
+    return "".join(chr((code >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00 ")
+
+
+def probe_video(path: str, backend: str = BACKEND_ANY, index: bool = False, index_dir: Optional[str] = None) -> Dict:
+    """
+    Determines duration, frame rate, frame count, resolution and codec of the video. Frame count
+    and duration come from the container's metadata, unless the frame index is used.
+    Failures are recorded in the 'error' field rather than raised. The settings used for probing
+    (backend, index) get stored in the record as well.
+
+    :param path: the video to probe
+    :type path: str
+    :param backend: the capture backend to use
+    :type backend: str
+    :param index: whether to use the frame index for exact frame counts and duration
+    :type index: bool
+    :param index_dir: the directory with the frame index files, None if stored next to the videos
+    :type index_dir: str
+    :return: the record
+    :rtype: dict
+    """
+    result = {x: None for x in FIELDS}
+    result[FIELD_PATH] = path
+    result[FIELD_BACKEND] = backend
+    result[FIELD_INDEX] = index
+    try:
+        result[FIELD_SIZE], result[FIELD_MTIME] = file_stat(path)
+        cap = open_capture(path, backend=backend)
+        try:
+            if not cap.isOpened():
+                raise Exception("Failed to open video")
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            result[FIELD_FPS] = fps if (fps > 0) else None
+            result[FIELD_FRAME_COUNT] = max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+            result[FIELD_WIDTH] = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            result[FIELD_HEIGHT] = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            result[FIELD_CODEC] = _fourcc(cap.get(cv2.CAP_PROP_FOURCC))
+        finally:
+            cap.release()
+        if index:
+            frame_index = get_index(path, index_dir=index_dir)
+            result[FIELD_FRAME_COUNT] = frame_index.num_frames
+            if result[FIELD_FPS] is None:
+                result[FIELD_FPS] = frame_index.fps
+        if result[FIELD_FPS]:
+            result[FIELD_DURATION] = result[FIELD_FRAME_COUNT] / result[FIELD_FPS]
+    except Exception as e:
+        result[FIELD_ERROR] = str(e)
+    return result
+
+
+def is_current(record: Dict, path: Optional[str] = None) -> bool:
+    """
+    Checks whether the record is still up-to-date, using size and modification time of the video.
+
+    :param record: the record to check
+    :type record: dict
+    :param path: the video file, uses the path stored in the record if None
+    :type path: str
+    :return: True if up-to-date
+    :rtype: bool
+    """
+    if path is None:
+        path = record[FIELD_PATH]
+    try:
+        size, mtime = file_stat(path)
+    except Exception:
+        return False
+    return (record.get(FIELD_SIZE) == size) and (record.get(FIELD_MTIME) == mtime)
+
+
+def same_settings(record: Dict, backend: str = BACKEND_ANY, index: bool = False) -> bool:
+    """
+    Checks whether the record was probed with the specified settings.
+
+    :param record: the record to check
+    :type record: dict
+    :param backend: the capture backend
+    :type backend: str
+    :param index: whether the frame index is used
+    :type index: bool
+    :return: True if the same settings
+    :rtype: bool
+    """
+    return (record.get(FIELD_BACKEND) == backend) and (record.get(FIELD_INDEX) == index)
+
+
+def _parse_value(field: str, value: str):
+    """
+    Converts the CSV cell into the type of the field.
+
+    :param field: the name of the field
+    :type field: str
+    :param value: the value to convert
+    :type value: str
+    :return: the converted value, None for empty cells
+    """
+    if (value is None) or (len(value) == 0):
+        return None
+    if field in _INT_FIELDS:
+        return int(value)
+    if field in _FLOAT_FIELDS:
+        return float(value)
+    if field in _BOOL_FIELDS:
+        return value.lower() == "true"
+    return value
+
+
+def load_manifest(path: str) -> List[Dict]:
+    """
+    Loads the manifest (JSON lines or CSV, determined by the extension).
+
+    :param path: the manifest to load
+    :type path: str
+    :return: the records
+    :rtype: list
+    """
+    fmt = manifest_format(path)
+    if fmt is None:
+        raise Exception("Unsupported manifest extension (%s): %s" % ("|".join(MANIFEST_EXTENSIONS.keys()), path))
+    result = []
+    with open(path, "r", newline="") as fp:
+        if fmt == MANIFEST_FORMAT_JSONL:
+            for line in fp:
+                line = line.strip()
+                if len(line) > 0:
+                    result.append(json.loads(line))
+        else:
+            for row in csv.DictReader(fp):
+                result.append({k: _parse_value(k, v) for k, v in row.items()})
+    for i, record in enumerate(result):
+        if FIELD_PATH not in record:
+            raise Exception("Record #%d without '%s' in manifest: %s" % (i + 1, FIELD_PATH, path))
+    return result
+
+
+def save_manifest(records: Iterable[Dict], path: str):
+    """
+    Saves the records atomically as manifest (JSON lines or CSV, determined by the extension).
+
+    :param records: the records to save
+    :type records: Iterable
+    :param path: the manifest file to write
+    :type path: str
+    """
+    fmt = manifest_format(path)
+    if fmt is None:
+        raise Exception("Unsupported manifest extension (%s): %s" % ("|".join(MANIFEST_EXTENSIONS.keys()), path))
+    tmp = path + ".tmp"
+    with open(tmp, "w", newline="") as fp:
+        if fmt == MANIFEST_FORMAT_JSONL:
+            for record in records:
+                fp.write(json.dumps({x: record.get(x, None) for x in FIELDS}))
+                fp.write("\n")
+        else:
+            writer = csv.DictWriter(fp, fieldnames=FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            for record in records:
+                writer.writerow(record)
+    os.replace(tmp, path)
@@ -0,0 +1,253 @@
+import threading
+import time
+
+from collections import deque
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+WAIT_TIMEOUT = 0.1
+""" the timeout in seconds when waiting, before checking whether to stop. """
+
+
+def parse_source(source: str):
+    """
+    Turns the source into a device ID if it is numeric, otherwise returns it as is (file or URL).
+
+    :param source: the source to parse
+    :type source: str
+    :return: the device ID or the source
+    """
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+
+class SourceCapture:
+    """
+    Captures the frames of a single source in a background thread and buffers them in a bounded
+    queue. When the queue is full, either the oldest frame gets dropped (live sources) or the thread
+    waits for space. Frames exceeding the rate limit only get grabbed, not decoded.
+    """
+
+    def __init__(self, index: int, source, open_func: Callable, cond: threading.Condition,
+                 max_fps: float = 0.0, queue_size: int = 1, wait_when_full: bool = False,
+                 max_frames: int = -1, logger=None):
+        """
+        Initializes the capture.
+
+        :param index: the index of the source
+        :type index: int
+        :param source: the device ID, file or URL to capture from
+        :param open_func: the function for opening the capture, takes the source as parameter
+        :type open_func: Callable
+        :param cond: the condition to notify when frames become available, shared by all the sources
+        :type cond: threading.Condition
+        :param max_fps: the maximum number of frames per second to capture, ignored if <=0
+        :type max_fps: float
+        :param queue_size: the maximum number of frames to buffer
+        :type queue_size: int
+        :param wait_when_full: whether to wait for space rather than dropping the oldest frame when the queue is full
+        :type wait_when_full: bool
+        :param max_frames: the maximum number of frames to capture, ignored if <=0
+        :type max_frames: int
+        :param logger: the optional logger to use
+        """
+        self.index = index
+        self.source = source
+        self.open_func = open_func
+        self.max_fps = max_fps
+        self.queue_size = max(1, queue_size)
+        self.wait_when_full = wait_when_full
+        self.max_frames = max_frames
+        self.logger = logger
+        self.num_read = 0
+        """ the number of frames read from the source. """
+        self.num_captured = 0
+        """ the number of frames that were decoded and queued. """
+        self.num_skipped = 0
+        """ the number of frames skipped due to the rate limit. """
+        self.num_dropped = 0
+        """ the number of frames dropped because the queue was full. """
+        self.num_forwarded = 0
+        """ the number of frames taken from the queue. """
+        self._cond = cond
+        self._frames = deque()
+        self._ended = False
+        self._failure = None
+        self._stopped = None
+        self._thread = None
+
+    @property
+    def ended(self) -> bool:
+        """
+        Returns whether the source has no more frames, i.e., it has finished and the queue is empty.
+
+        :return: True if no more frames
+        :rtype: bool
+        """
+        return self._ended and (len(self._frames) == 0)
+
+    def _run(self):
+        """
+        Captures the frames, executed in the background thread.
+        """
+        cap = None
+        try:
+            cap = self.open_func(self.source)
+            if (cap is None) or not cap.isOpened():
+                raise Exception("Failed to open source: %s" % str(self.source))
+            interval = (1.0 / self.max_fps) if (self.max_fps > 0) else 0.0
+            last = None
+            while not self._stopped.is_set():
+                if (self.max_frames > 0) and (self.num_captured >= self.max_frames):
+                    break
+                if not cap.grab():
+                    break
+                now = time.time()
+                self.num_read += 1
+                if (last is not None) and (now - last < interval):
+                    self.num_skipped += 1
+                    continue
+                retval, frame = cap.retrieve()
+                if not retval:
+                    continue
+                last = now
+                self.num_captured += 1
+                with self._cond:
+                    while self.wait_when_full and (len(self._frames) >= self.queue_size) and not self._stopped.is_set():
+                        self._cond.wait(WAIT_TIMEOUT)
+                    if len(self._frames) >= self.queue_size:
+                        self._frames.popleft()
+                        self.num_dropped += 1
+                    self._frames.append((self.num_read, frame, now))
+                    self._cond.notify_all()
+        except BaseException as e:
+            self._failure = e
+        finally:
+            if cap is not None:
+                cap.release()
+            with self._cond:
+                self._ended = True
+                self._cond.notify_all()
+
+    def start(self):
+        """
+        Starts the background thread.
+        """
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def poll(self) -> Optional[Tuple[int, np.ndarray, float]]:
+        """
+        Takes the next frame from the queue, needs to be called with the shared condition held.
+
+        :return: the tuple of frame number (1-based, including skipped/dropped frames), frame and time of capture, None if none available
+        :rtype: tuple
+        """
+        if len(self._frames) == 0:
+            return None
+        self.num_forwarded += 1
+        result = self._frames.popleft()
+        self._cond.notify_all()
+        return result
+
+    def failure(self) -> Optional[BaseException]:
+        """
+        Returns the exception that stopped the capture, if any.
+
+        :return: the exception, None if none occurred
+        """
+        return self._failure
+
+    def stop(self):
+        """
+        Stops the background thread and waits for it to finish.
+        """
+        if self._thread is None:
+            return
+        self._stopped.set()
+        with self._cond:
+            self._cond.notify_all()
+        self._thread.join()
+        self._thread = None
+
+    def stats(self) -> str:
+        """
+        Returns the counters as string.
+
+        :return: the counters
+        :rtype: str
+        """
+        return "read=%d, skipped=%d, captured=%d, dropped=%d, forwarded=%d" \
+               % (self.num_read, self.num_skipped, self.num_captured, self.num_dropped, self.num_forwarded)
+
+
+class RoundRobinMerger:
+    """
+    Merges the frames of several sources into a single stream. The sources get served in turn,
+    taking one frame at a time from each source that has frames available, so that a fast source
+    cannot starve the others.
+    """
+
+    def __init__(self, sources: List[SourceCapture], cond: threading.Condition, logger=None):
+        """
+        Initializes the merger.
+
+        :param sources: the sources to merge
+        :type sources: list
+        :param cond: the condition shared by the sources
+        :type cond: threading.Condition
+        :param logger: the optional logger to use
+        """
+        self.sources = sources
+        self.logger = logger
+        self._cond = cond
+        self._next = 0
+        self._reported = set()
+
+    def _report(self):
+        """
+        Logs the failures of the sources that ended, needs to be called with the shared condition held.
+        """
+        for source in self.sources:
+            if source.ended and (source.index not in self._reported):
+                self._reported.add(source.index)
+                if (source.failure() is not None) and (self.logger is not None):
+                    self.logger.warning("Source #%d (%s) failed: %s" % (source.index, str(source.source), str(source.failure())))
+
+    def next(self) -> Optional[Tuple[SourceCapture, int, np.ndarray, float]]:
+        """
+        Waits for the next frame, serving the sources in turn.
+
+        :return: the tuple of source, frame number, frame and time of capture, None if all sources ended
+        :rtype: tuple
+        """
+        num = len(self.sources)
+        with self._cond:
+            while True:
+                for i in range(num):
+                    source = self.sources[(self._next + i) % num]
+                    frame = source.poll()
+                    if frame is not None:
+                        self._next = (source.index + 1) % num
+                        return (source,) + frame
+                self._report()
+                if all(x.ended for x in self.sources):
+                    return None
+                self._cond.wait(WAIT_TIMEOUT)
+
+    def start(self):
+        """
+        Starts the capture threads of all sources.
+        """
+        for source in self.sources:
+            source.start()
+
+    def stop(self):
+        """
+        Stops the capture threads of all sources.
+        """
+        for source in self.sources:
+            source.stop()
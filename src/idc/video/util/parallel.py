@@ -0,0 +1,248 @@
+import multiprocessing
+import queue
+import traceback
+
+from typing import Callable, Iterator, List, Tuple, Any
+
+from idc.video.util.shm_ring import FrameRing
+
+ORDER_FILE = "file"
+ORDER_INTERLEAVED = "interleaved"
+ORDERS = [
+    ORDER_FILE,
+    ORDER_INTERLEAVED,
+]
+
+DEFAULT_QUEUE_SIZE = 32
+""" the default number of results that each worker can have in flight. """
+
+MSG_START = "start"
+MSG_DATA = "data"
+MSG_DONE = "done"
+MSG_ERROR = "error"
+MSG_EXIT = "exit"
+
+POLL_TIMEOUT = 0.05
+""" the timeout in seconds when polling the worker queues. """
+
+
+def _worker_loop(worker: Callable, tasks, results, writer=None):
+    """
+    The loop executed in the worker processes: obtains the next task, applies the worker
+    function to it and forwards the generated results.
+
+    :param worker: the function that turns a task into an iterable of results
+    :type worker: Callable
+    :param tasks: the queue with the (index, task) tuples, None signals the end
+    :param results: the queue for the (message, index, payload) tuples of this worker
+    :param writer: the writer for storing the frames of the payloads in shared memory, can be None
+    :type writer: RingWriter
+    """
+    while True:
+        item = tasks.get()
+        if item is None:
+            results.put((MSG_EXIT, None, None))
+            if writer is not None:
+                writer.close()
+            break
+        index, task = item
+        results.put((MSG_START, index, None))
+        try:
+            for payload in worker(task):
+                if writer is not None:
+                    payload = writer.pack(payload)
+                results.put((MSG_DATA, index, payload))
+            results.put((MSG_DONE, index, None))
+        except:
+            results.put((MSG_ERROR, index, traceback.format_exc()))
+
+
+class DecoderPool:
+    """
+    Applies a worker function to tasks in separate processes and streams the results back.
+    Tasks are handed out in order, each worker has its own bounded result queue, which
+    blocks the worker if the results are not consumed quickly enough. Optionally, the frames
+    (numpy arrays) in the results get handed over via a ring buffer in shared memory.
+    """
+
+    def __init__(self, worker: Callable, tasks: List, num_workers: int, order: str = ORDER_FILE,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, ring: FrameRing = None):
+        """
+        Initializes the pool.
+
+        :param worker: the picklable function that turns a task into an iterable of (picklable) results
+        :type worker: Callable
+        :param tasks: the picklable tasks to process
+        :type tasks: list
+        :param num_workers: the number of worker processes to use
+        :type num_workers: int
+        :param order: how to return the results (file/interleaved)
+        :type order: str
+        :param queue_size: the maximum number of results per worker waiting to be consumed
+        :type queue_size: int
+        :param ring: the ring buffer for handing over the frames of (tuple) results, None for pickling them
+        :type ring: FrameRing
+        """
+        if order not in ORDERS:
+            raise Exception("Unknown order: %s" % order)
+        self.worker = worker
+        self.tasks = tasks
+        self.num_workers = min(num_workers, len(tasks))
+        self.order = order
+        self.queue_size = queue_size
+        self.ring = ring
+        self._task_queue = None
+        self._result_queues = None
+        self._heads = None
+        self._exited = None
+        self._processes = None
+
+    def start(self):
+        """
+        Starts the worker processes.
+        """
+        ctx = multiprocessing.get_context("spawn")
+        self._task_queue = ctx.Queue()
+        for i, task in enumerate(self.tasks):
+            self._task_queue.put((i, task))
+        for _ in range(self.num_workers):
+            self._task_queue.put(None)
+        self._result_queues = []
+        self._heads = []
+        self._exited = []
+        self._processes = []
+        if self.ring is not None:
+            self.ring.start(ctx, self.num_workers)
+        for i in range(self.num_workers):
+            results = ctx.Queue(maxsize=self.queue_size)
+            writer = self.ring.writer(i) if (self.ring is not None) else None
+            process = ctx.Process(target=_worker_loop, args=(self.worker, self._task_queue, results, writer), daemon=True)
+            process.start()
+            self._result_queues.append(results)
+            self._heads.append(None)
+            self._exited.append(False)
+            self._processes.append(process)
+
+    def _next(self, worker: int, block: bool) -> Tuple:
+        """
+        Returns the next message of the specified worker.
+
+        :param worker: the index of the worker
+        :type worker: int
+        :param block: whether to wait for a message to arrive
+        :type block: bool
+        :return: the message, None if none available
+        :rtype: tuple
+        """
+        if self._heads[worker] is not None:
+            result = self._heads[worker]
+            self._heads[worker] = None
+            return result
+        if self._exited[worker]:
+            return None
+        try:
+            result = self._result_queues[worker].get(timeout=POLL_TIMEOUT if block else 0.001)
+        except queue.Empty:
+            if not self._processes[worker].is_alive() and self._result_queues[worker].empty():
+                raise Exception("Worker process #%d died unexpectedly!" % worker)
+            return None
+        if result[0] == MSG_EXIT:
+            self._exited[worker] = True
+            return None
+        if (result[0] == MSG_DATA) and (self.ring is not None):
+            result = (result[0], result[1], self.ring.unpack(result[2]))
+        return result
+
+    def _check(self, msg: Tuple):
+        """
+        Raises an exception if the message is an error message.
+
+        :param msg: the message to check
+        :type msg: tuple
+        """
+        if msg[0] == MSG_ERROR:
+            raise Exception("Failed to process task #%d:\n%s" % (msg[1], msg[2]))
+
+    def _results_file(self) -> Iterator[Tuple[int, Any]]:
+        """
+        Returns the results task by task.
+
+        :return: iterator of task index and result tuples
+        """
+        for index in range(len(self.tasks)):
+            # locate worker that processes the task
+            worker = None
+            while worker is None:
+                for i in range(self.num_workers):
+                    if self._heads[i] is None:
+                        self._heads[i] = self._next(i, False)
+                    if self._heads[i] is not None:
+                        self._check(self._heads[i])
+                        if self._heads[i][1] == index:
+                            worker = i
+                            self._heads[i] = None
+                            break
+            # forward its results
+            while True:
+                msg = self._next(worker, True)
+                if msg is None:
+                    continue
+                self._check(msg)
+                if msg[0] == MSG_DONE:
+                    break
+                yield msg[1], msg[2]
+
+    def _results_interleaved(self) -> Iterator[Tuple[int, Any]]:
+        """
+        Returns the results as they become available, visiting the workers in round-robin fashion.
+
+        :return: iterator of task index and result tuples
+        """
+        done = 0
+        while done < len(self.tasks):
+            for i in range(self.num_workers):
+                msg = self._next(i, False)
+                if msg is None:
+                    continue
+                self._check(msg)
+                if msg[0] == MSG_DONE:
+                    done += 1
+                elif msg[0] == MSG_DATA:
+                    yield msg[1], msg[2]
+
+    def results(self) -> Iterator[Tuple[int, Any]]:
+        """
+        Returns the results, using the order of the pool.
+
+        :return: iterator of task index and result tuples
+        """
+        if len(self.tasks) == 0:
+            return
+        if self.order == ORDER_FILE:
+            for result in self._results_file():
+                yield result
+        else:
+            for result in self._results_interleaved():
+                yield result
+
+    def stop(self):
+        """
+        Stops the worker processes.
+        """
+        if self._processes is None:
+            return
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self._processes:
+            process.join()
+        for q in self._result_queues + [self._task_queue]:
+            q.close()
+            q.cancel_join_thread()
+        if self.ring is not None:
+            self.ring.close()
+        self._processes = None
+        self._result_queues = None
+        self._task_queue = None
+        self._heads = None
+        self._exited = None
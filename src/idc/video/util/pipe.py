@@ -0,0 +1,302 @@
+import cv2
+import numpy as np
+import sys
+
+from typing import Iterator, Optional, Tuple
+
+STDIN = "-"
+""" the input name for reading from stdin. """
+
+STREAM_FORMAT_RAWVIDEO = "rawvideo"
+STREAM_FORMAT_MJPEG = "mjpeg"
+STREAM_FORMATS = [
+    STREAM_FORMAT_RAWVIDEO,
+    STREAM_FORMAT_MJPEG,
+]
+
+PIXEL_FORMAT_BGR24 = "bgr24"
+PIXEL_FORMAT_RGB24 = "rgb24"
+PIXEL_FORMAT_BGRA = "bgra"
+PIXEL_FORMAT_RGBA = "rgba"
+PIXEL_FORMAT_GRAY = "gray"
+PIXEL_FORMAT_YUV420P = "yuv420p"
+PIXEL_FORMAT_NV12 = "nv12"
+PIXEL_FORMAT_YUYV422 = "yuyv422"
+PIXEL_FORMATS = {
+    # name: (rows factor, columns, conversion to BGR)
+    PIXEL_FORMAT_BGR24: ((1, 1), 3, None),
+    PIXEL_FORMAT_RGB24: ((1, 1), 3, cv2.COLOR_RGB2BGR),
+    PIXEL_FORMAT_BGRA: ((1, 1), 4, cv2.COLOR_BGRA2BGR),
+    PIXEL_FORMAT_RGBA: ((1, 1), 4, cv2.COLOR_RGBA2BGR),
+    PIXEL_FORMAT_GRAY: ((1, 1), 1, cv2.COLOR_GRAY2BGR),
+    PIXEL_FORMAT_YUV420P: ((3, 2), 1, cv2.COLOR_YUV2BGR_I420),
+    PIXEL_FORMAT_NV12: ((3, 2), 1, cv2.COLOR_YUV2BGR_NV12),
+    PIXEL_FORMAT_YUYV422: ((1, 1), 2, cv2.COLOR_YUV2BGR_YUY2),
+}
+
+MJPEG_BUFFER_SIZE = 4 * 1024 * 1024
+""" the initial size of the buffer for MJPEG streams, grows if necessary. """
+
+MJPEG_CHUNK_SIZE = 64 * 1024
+""" the number of bytes to read from MJPEG streams at a time. """
+
+_SOI = b"\xff\xd8"
+_SOS = 0xDA
+_EOI = 0xD9
+_SOF = [0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF]
+
+
+def open_pipe(path: str):
+    """
+    Opens stdin, the named pipe or file for unbuffered binary reading.
+
+    :param path: the named pipe/file, '-' for stdin
+    :type path: str
+    :return: the file object
+    """
+    if path == STDIN:
+        return open(sys.stdin.fileno(), "rb", buffering=0, closefd=False)
+    return open(path, "rb", buffering=0)
+
+
+def read_fully(fp, view: memoryview) -> int:
+    """
+    Fills the buffer from the stream, reading until it is full or the stream ends.
+
+    :param fp: the stream to read from
+    :param view: the buffer to fill
+    :type view: memoryview
+    :return: the number of bytes read, less than the buffer size at the end of the stream
+    :rtype: int
+    """
+    total = 0
+    size = len(view)
+    while total < size:
+        n = fp.readinto(view[total:])
+        if not n:
+            break
+        total += n
+    return total
+
+
+def raw_frame_shape(width: int, height: int, pixel_format: str) -> Tuple[int, ...]:
+    """
+    Returns the shape of the buffer for a single raw frame.
+
+    :param width: the width of the frames
+    :type width: int
+    :param height: the height of the frames
+    :type height: int
+    :param pixel_format: the pixel format, see PIXEL_FORMATS
+    :type pixel_format: str
+    :return: the shape
+    :rtype: tuple
+    """
+    if pixel_format not in PIXEL_FORMATS:
+        raise Exception("Unsupported pixel format: %s" % pixel_format)
+    (num, denom), channels, _ = PIXEL_FORMATS[pixel_format]
+    rows = height * num // denom
+    if channels == 1:
+        return rows, width
+    return rows, width, channels
+
+
+def raw_to_bgr(buffer: np.ndarray, pixel_format: str) -> np.ndarray:
+    """
+    Converts the raw frame into BGR.
+
+    :param buffer: the raw frame
+    :type buffer: np.ndarray
+    :param pixel_format: the pixel format, see PIXEL_FORMATS
+    :type pixel_format: str
+    :return: the converted frame, the buffer itself if no conversion necessary
+    :rtype: np.ndarray
+    """
+    conversion = PIXEL_FORMATS[pixel_format][2]
+    if conversion is None:
+        return buffer
+    return cv2.cvtColor(buffer, conversion)
+
+
+def read_raw_frames(fp, width: int, height: int, pixel_format: str, logger=None) -> Iterator[np.ndarray]:
+    """
+    Reads fixed-size raw frames from the stream into a preallocated buffer. The same buffer
+    is returned for every frame, i.e., the frame needs to be processed or copied before
+    requesting the next one.
+
+    :param fp: the stream to read from
+    :param width: the width of the frames
+    :type width: int
+    :param height: the height of the frames
+    :type height: int
+    :param pixel_format: the pixel format, see PIXEL_FORMATS
+    :type pixel_format: str
+    :param logger: the optional logger to use
+    :return: iterator over the raw frames (in the pixel format)
+    """
+    buffer = np.empty(raw_frame_shape(width, height, pixel_format), dtype=np.uint8)
+    view = memoryview(buffer).cast("B")
+    while True:
+        n = read_fully(fp, view)
+        if n == 0:
+            break
+        if n < len(view):
+            if logger is not None:
+                logger.warning("Incomplete frame at end of stream (%d/%d bytes), discarding" % (n, len(view)))
+            break
+        yield buffer
+
+
+def find_jpeg_end(data: bytearray, start: int, end: int, state: Tuple[int, bool] = None) -> Tuple[int, Optional[Tuple[int, bool]]]:
+    """
+    Locates the end of the JPEG image that starts at the specified position, by walking
+    the marker segments (skipping their payload, e.g., embedded thumbnails) and scanning the
+    entropy-coded data for the next marker. Can be resumed once more data is available.
+
+    :param data: the buffer
+    :type data: bytearray
+    :param start: the position of the SOI marker
+    :type start: int
+    :param end: the end of the valid data in the buffer
+    :type end: int
+    :param state: the state to resume from (position, whether in entropy-coded data), None to start
+    :type state: tuple
+    :return: the tuple of position after the EOI marker (-1 if more data is required) and the state to resume from
+    :rtype: tuple
+    """
+    if state is None:
+        pos, entropy = start + 2, False
+    else:
+        pos, entropy = state
+    while True:
+        if entropy:
+            idx = data.find(b"\xff", pos, end)
+            if idx < 0:
+                return -1, (end, True)
+            if idx + 1 >= end:
+                return -1, (idx, True)
+            marker = data[idx + 1]
+            if marker == 0xFF:
+                # fill byte
+                pos = idx + 1
+            elif (marker == 0x00) or (0xD0 <= marker <= 0xD7):
+                # stuffed zero or restart marker
+                pos = idx + 2
+            else:
+                pos = idx
+                entropy = False
+            continue
+        if pos + 2 > end:
+            return -1, (pos, False)
+        if data[pos] != 0xFF:
+            raise Exception("Invalid JPEG marker at offset %d" % (pos - start))
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker == _EOI:
+            return pos + 2, None
+        if (0xD0 <= marker <= 0xD7) or (marker == 0x01):
+            pos += 2
+            continue
+        if pos + 4 > end:
+            return -1, (pos, False)
+        length = (data[pos + 2] << 8) | data[pos + 3]
+        if pos + 2 + length > end:
+            return -1, (pos, False)
+        pos += 2 + length
+        entropy = (marker == _SOS)
+
+
+def jpeg_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Determines the dimensions of the JPEG image from its start of frame header.
+
+    :param data: the JPEG image
+    :type data: bytes
+    :return: the tuple of width and height, None if no start of frame header found
+    :rtype: tuple
+    """
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if (0xD0 <= marker <= 0xD7) or (marker == 0x01):
+            pos += 2
+            continue
+        if marker in _SOF and (pos + 9 <= len(data)):
+            height = (data[pos + 5] << 8) | data[pos + 6]
+            width = (data[pos + 7] << 8) | data[pos + 8]
+            return width, height
+        if marker in [_SOS, _EOI]:
+            return None
+        pos += 2 + ((data[pos + 2] << 8) | data[pos + 3])
+    return None
+
+
+def read_mjpeg_frames(fp, logger=None) -> Iterator[bytes]:
+    """
+    Reads concatenated JPEG images from the stream (e.g., ffmpeg's mjpeg/image2pipe output),
+    reading into a preallocated buffer that only grows if an image does not fit.
+
+    :param fp: the stream to read from
+    :param logger: the optional logger to use
+    :return: iterator over the JPEG images
+    """
+    buffer = bytearray(MJPEG_BUFFER_SIZE)
+    start = 0
+    end = 0
+    state = None
+    found = False
+    while True:
+        image = None
+        if not found and (end - start >= 2):
+            soi = buffer.find(_SOI, start, end)
+            if soi < 0:
+                # keep last byte, could be the start of the marker
+                skipped = end - 1 - start
+                start = end - 1
+            else:
+                skipped = soi - start
+                start = soi
+                found = True
+                state = None
+            if (skipped > 0) and (logger is not None):
+                logger.warning("Skipping %d byte(s) before start of image" % skipped)
+        if found:
+            try:
+                image_end, state = find_jpeg_end(buffer, start, end, state)
+            except Exception as e:
+                # corrupt image, resynchronize on next start of image
+                if logger is not None:
+                    logger.warning("Skipping corrupt image: %s" % str(e))
+                start += 2
+                found = False
+                continue
+            if image_end >= 0:
+                image = bytes(buffer[start:image_end])
+                start = image_end
+                found = False
+        if image is not None:
+            yield image
+            continue
+        # move remaining data to the front, grow buffer if necessary
+        if start > 0:
+            buffer[0:end - start] = buffer[start:end]
+            if state is not None:
+                state = (state[0] - start, state[1])
+            end -= start
+            start = 0
+        if len(buffer) - end < MJPEG_CHUNK_SIZE:
+            buffer.extend(bytes(len(buffer)))
+        with memoryview(buffer) as view:
+            n = fp.readinto(view[end:end + MJPEG_CHUNK_SIZE])
+        if not n:
+            if found and (logger is not None):
+                logger.warning("Incomplete image at end of stream (%d bytes), discarding" % (end - start))
+            break
+        end += n
@@ -0,0 +1,137 @@
+import queue
+import threading
+import time
+
+from typing import Iterable, Iterator
+
+PUT_TIMEOUT = 0.1
+""" the timeout in seconds for adding items to the queue, before checking whether to stop. """
+
+
+class _Failure:
+    """
+    Wraps an exception that occurred in the background thread.
+    """
+
+    def __init__(self, exception: BaseException):
+        self.exception = exception
+
+
+_END = object()
+""" signals the end of the items. """
+
+
+class Prefetcher:
+    """
+    Obtains the items of an iterable in a background thread and buffers them in a bounded queue,
+    allowing the generation of the items to overlap with their processing.
+    Keeps track of the queue's high-water mark and the time spent waiting for items.
+    """
+
+    def __init__(self, items: Iterable, queue_size: int):
+        """
+        Initializes the prefetcher.
+
+        :param items: the items to obtain in the background
+        :type items: Iterable
+        :param queue_size: the maximum number of items to buffer
+        :type queue_size: int
+        """
+        self.items = items
+        self.queue_size = queue_size
+        self.high_water_mark = 0
+        """ the maximum number of items that were waiting in the queue. """
+        self.stall_time = 0.0
+        """ the time in seconds spent waiting for items to become available. """
+        self.num_items = 0
+        """ the number of items that were returned. """
+        self._queue = None
+        self._thread = None
+        self._stopped = None
+
+    def _put(self, item) -> bool:
+        """
+        Adds the item to the queue, waits for space to become available.
+
+        :param item: the item to add
+        :return: False if stopped
+        :rtype: bool
+        """
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=PUT_TIMEOUT)
+                size = self._queue.qsize()
+                if size > self.high_water_mark:
+                    self.high_water_mark = size
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _run(self):
+        """
+        Obtains the items and adds them to the queue, executed in the background thread.
+        """
+        iterator = iter(self.items)
+        try:
+            for item in iterator:
+                if not self._put(item):
+                    break
+            self._put(_END)
+        except BaseException as e:
+            self._put(_Failure(e))
+        finally:
+            if hasattr(iterator, "close"):
+                iterator.close()
+
+    def start(self):
+        """
+        Starts the background thread.
+        """
+        self._queue = queue.Queue(maxsize=max(1, self.queue_size))
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __iter__(self) -> Iterator:
+        """
+        Returns the buffered items, starts the background thread if necessary.
+
+        :return: the items
+        """
+        if self._thread is None:
+            self.start()
+        try:
+            while True:
+                start = time.perf_counter()
+                item = self._queue.get()
+                self.stall_time += time.perf_counter() - start
+                if item is _END:
+                    break
+                if isinstance(item, _Failure):
+                    raise item.exception
+                self.num_items += 1
+                yield item
+        finally:
+            self.stop()
+
+    def stop(self):
+        """
+        Stops the background thread and waits for it to finish.
+        """
+        if self._thread is None:
+            return
+        self._stopped.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def stats(self) -> str:
+        """
+        Returns the counters as string.
+
+        :return: the counters
+        :rtype: str
+        """
+        return "items=%d, queue high-water mark=%d/%d, stall time=%.3fs" \
+               % (self.num_items, self.high_water_mark, self.queue_size, self.stall_time)
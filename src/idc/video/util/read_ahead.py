@@ -0,0 +1,307 @@
+import hashlib
+import os
+import threading
+import time
+
+from typing import List, Optional
+
+from idc.video.util.archive import file_stat, is_archive_path, open_file
+
+READ_CHUNK_SIZE = 1024 * 1024
+""" the number of bytes to read/copy at a time. """
+
+WAIT_TIMEOUT = 0.1
+""" the timeout in seconds when waiting, before checking whether to stop. """
+
+
+class ReadAhead:
+    """
+    Reads the upcoming files in a background thread while the current one gets processed,
+    one file at a time in the scheduled order. Either warms the page cache by reading the files
+    sequentially or stages copies of them in a local directory, capped by a size budget.
+    Staged copies get removed once released or no longer scheduled.
+    """
+
+    def __init__(self, staging_dir: Optional[str] = None, staging_size: int = 0, logger=None):
+        """
+        Initializes the read-ahead.
+
+        :param staging_dir: the local directory to stage the files in, None to only warm the page cache
+        :type staging_dir: str
+        :param staging_size: the maximum number of bytes of the staged copies
+        :type staging_size: int
+        :param logger: the optional logger to use
+        """
+        self.staging_dir = staging_dir
+        self.staging_size = staging_size
+        self.logger = logger
+        self.num_files = 0
+        """ the number of files read ahead. """
+        self.num_bytes = 0
+        """ the number of bytes read ahead. """
+        self.wait_time = 0.0
+        """ the time in seconds spent waiting for files being staged. """
+        self._upcoming = []
+        self._handled = set()
+        self._staged = dict()
+        self._active = None
+        self._current = None
+        self._cond = threading.Condition()
+        self._stopped = None
+        self._thread = None
+
+    def _log(self, msg: str, warning: bool = False):
+        """
+        Logs the message, if a logger is available.
+
+        :param msg: the message to log
+        :type msg: str
+        :param warning: whether to log a warning rather than info
+        :type warning: bool
+        """
+        if self.logger is None:
+            return
+        if warning:
+            self.logger.warning(msg)
+        else:
+            self.logger.info(msg)
+
+    def _staged_path(self, path: str) -> str:
+        """
+        Returns the path of the staged copy, keeping the extension of the file.
+
+        :param path: the file
+        :type path: str
+        :return: the path of the copy
+        :rtype: str
+        """
+        digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.staging_dir, "%s-%s" % (digest, os.path.basename(path)))
+
+    def _staged_total(self) -> int:
+        """
+        Returns the size of all the staged copies, needs to be called with the lock held.
+
+        :return: the number of bytes
+        :rtype: int
+        """
+        return sum(x[1] for x in self._staged.values())
+
+    def _wanted(self, path: str) -> bool:
+        """
+        Checks whether the file is still scheduled or currently in use, needs to be called with the lock held.
+
+        :param path: the file to check
+        :type path: str
+        :return: True if still required
+        :rtype: bool
+        """
+        return (path == self._current) or (path in self._upcoming)
+
+    def _warm(self, path: str):
+        """
+        Reads the file (or archive member) sequentially to get it into the page cache.
+
+        :param path: the file to read
+        :type path: str
+        """
+        with open_file(path) as fp:
+            if hasattr(os, "posix_fadvise") and not is_archive_path(path):
+                os.posix_fadvise(fp.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            while not self._stopped.is_set():
+                data = fp.read(READ_CHUNK_SIZE)
+                if len(data) == 0:
+                    break
+                self.num_bytes += len(data)
+
+    def _stage(self, path: str, size: int) -> bool:
+        """
+        Copies the file into the staging directory, waits for space within the budget first.
+
+        :param path: the file to stage
+        :type path: str
+        :param size: the size of the file
+        :type size: int
+        :return: True if staged
+        :rtype: bool
+        """
+        with self._cond:
+            while (self._staged_total() + size > self.staging_size) and not self._stopped.is_set():
+                if not self._wanted(path):
+                    return False
+                self._cond.wait(WAIT_TIMEOUT)
+        if self._stopped.is_set():
+            return False
+        target = self._staged_path(path)
+        tmp = target + ".tmp"
+        try:
+            with open_file(path) as fp_in:
+                with open(tmp, "wb") as fp_out:
+                    while not self._stopped.is_set():
+                        data = fp_in.read(READ_CHUNK_SIZE)
+                        if len(data) == 0:
+                            break
+                        fp_out.write(data)
+                        self.num_bytes += len(data)
+            if self._stopped.is_set():
+                return False
+            os.replace(tmp, target)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        with self._cond:
+            self._staged[path] = (target, size)
+        return True
+
+    def _next(self) -> Optional[str]:
+        """
+        Waits for the next file to read ahead.
+
+        :return: the file, None if stopped
+        :rtype: str
+        """
+        with self._cond:
+            while not self._stopped.is_set():
+                for path in self._upcoming:
+                    if path not in self._handled:
+                        self._handled.add(path)
+                        self._active = path
+                        return path
+                self._cond.wait(WAIT_TIMEOUT)
+        return None
+
+    def _run(self):
+        """
+        Reads the files ahead, executed in the background thread.
+        """
+        while True:
+            path = self._next()
+            if path is None:
+                break
+            try:
+                start = time.time()
+                size = file_stat(path)[0]
+                staged = False
+                if (self.staging_dir is not None) and (size <= self.staging_size):
+                    staged = self._stage(path, size)
+                elif not self._stopped.is_set():
+                    self._warm(path)
+                if not self._stopped.is_set():
+                    self.num_files += 1
+                    self._log("Read ahead (%s, %.1fs): %s" % ("staged" if staged else "cached", time.time() - start, path))
+            except Exception as e:
+                self._log("Failed to read ahead %s: %s" % (path, str(e)), warning=True)
+            finally:
+                with self._cond:
+                    self._active = None
+                    self._cond.notify_all()
+                self._cleanup()
+
+    def start(self):
+        """
+        Starts the background thread.
+        """
+        if self.staging_dir is not None:
+            os.makedirs(self.staging_dir, exist_ok=True)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _remove(self, path: str):
+        """
+        Removes the staged copy of the file, if any.
+
+        :param path: the file to remove the copy for
+        :type path: str
+        """
+        with self._cond:
+            if path not in self._staged:
+                return
+            target, _ = self._staged.pop(path)
+            self._cond.notify_all()
+        try:
+            os.remove(target)
+        except FileNotFoundError:
+            pass
+
+    def _cleanup(self):
+        """
+        Removes the staged copies of the files that are no longer required.
+        """
+        with self._cond:
+            obsolete = [x for x in self._staged if not self._wanted(x)]
+        for path in obsolete:
+            self._remove(path)
+
+    def schedule(self, paths: List[str]):
+        """
+        Sets the files to read ahead next, in order. Staged copies of files that are no longer
+        scheduled get removed.
+
+        :param paths: the upcoming files
+        :type paths: list
+        """
+        with self._cond:
+            self._upcoming = list(paths)
+            self._cond.notify_all()
+        self._cleanup()
+
+    def acquire(self, path: str) -> str:
+        """
+        Marks the file as the current one and returns the path to read it from, waiting for
+        it to get staged if in progress.
+
+        :param path: the file to read
+        :type path: str
+        :return: the staged copy if available, otherwise the file itself
+        :rtype: str
+        """
+        with self._cond:
+            self._current = path
+            # no need to read ahead anymore
+            self._handled.add(path)
+            if self.staging_dir is not None:
+                start = time.time()
+                while (self._active == path) and not self._stopped.is_set():
+                    self._cond.wait(WAIT_TIMEOUT)
+                self.wait_time += time.time() - start
+            if path in self._staged:
+                return self._staged[path][0]
+        return path
+
+    def release(self, path: str):
+        """
+        Removes the staged copy of the file once it has been processed.
+
+        :param path: the processed file
+        :type path: str
+        """
+        with self._cond:
+            if self._current == path:
+                self._current = None
+        self._remove(path)
+
+    def stop(self):
+        """
+        Stops the background thread and removes all staged copies.
+        """
+        if self._thread is None:
+            return
+        self._stopped.set()
+        with self._cond:
+            self._cond.notify_all()
+        self._thread.join()
+        self._thread = None
+        with self._cond:
+            self._current = None
+            self._upcoming = []
+        self._cleanup()
+
+    def stats(self) -> str:
+        """
+        Returns the statistics of the read-ahead.
+
+        :return: the statistics
+        :rtype: str
+        """
+        return "files=%d, bytes=%d, wait=%.3fs" % (self.num_files, self.num_bytes, self.wait_time)
@@ -0,0 +1,91 @@
+import bisect
+import cv2
+import itertools
+import random
+
+from typing import Dict, List, Optional, Tuple
+
+from idc.video.util.capture import BACKEND_ANY, THREADS_DEFAULT, open_capture
+from idc.video.util.index import get_index
+
+SAMPLING_UNIFORM = "uniform"
+SAMPLING_STRATIFIED = "stratified"
+SAMPLINGS = [
+    SAMPLING_UNIFORM,
+    SAMPLING_STRATIFIED,
+]
+
+
+def probe_frame_count(path: str, index: bool = False, index_dir: Optional[str] = None, backend: str = BACKEND_ANY,
+                      threads: int = THREADS_DEFAULT, params: Optional[List[int]] = None) -> int:
+    """
+    Determines the number of frames in the video, either from the container's metadata (fast, but
+    possibly inaccurate) or from the frame index (exact, requires demuxing the video if not yet indexed).
+
+    :param path: the video to probe
+    :type path: str
+    :param index: whether to use the frame index
+    :type index: bool
+    :param index_dir: the directory with the frame index files, None if stored next to the videos
+    :type index_dir: str
+    :param backend: the capture backend to use (any/ffmpeg/gstreamer/v4l2), should match the one used for decoding
+    :type backend: str
+    :param threads: the number of decoder threads, 0 to let the backend decide
+    :type threads: int
+    :param params: additional property/value pairs for opening the capture, see parse_capture_params
+    :type params: list
+    :return: the number of frames
+    :rtype: int
+    """
+    if index:
+        return get_index(path, index_dir=index_dir).num_frames
+    cap = open_capture(path, backend=backend, threads=threads, params=params)
+    try:
+        return max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+    finally:
+        cap.release()
+
+
+def draw_sample(ranges: Dict[str, Tuple[int, int]], num_samples: int, sampling: str = SAMPLING_UNIFORM,
+                seed: Optional[int] = None) -> Dict[str, List[int]]:
+    """
+    Draws a sample of frames without replacement. 'uniform' samples from the frames of all videos combined,
+    'stratified' draws the same number of frames from each video (the remainder gets distributed randomly;
+    short videos can yield fewer frames).
+
+    :param ranges: the first and last frame (1-based, inclusive) per video
+    :type ranges: dict
+    :param num_samples: the number of frames to sample
+    :type num_samples: int
+    :param sampling: the sampling strategy (uniform/stratified)
+    :type sampling: str
+    :param seed: the seed for the random number generator
+    :type seed: int
+    :return: the sorted frame numbers per video, only contains videos with sampled frames (in the order of ranges)
+    :rtype: dict
+    """
+    if sampling not in SAMPLINGS:
+        raise Exception("Unknown sampling: %s" % sampling)
+    rnd = random.Random(seed)
+    paths = [x for x in ranges if ranges[x][1] >= ranges[x][0]]
+    if (len(paths) == 0) or (num_samples <= 0):
+        return dict()
+    sizes = [ranges[x][1] - ranges[x][0] + 1 for x in paths]
+    samples = dict()
+
+    if sampling == SAMPLING_UNIFORM:
+        bounds = list(itertools.accumulate(sizes))
+        for n in rnd.sample(range(bounds[-1]), min(num_samples, bounds[-1])):
+            i = bisect.bisect_right(bounds, n)
+            offset = n - (bounds[i - 1] if (i > 0) else 0)
+            samples.setdefault(paths[i], []).append(ranges[paths[i]][0] + offset)
+    else:
+        quota = num_samples // len(paths)
+        extra = set(rnd.sample(range(len(paths)), num_samples % len(paths)))
+        for i, path in enumerate(paths):
+            k = min(sizes[i], quota + (1 if (i in extra) else 0))
+            if k > 0:
+                first, last = ranges[path]
+                samples[path] = rnd.sample(range(first, last + 1), k)
+
+    return {x: sorted(samples[x]) for x in paths if x in samples}
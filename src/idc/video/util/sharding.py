@@ -0,0 +1,61 @@
+import fnmatch
+import heapq
+
+from typing import List, Optional
+
+SHARD_POLICY_COUNT = "count"
+SHARD_POLICY_SIZE = "size"
+SHARD_POLICY_DURATION = "duration"
+SHARD_POLICIES = [
+    SHARD_POLICY_COUNT,
+    SHARD_POLICY_SIZE,
+    SHARD_POLICY_DURATION,
+]
+
+
+def assign_shards(paths: List[str], num_shards: int, weights: Optional[List[float]] = None) -> List[int]:
+    """
+    Assigns the files to shards. Without weights, the files get distributed round-robin (same number
+    of files per shard). With weights, the heaviest files get assigned first, each to the shard with
+    the lowest total weight so far (ties are broken by path and shard index). The assignment only
+    depends on the paths and weights, i.e., it is the same on every node and for every rerun.
+
+    :param paths: the files to assign
+    :type paths: list
+    :param num_shards: the number of shards
+    :type num_shards: int
+    :param weights: the weight per file (e.g., size or duration), None for round-robin
+    :type weights: list
+    :return: the shard index per file
+    :rtype: list
+    """
+    if weights is None:
+        return [i % num_shards for i in range(len(paths))]
+
+    result = [0] * len(paths)
+    totals = [(0.0, i) for i in range(num_shards)]
+    order = sorted(range(len(paths)), key=lambda i: (-weights[i], paths[i]))
+    for i in order:
+        total, shard = heapq.heappop(totals)
+        result[i] = shard
+        heapq.heappush(totals, (total + weights[i], shard))
+    return result
+
+
+def resume_position(paths: List[str], resume_from: Optional[str]) -> int:
+    """
+    Determines the position of the first file matching the glob expression.
+
+    :param paths: the files to search
+    :type paths: list
+    :param resume_from: the glob expression, None to start from the beginning
+    :type resume_from: str
+    :return: the position, 0 if no expression provided, -1 if not found
+    :rtype: int
+    """
+    if resume_from is None:
+        return 0
+    for i, path in enumerate(paths):
+        if fnmatch.fnmatch(path, resume_from):
+            return i
+    return -1
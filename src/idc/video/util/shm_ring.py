@@ -0,0 +1,283 @@
+import ctypes
+import queue
+import threading
+import weakref
+import numpy as np
+
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Tuple
+
+FREE_SLOT_TIMEOUT = 1.0
+""" the time in seconds that a worker waits for a free slot before falling back to pickling the frame. """
+
+
+class SlotRef:
+    """
+    Reference to a frame stored in a slot of the ring buffer, sent instead of the frame itself.
+    """
+
+    def __init__(self, slot: int, shape: Tuple, dtype: str):
+        """
+        Initializes the reference.
+
+        :param slot: the index of the slot
+        :type slot: int
+        :param shape: the shape of the frame
+        :type shape: tuple
+        :param dtype: the data type of the frame, as numpy type string
+        :type dtype: str
+        """
+        self.slot = slot
+        self.shape = shape
+        self.dtype = dtype
+
+
+class _SlotBuffer:
+    """
+    Exposes the memory of a slot via the numpy array interface. Arrays created from it keep
+    it alive, the slot gets released once the last array (or view) is garbage collected.
+    """
+
+    def __init__(self, address: int, shape: Tuple, dtype: str):
+        """
+        Initializes the buffer.
+
+        :param address: the memory address of the slot
+        :type address: int
+        :param shape: the shape of the frame
+        :type shape: tuple
+        :param dtype: the data type of the frame, as numpy type string
+        :type dtype: str
+        """
+        self.__array_interface__ = {
+            "version": 3,
+            "data": (address, False),
+            "shape": tuple(shape),
+            "typestr": dtype,
+        }
+
+
+class RingWriter:
+    """
+    The worker side of the ring buffer: copies the frames of the payloads into the free slots
+    of the worker. Frames that do not fit into a slot or for which no slot becomes available
+    in time get sent as they are. After timing out, the writer no longer waits for slots until
+    one becomes available again, i.e., when the frames are retained downstream.
+    """
+
+    def __init__(self, name: str, slot_size: int, free, timeout: float = FREE_SLOT_TIMEOUT):
+        """
+        Initializes the writer.
+
+        :param name: the name of the shared memory block
+        :type name: str
+        :param slot_size: the size of a slot in bytes
+        :type slot_size: int
+        :param free: the queue with the indices of the free slots of the worker
+        :param timeout: the time in seconds to wait for a free slot
+        :type timeout: float
+        """
+        self.name = name
+        self.slot_size = slot_size
+        self.free = free
+        self.timeout = timeout
+        self._shm = None
+        self._starved = False
+
+    def _store(self, frame: np.ndarray) -> Any:
+        """
+        Stores the frame in a free slot.
+
+        :param frame: the frame to store
+        :type frame: np.ndarray
+        :return: the slot reference, the frame itself if it could not be stored
+        """
+        if frame.dtype.hasobject or (frame.nbytes > self.slot_size):
+            return frame
+        try:
+            if self._starved:
+                slot = self.free.get_nowait()
+            else:
+                slot = self.free.get(timeout=self.timeout)
+        except queue.Empty:
+            self._starved = True
+            return frame
+        self._starved = False
+        if self._shm is None:
+            self._shm = SharedMemory(name=self.name)
+        target = np.ndarray(frame.shape, dtype=frame.dtype, buffer=self._shm.buf, offset=slot * self.slot_size)
+        target[...] = frame
+        del target
+        return SlotRef(slot, frame.shape, frame.dtype.str)
+
+    def pack(self, payload: Any) -> Any:
+        """
+        Replaces the frames in the payload tuple with slot references.
+
+        :param payload: the payload to pack
+        :return: the packed payload
+        """
+        if not isinstance(payload, tuple):
+            return payload
+        return tuple(self._store(x) if isinstance(x, np.ndarray) else x for x in payload)
+
+    def close(self):
+        """
+        Detaches from the shared memory.
+        """
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+
+class FrameRing:
+    """
+    Ring buffer of fixed-size frame slots in shared memory, for handing decoded frames from the
+    worker processes to the main process without pickling them. The slots are partitioned
+    among the workers, so that a worker whose frames are not consumed yet cannot starve the others.
+    A worker blocks while all its slots are in use (backpressure). The main process wraps the
+    slots as arrays without copying, a slot gets recycled once the last array referencing it is
+    garbage collected.
+    """
+
+    def __init__(self, num_slots: int, slot_size: int, logger=None):
+        """
+        Initializes the ring buffer.
+
+        :param num_slots: the total number of slots
+        :type num_slots: int
+        :param slot_size: the size of a slot in bytes
+        :type slot_size: int
+        :param logger: the optional logger to use
+        """
+        self.num_slots = num_slots
+        self.slot_size = slot_size
+        self.logger = logger
+        self._shm = None
+        self._pinned = None
+        self._address = None
+        self._free = None
+        self._owners = None
+        self._in_use = 0
+        self._lock = threading.RLock()
+        self._closed = False
+
+    def start(self, ctx, num_workers: int):
+        """
+        Allocates the shared memory and distributes the slots among the workers.
+
+        :param ctx: the multiprocessing context to create the queues with
+        :param num_workers: the number of workers
+        :type num_workers: int
+        """
+        if self.num_slots < num_workers:
+            raise Exception("At least one slot per worker required, slots/workers: %d/%d" % (self.num_slots, num_workers))
+        self._shm = SharedMemory(create=True, size=self.num_slots * self.slot_size)
+        # pins the mapping and provides the address of the memory
+        self._pinned = ctypes.c_char.from_buffer(self._shm.buf)
+        self._address = ctypes.addressof(self._pinned)
+        self._free = [ctx.Queue() for _ in range(num_workers)]
+        self._owners = []
+        for slot in range(self.num_slots):
+            worker = slot % num_workers
+            self._owners.append(worker)
+            self._free[worker].put(slot)
+        self._in_use = 0
+        self._closed = False
+        if self.logger is not None:
+            self.logger.info("Shared memory: %d slot(s) of %d bytes (%s)" % (self.num_slots, self.slot_size, self._shm.name))
+
+    def writer(self, worker: int) -> RingWriter:
+        """
+        Returns the writer for the worker process.
+
+        :param worker: the index of the worker
+        :type worker: int
+        :return: the writer
+        :rtype: RingWriter
+        """
+        return RingWriter(self._shm.name, self.slot_size, self._free[worker])
+
+    def _wrap(self, ref: SlotRef) -> np.ndarray:
+        """
+        Wraps the slot as array, without copying.
+
+        :param ref: the slot reference
+        :type ref: SlotRef
+        :return: the frame
+        :rtype: np.ndarray
+        """
+        buffer = _SlotBuffer(self._address + ref.slot * self.slot_size, ref.shape, ref.dtype)
+        with self._lock:
+            self._in_use += 1
+        weakref.finalize(buffer, self._release, ref.slot)
+        return np.asarray(buffer)
+
+    def unpack(self, payload: Any) -> Any:
+        """
+        Replaces the slot references in the payload tuple with the frames.
+
+        :param payload: the payload to unpack
+        :return: the unpacked payload
+        """
+        if not isinstance(payload, tuple):
+            return payload
+        return tuple(self._wrap(x) if isinstance(x, SlotRef) else x for x in payload)
+
+    def _release(self, slot: int):
+        """
+        Hands the slot back to its worker, unmaps the memory if the ring was closed and this was the last slot in use.
+
+        :param slot: the index of the slot
+        :type slot: int
+        """
+        with self._lock:
+            self._in_use -= 1
+            if not self._closed:
+                self._free[self._owners[slot]].put(slot)
+            elif self._in_use == 0:
+                self._unmap()
+
+    def _unmap(self):
+        """
+        Unmaps the shared memory.
+        """
+        if self._shm is None:
+            return
+        self._pinned = None
+        self._shm.close()
+        self._shm = None
+
+    def close(self):
+        """
+        Removes the shared memory block. The memory stays mapped as long as frames are still in use.
+        """
+        with self._lock:
+            if self._closed or (self._shm is None):
+                return
+            self._closed = True
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+            for q in self._free:
+                q.close()
+                q.cancel_join_thread()
+            self._free = None
+            if self._in_use == 0:
+                self._unmap()
+            elif self.logger is not None:
+                self.logger.info("Shared memory removed, frames still in use: %d" % self._in_use)
+
+
+def slot_size_bytes(size_mb: float) -> int:
+    """
+    Turns the slot size in MB into bytes, aligned to 64 bytes.
+
+    :param size_mb: the size in MB
+    :type size_mb: float
+    :return: the size in bytes
+    :rtype: int
+    """
+    result = int(size_mb * 1024 * 1024)
+    return max(64, (result + 63) // 64 * 64)
@@ -0,0 +1,46 @@
+import math
+
+TIME_EPSILON = 0.001
+""" the tolerance in milliseconds when comparing timestamps. """
+
+
+def parse_time(time: str) -> float:
+    """
+    Parses the time, either in seconds or in the format [[HH:]MM:]SS[.fff].
+
+    :param time: the time to parse
+    :type time: str
+    :return: the time in seconds
+    :rtype: float
+    """
+    parts = time.strip().split(":")
+    if len(parts) > 3:
+        raise Exception("Time must be in the format [[HH:]MM:]SS[.fff], provided: %s" % time)
+    result = 0.0
+    try:
+        for part in parts:
+            result = result * 60 + float(part)
+    except ValueError:
+        raise Exception("Time must be in the format [[HH:]MM:]SS[.fff], provided: %s" % time)
+    if result < 0:
+        raise Exception("Time cannot be negative, provided: %s" % time)
+    return result
+
+
+def next_grid_time(next_msec: float, msec: float, every_ms: float) -> float:
+    """
+    Advances the grid time until it is past the timestamp of the frame that was just selected.
+    Using a fixed grid rather than the frame's timestamp avoids the selection drifting.
+
+    :param next_msec: the current grid time in milliseconds
+    :type next_msec: float
+    :param msec: the timestamp of the selected frame in milliseconds
+    :type msec: float
+    :param every_ms: the interval of the grid in milliseconds
+    :type every_ms: float
+    :return: the next grid time in milliseconds
+    :rtype: float
+    """
+    if next_msec <= msec + TIME_EPSILON:
+        next_msec += (math.floor((msec + TIME_EPSILON - next_msec) / every_ms) + 1) * every_ms
+    return next_msec
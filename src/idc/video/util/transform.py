@@ -0,0 +1,146 @@
+import cv2
+import numpy as np
+
+from typing import Optional, Tuple
+
+RESIZE_STRETCH = "stretch"
+RESIZE_FIT = "fit"
+RESIZE_FILL = "fill"
+RESIZE_MODES = [
+    RESIZE_STRETCH,
+    RESIZE_FIT,
+    RESIZE_FILL,
+]
+
+INTERPOLATION_NEAREST = "nearest"
+INTERPOLATION_LINEAR = "linear"
+INTERPOLATION_CUBIC = "cubic"
+INTERPOLATION_AREA = "area"
+INTERPOLATION_LANCZOS = "lanczos"
+INTERPOLATIONS = {
+    INTERPOLATION_NEAREST: cv2.INTER_NEAREST,
+    INTERPOLATION_LINEAR: cv2.INTER_LINEAR,
+    INTERPOLATION_CUBIC: cv2.INTER_CUBIC,
+    INTERPOLATION_AREA: cv2.INTER_AREA,
+    INTERPOLATION_LANCZOS: cv2.INTER_LANCZOS4,
+}
+
+
+def parse_crop(crop: Optional[str]) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Parses the crop rectangle in the format 'x,y,width,height' (0-based).
+
+    :param crop: the rectangle to parse, None or empty string for no cropping
+    :type crop: str
+    :return: the tuple of x, y, width and height, None if no cropping
+    :rtype: tuple
+    """
+    if (crop is None) or (len(crop.strip()) == 0):
+        return None
+    parts = [x.strip() for x in crop.split(",")]
+    if len(parts) != 4:
+        raise Exception("Crop rectangle must be in the format 'x,y,width,height', provided: %s" % crop)
+    try:
+        x, y, w, h = [int(x) for x in parts]
+    except ValueError:
+        raise Exception("Crop rectangle must consist of integers, provided: %s" % crop)
+    if (x < 0) or (y < 0):
+        raise Exception("Crop rectangle must have non-negative x and y, provided: %s" % crop)
+    if (w <= 0) or (h <= 0):
+        raise Exception("Crop rectangle must have positive width and height, provided: %s" % crop)
+    return x, y, w, h
+
+
+def crop_frame(frame: np.ndarray, crop: Tuple[int, int, int, int]) -> np.ndarray:
+    """
+    Crops the frame to the rectangle, which gets clipped at the frame borders.
+    A copy is returned, so that the full frame does not need to be kept in memory.
+
+    :param frame: the frame to crop
+    :type frame: np.ndarray
+    :param crop: the tuple of x, y, width and height (0-based)
+    :type crop: tuple
+    :return: the cropped frame
+    :rtype: np.ndarray
+    """
+    x, y, w, h = crop
+    height, width = frame.shape[:2]
+    if (x >= width) or (y >= height):
+        raise Exception("Crop rectangle %s is outside frame of size %dx%d" % (str(crop), width, height))
+    return frame[y:min(y + h, height), x:min(x + w, width)].copy()
+
+
+def target_size(width: int, height: int, resize_width: int, resize_height: int,
+                resize_mode: str = RESIZE_FIT) -> Tuple[int, int]:
+    """
+    Calculates the size to scale the frame to. If only one of the dimensions is specified,
+    the other one gets calculated preserving the aspect ratio. If both are specified, the resize mode
+    determines whether to stretch the frame, fit it within the dimensions or to fill the dimensions
+    (which requires cropping the scaled frame afterwards).
+
+    :param width: the width of the frame
+    :type width: int
+    :param height: the height of the frame
+    :type height: int
+    :param resize_width: the width to resize to, ignored if <=0
+    :type resize_width: int
+    :param resize_height: the height to resize to, ignored if <=0
+    :type resize_height: int
+    :param resize_mode: how to resize when both width and height are specified (stretch/fit/fill)
+    :type resize_mode: str
+    :return: the tuple of width and height to scale to
+    :rtype: tuple
+    """
+    if resize_mode not in RESIZE_MODES:
+        raise Exception("Unknown resize mode: %s" % resize_mode)
+    if (resize_width <= 0) and (resize_height <= 0):
+        return width, height
+    if resize_height <= 0:
+        return resize_width, max(1, int(round(height * resize_width / width)))
+    if resize_width <= 0:
+        return max(1, int(round(width * resize_height / height))), resize_height
+    if resize_mode == RESIZE_STRETCH:
+        return resize_width, resize_height
+    if resize_mode == RESIZE_FIT:
+        scale = min(resize_width / width, resize_height / height)
+    else:
+        scale = max(resize_width / width, resize_height / height)
+    return max(1, int(round(width * scale))), max(1, int(round(height * scale)))
+
+
+def transform_frame(frame: np.ndarray, crop: Tuple[int, int, int, int] = None,
+                    resize_width: int = -1, resize_height: int = -1, resize_mode: str = RESIZE_FIT,
+                    interpolation: str = INTERPOLATION_AREA) -> np.ndarray:
+    """
+    Crops and then resizes the frame.
+
+    :param frame: the frame to transform
+    :type frame: np.ndarray
+    :param crop: the tuple of x, y, width and height (0-based) to crop the frame to, None for no cropping
+    :type crop: tuple
+    :param resize_width: the width to resize to, ignored if <=0
+    :type resize_width: int
+    :param resize_height: the height to resize to, ignored if <=0
+    :type resize_height: int
+    :param resize_mode: how to resize when both width and height are specified (stretch/fit/fill)
+    :type resize_mode: str
+    :param interpolation: the interpolation to use for resizing (nearest/linear/cubic/area/lanczos)
+    :type interpolation: str
+    :return: the transformed frame, the same array if nothing was done
+    :rtype: np.ndarray
+    """
+    if interpolation not in INTERPOLATIONS:
+        raise Exception("Unknown interpolation: %s" % interpolation)
+    if crop is not None:
+        frame = crop_frame(frame, crop)
+    height, width = frame.shape[:2]
+    new_width, new_height = target_size(width, height, resize_width, resize_height, resize_mode=resize_mode)
+    if (new_width != width) or (new_height != height):
+        frame = cv2.resize(frame, (new_width, new_height), interpolation=INTERPOLATIONS[interpolation])
+    # crop the centre of the scaled frame
+    if (resize_mode == RESIZE_FILL) and (resize_width > 0) and (resize_height > 0) \
+            and ((new_width != resize_width) or (new_height != resize_height)):
+        x = (new_width - resize_width) // 2
+        y = (new_height - resize_height) // 2
+        frame = np.ascontiguousarray(frame[y:y + resize_height, x:x + resize_width])
+    return frame
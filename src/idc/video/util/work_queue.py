@@ -0,0 +1,330 @@
+import hashlib
+import json
+import os
+import socket
+import threading
+import uuid
+
+from typing import Optional
+
+STATE_CLAIMED = "claimed"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+STATES = [
+    STATE_CLAIMED,
+    STATE_DONE,
+    STATE_FAILED,
+]
+
+
+class WorkQueue:
+    """
+    Work queue shared by several processes (on one or more machines) via a directory, without
+    any external service. Each video is represented by a marker file in the 'claimed', 'done' or
+    'failed' sub-directory. Claims are made atomically by hard-linking a uniquely named file to the
+    claim marker (atomic on local filesystems and NFS), the owner refreshes the claim's modification
+    time while processing. Claims that have not been refreshed within the timeout are considered
+    stale (e.g., crashed process) and can be reclaimed. The modification times get compared against
+    the time of the filesystem rather than the local clock. While a claim is held, a background timer
+    thread refreshes it, independent of how long it takes to produce output. Claims are only refreshed,
+    released or finished by the process that owns them.
+    """
+
+    def __init__(self, queue_dir: str, timeout: float = 600.0, logger=None):
+        """
+        Initializes the queue.
+
+        :param queue_dir: the directory shared by the processes
+        :type queue_dir: str
+        :param timeout: the time in seconds after which claims that were not refreshed are considered stale
+        :type timeout: float
+        :param logger: the optional logger to use
+        """
+        self.queue_dir = queue_dir
+        self.timeout = timeout
+        self.logger = logger
+        self._owner = "%s-%d-%s" % (socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+        self._heartbeats = dict()
+        self._lock = threading.Lock()
+        for state in STATES:
+            os.makedirs(os.path.join(self.queue_dir, state), exist_ok=True)
+
+    def _key(self, path: str) -> str:
+        """
+        Returns the key for the video, based on its absolute path.
+
+        :param path: the video
+        :type path: str
+        :return: the key
+        :rtype: str
+        """
+        digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+        return "%s-%s" % (os.path.basename(path), digest)
+
+    def _marker(self, state: str, path: str) -> str:
+        """
+        Returns the marker file for the video and state.
+
+        :param state: the state (claimed/done/failed)
+        :type state: str
+        :param path: the video
+        :type path: str
+        :return: the marker file
+        :rtype: str
+        """
+        return os.path.join(self.queue_dir, state, self._key(path))
+
+    def _write(self, path: str, state: str, info: str = None) -> str:
+        """
+        Writes a uniquely named file next to the marker, describing the video and owner.
+
+        :param path: the video
+        :type path: str
+        :param state: the state (claimed/done/failed)
+        :type state: str
+        :param info: additional information, e.g., the error message
+        :type info: str
+        :return: the file that was written
+        :rtype: str
+        """
+        result = "%s.%s.tmp" % (self._marker(state, path), self._owner)
+        with open(result, "w") as fp:
+            json.dump({"path": os.path.abspath(path), "owner": self._owner, "info": info}, fp)
+        return result
+
+    def status(self, path: str) -> Optional[str]:
+        """
+        Returns the state of the video.
+
+        :param path: the video
+        :type path: str
+        :return: the state (done/failed/claimed), None if not yet processed
+        :rtype: str
+        """
+        for state in [STATE_DONE, STATE_FAILED, STATE_CLAIMED]:
+            if os.path.exists(self._marker(state, path)):
+                return state
+        return None
+
+    def _owner_of(self, path: str) -> Optional[str]:
+        """
+        Returns the owner of the claim of the video.
+
+        :param path: the video
+        :type path: str
+        :return: the owner, None if not claimed or unreadable
+        :rtype: str
+        """
+        try:
+            with open(self._marker(STATE_CLAIMED, path), "r") as fp:
+                return json.load(fp).get("owner")
+        except (OSError, ValueError):
+            return None
+
+    def owns(self, path: str) -> bool:
+        """
+        Checks whether this process holds the claim of the video.
+
+        :param path: the video
+        :type path: str
+        :return: True if claimed by this process
+        :rtype: bool
+        """
+        return self._owner_of(path) == self._owner
+
+    def _reclaim(self, claim: str, now: float) -> bool:
+        """
+        Removes the claim if it is stale. The claim gets renamed first, so that only one process can
+        remove it. Should the renamed claim turn out to have been refreshed in the meantime, it gets restored.
+
+        :param claim: the claim marker
+        :type claim: str
+        :param now: the current time of the filesystem
+        :type now: float
+        :return: True if the claim was removed (or no longer exists)
+        :rtype: bool
+        """
+        try:
+            if now - os.stat(claim).st_mtime < self.timeout:
+                return False
+            stale = "%s.%s.stale" % (claim, self._owner)
+            os.rename(claim, stale)
+        except FileNotFoundError:
+            return True
+        if now - os.stat(stale).st_mtime < self.timeout:
+            # refreshed in the meantime, try to restore
+            try:
+                os.link(stale, claim)
+            except FileExistsError:
+                pass
+            os.remove(stale)
+            return False
+        os.remove(stale)
+        if self.logger is not None:
+            self.logger.warning("Reclaimed stale claim: %s" % claim)
+        return True
+
+    def claim(self, path: str) -> bool:
+        """
+        Attempts to claim the video, reclaiming stale claims.
+
+        :param path: the video to claim
+        :type path: str
+        :return: True if successfully claimed, False if done/failed or claimed by another process
+        :rtype: bool
+        """
+        if self.status(path) in [STATE_DONE, STATE_FAILED]:
+            return False
+        claim = self._marker(STATE_CLAIMED, path)
+        tmp = self._write(path, STATE_CLAIMED)
+        try:
+            for _ in range(2):
+                try:
+                    os.link(tmp, claim)
+                except FileExistsError:
+                    if self._reclaim(claim, os.stat(tmp).st_mtime):
+                        continue
+                    return False
+                # finished in the meantime?
+                if self.status(path) in [STATE_DONE, STATE_FAILED]:
+                    os.remove(claim)
+                    return False
+                self._start_heartbeat(path)
+                return True
+            return False
+        finally:
+            os.remove(tmp)
+
+    def heartbeat(self, path: str) -> bool:
+        """
+        Refreshes the claim of the video, if still owned by this process.
+
+        :param path: the claimed video
+        :type path: str
+        :return: True if refreshed
+        :rtype: bool
+        """
+        if not self.owns(path):
+            if self.logger is not None:
+                self.logger.warning("Claim no longer owned, not refreshing: %s" % path)
+            return False
+        try:
+            os.utime(self._marker(STATE_CLAIMED, path))
+            return True
+        except FileNotFoundError:
+            if self.logger is not None:
+                self.logger.warning("Claim no longer exists: %s" % path)
+            return False
+
+    def _run_heartbeat(self, path: str, stopped: threading.Event):
+        """
+        Refreshes the claim every tenth of the timeout until stopped or the claim was lost,
+        executed in a background thread.
+
+        :param path: the claimed video
+        :type path: str
+        :param stopped: the event that signals to stop
+        :type stopped: threading.Event
+        """
+        interval = max(0.05, self.timeout / 10)
+        while not stopped.wait(interval):
+            if not self.heartbeat(path):
+                break
+
+    def _start_heartbeat(self, path: str):
+        """
+        Starts the background thread refreshing the claim of the video.
+
+        :param path: the claimed video
+        :type path: str
+        """
+        stopped = threading.Event()
+        thread = threading.Thread(target=self._run_heartbeat, args=(path, stopped), daemon=True)
+        with self._lock:
+            self._heartbeats[path] = (thread, stopped)
+        thread.start()
+
+    def _stop_heartbeat(self, path: str):
+        """
+        Stops the background thread refreshing the claim of the video, if any.
+
+        :param path: the claimed video
+        :type path: str
+        """
+        with self._lock:
+            heartbeat = self._heartbeats.pop(path, None)
+        if heartbeat is None:
+            return
+        thread, stopped = heartbeat
+        stopped.set()
+        if thread is not threading.current_thread():
+            thread.join()
+
+    def release(self, path: str) -> bool:
+        """
+        Removes the claim of the video, allowing other processes to claim it. Claims owned by
+        other processes are left untouched.
+
+        :param path: the claimed video
+        :type path: str
+        :return: True if the claim was removed
+        :rtype: bool
+        """
+        self._stop_heartbeat(path)
+        if not self.owns(path):
+            if self.logger is not None:
+                self.logger.warning("Claim no longer owned, not releasing: %s" % path)
+            return False
+        try:
+            os.remove(self._marker(STATE_CLAIMED, path))
+        except FileNotFoundError:
+            pass
+        return True
+
+    def _finish(self, path: str, state: str, info: str = None) -> bool:
+        """
+        Marks the video with the final state and removes the claim, as long as the claim is
+        still owned by this process.
+
+        :param path: the claimed video
+        :type path: str
+        :param state: the state (done/failed)
+        :type state: str
+        :param info: additional information, e.g., the error message
+        :type info: str
+        :return: True if marked
+        :rtype: bool
+        """
+        self._stop_heartbeat(path)
+        if not self.owns(path):
+            if self.logger is not None:
+                self.logger.warning("Claim no longer owned, not marking as %s: %s" % (state, path))
+            return False
+        tmp = self._write(path, state, info=info)
+        os.replace(tmp, self._marker(state, path))
+        self.release(path)
+        return True
+
+    def done(self, path: str) -> bool:
+        """
+        Marks the video as done.
+
+        :param path: the claimed video
+        :type path: str
+        :return: True if marked
+        :rtype: bool
+        """
+        return self._finish(path, STATE_DONE)
+
+    def failed(self, path: str, error: str) -> bool:
+        """
+        Marks the video as failed.
+
+        :param path: the claimed video
+        :type path: str
+        :param error: the error message
+        :type error: str
+        :return: True if marked
+        :rtype: bool
+        """
+        return self._finish(path, STATE_FAILED, info=error)
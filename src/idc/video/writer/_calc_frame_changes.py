@@ -1,6 +1,6 @@
 import argparse
+import logging
 import csv
-import cv2
 import json
 import numpy as np
 import sys
@@ -12,6 +12,7 @@ from wai.logging import LOGGING_WARNING
 from kasperl.api import make_list, StreamWriter
 from idc.api import ImageData
 from idc.video.util.change_detection import CONVERSION_GRAY, CONVERSIONS, detect_change
+from idc.video.util.frames import CHANNEL_ORDER_BGR, data_to_frame
 from seppl.variables import InputBasedVariableSupporter, variable_list
 
 
@@ -144,9 +145,10 @@ class CalcFrameChanges(StreamWriter, InputBasedVariableSupporter):
 
         :param data: the data to write (single record or iterable of records)
         """
+        debug = self.logger().isEnabledFor(logging.DEBUG)
         for item in make_list(data):
             # read image
-            img = cv2.cvtColor(np.array(item.image), cv2.COLOR_RGB2BGR)
+            img = data_to_frame(item, CHANNEL_ORDER_BGR)
 
             # nothing to compare against?
             if self._last_image is None:
@@ -157,7 +159,8 @@ class CalcFrameChanges(StreamWriter, InputBasedVariableSupporter):
             # detect change
             ratio, changed = detect_change(self._last_image, img,
                                            self.conversion, self.bw_threshold, self.change_threshold)
-            self.logger().debug("%s (ratio/changed): %f -> %s" % (item.image_name, ratio, str(changed)))
+            if debug:
+                self.logger().debug("%s (ratio/changed): %f -> %s" % (item.image_name, ratio, str(changed)))
 
             if changed:
                 # shift state
@@ -1,11 +1,11 @@
 import argparse
 import cv2
-import numpy as np
 from typing import List
 
 from wai.logging import LOGGING_WARNING
 from kasperl.api import make_list, StreamWriter
 from idc.api import ImageData
+from idc.video.util.frames import CHANNEL_ORDER_BGR, data_to_frame
 from seppl.variables import InputBasedVariableSupporter, variable_list
 
 
@@ -98,15 +98,16 @@ class VideoFileWriter(StreamWriter, InputBasedVariableSupporter):
 
         :param data: the data to write (single record or iterable of records)
         """
+        # the variables are the same for all the items
+        output_file = self.session.expand_variables(self.output_file)
         for item in make_list(data):
-            output_file = self.session.expand_variables(self.output_file)
+            img = data_to_frame(item, CHANNEL_ORDER_BGR)
             if (self._out is None) or (output_file != self._last_output_file):
                 self._close_stream()
-                w, h = item.image.size
+                h, w = img.shape[:2]
                 self._out = cv2.VideoWriter(output_file, cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'), self.fps, (w, h))
                 self._last_output_file = output_file
 
-            img = cv2.cvtColor(np.array(item.image), cv2.COLOR_RGB2BGR)
             self._out.write(img)
 
     def _close_stream(self):